@@ -0,0 +1,32 @@
+import argparse
+import asyncio
+import json
+import logging
+from app.database.db import resources
+from app.database.importer import UserImporter
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
+async def main():
+    parser = argparse.ArgumentParser(description="Импорт пользователей из CSV/JSONL")
+    parser.add_argument("path", help="файл с пользователями (telegram_id, phone_number, username, full_name)")
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="по умолчанию — по расширению файла")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--rejects", default="import_rejects.jsonl", help="куда писать отклонённые строки")
+    args = parser.parse_args()
+
+    fmt = args.format or ("csv" if args.path.lower().endswith(".csv") else "jsonl")
+    db_service = await resources.start()
+    try:
+        with open(args.path, "r", encoding="utf-8", newline="") as fp, \
+                open(args.rejects, "w", encoding="utf-8") as rejects:
+            report = await UserImporter(db_service, args.batch_size, rejects).run(fp, fmt)
+        logging.info("Import finished: %s", json.dumps(report, ensure_ascii=False))
+    finally:
+        await resources.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -2,8 +2,25 @@ import asyncio
 import logging
 from aiogram import Bot, Dispatcher
 from app.event.router import router
-from app.database.db import create_mongo_client, get_mongo_db
-from app.database.service import DatabaseService
+from app.database.db import resources
+from app.database.utils import load_initial_messages
+from app.database.admins import refresh_admins_periodically
+from app.database.leaderboard import rebuild_leaderboard_periodically
+from app.database.referral_graph import sync_referral_graph_periodically
+from app.database.sweeper import RefcodeDeadlineSweeper
+from app.database.monitoring import dump_stats_periodically
+from datetime import timedelta
+from app.middlewares.request_memo import RequestMemoMiddleware
+from app.middlewares.scheduler import ChatScheduler
+from aiogram.fsm.storage.memory import MemoryStorage
+from app.metrics.registry import REGISTRY
+from app.metrics.collectors import mongo_collector
+from app.metrics.middleware import UpdateMetricsMiddleware, MetricsStorage, instrument_routers
+from app.metrics.server import create_app, start_server
+from app.webhook import WebhookHandler, run_webhook
+from app.fsm.storage import MongoStorage, FSM_COLLECTION
+from app.database.cache import TTLCache
+from app.utils.ratelimit import SendLimiter
 from env.config_reader import config
 
 logging.basicConfig(
@@ -11,46 +28,167 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 
-async def on_startup(dispatcher: Dispatcher):
+async def on_startup(dispatcher: Dispatcher, bot: Bot):
     logging.info("Entering on_startup function...")
     try:
-        client = await create_mongo_client()
-        db = await get_mongo_db(client)
-        db_service = DatabaseService(db)
+        db_service = await resources.start()
+        fsm_storage = dispatcher.get('fsm_storage')
+        if fsm_storage:
+            await fsm_storage.bind(resources.db[FSM_COLLECTION])
         # Инициализация валидаторов и индексов (идемпотентно)
         try:
-            await db_service.init_business_schemas_and_indexes()
+            schema_report = await db_service.init_business_schemas_and_indexes()
+            logging.info(f"Business schema/index init: {schema_report}")
         except Exception as e:
             logging.warning(f"Business schema/index init warning: {e}")
-        dispatcher['mongo_client'] = client
+        await load_initial_messages(db_service)
+        admins_count = await db_service.load_admins()
+        logging.info(f"Admin registry loaded: {admins_count} admins.")
+        await db_service.leaderboard.rebuild()
+        edges = await db_service.referral_graph.sync(db_service.col_referrals)
+        logging.info(f"Referral graph loaded: {edges} edges.")
+        dispatcher['resources'] = resources
         dispatcher['db_service'] = db_service
+        dispatcher['admins_refresh_task'] = asyncio.create_task(
+            refresh_admins_periodically(db_service, config.ADMIN_REFRESH_INTERVAL)
+        )
+        dispatcher['leaderboard_task'] = asyncio.create_task(
+            rebuild_leaderboard_periodically(db_service.leaderboard, config.LEADERBOARD_REBUILD_INTERVAL)
+        )
+        dispatcher['referral_graph_task'] = asyncio.create_task(
+            sync_referral_graph_periodically(
+                db_service.referral_graph, db_service.col_referrals,
+                config.REFERRAL_GRAPH_SYNC_INTERVAL, config.REFERRAL_GRAPH_REBUILD_INTERVAL
+            )
+        )
+        await db_service.notifications.ensure_indexes()
+        # Общие лимиты отправки Telegram на процесс
+        send_limiter = SendLimiter(config.SEND_GLOBAL_RATE, config.SEND_CHAT_RATE)
+        dispatcher['send_limiter'] = send_limiter
+        dispatcher['notifications_task'] = asyncio.create_task(
+            db_service.notifications.run(bot, send_limiter, concurrency=config.NOTIFY_CONCURRENCY)
+        )
+        await db_service.broadcasts.ensure_indexes()
+        resumed = await db_service.broadcasts.resume_all(bot, send_limiter)
+        if resumed:
+            logging.info(f"Resumed {resumed} interrupted broadcasts.")
+        dispatcher['broadcast_resume_task'] = asyncio.create_task(
+            db_service.broadcasts.resume_periodically(bot, send_limiter, config.BROADCAST_RESUME_INTERVAL)
+        )
+        sweeper = RefcodeDeadlineSweeper(
+            db_service,
+            batch_size=config.REFCODE_SWEEP_BATCH,
+            batch_pause=config.REFCODE_SWEEP_PAUSE,
+            remind_before=timedelta(hours=config.REFCODE_REMIND_BEFORE_HOURS),
+            on_remind=lambda ids: db_service.notifications.enqueue_many((i, {"kind": "refcode_reminder"}) for i in ids)
+        )
+        dispatcher['refcode_sweeper_task'] = asyncio.create_task(
+            sweeper.run_forever(config.REFCODE_SWEEP_INTERVAL)
+        )
+        if config.MONGO_STATS_DUMP_PATH:
+            dispatcher['mongo_stats_dump_task'] = asyncio.create_task(dump_stats_periodically(
+                resources.command_stats, config.MONGO_STATS_DUMP_PATH, config.MONGO_STATS_DUMP_INTERVAL
+            ))
+        webhook_handler = dispatcher.get('webhook_handler')
+        if config.METRICS_ENABLED:
+            REGISTRY.add_collector(mongo_collector(resources))
+        if config.METRICS_ENABLED or webhook_handler:
+            app = create_app(REGISTRY if config.METRICS_ENABLED else None)
+            if webhook_handler:
+                webhook_handler.register(app, config.WEBHOOK_PATH)
+            dispatcher['http_runner'] = await start_server(app, config.METRICS_HOST, config.METRICS_PORT)
+        if webhook_handler:
+            await bot.set_webhook(
+                url=config.WEBHOOK_URL.rstrip('/') + config.WEBHOOK_PATH,
+                secret_token=webhook_handler.secret_token,
+                max_connections=config.WEBHOOK_MAX_CONNECTIONS,
+                allowed_updates=dispatcher.resolve_used_update_types()
+            )
+            logging.info(f"Webhook set: {config.WEBHOOK_URL}{config.WEBHOOK_PATH}")
+        if config.MESSAGE_CACHE_WATCH:
+            dispatcher['messages_watch_task'] = asyncio.create_task(db_service.watch_messages())
         logging.info("Mongo client and DatabaseService created successfully.")
     except Exception as e:
         logging.error(f"Failed to initialize database services: {e}")
+        if dispatcher.get('webhook_handler'):
+            raise
         # Останавливаем polling — Dispatcher.stop_polling асинхронен в aiogram 3.x
         await dispatcher.stop_polling()
         logging.info("Polling stopped due to DB connection failure.")
 
 async def on_shutdown(dispatcher: Dispatcher):
     logging.info("Entering on_shutdown function...")
-    client = dispatcher.get('mongo_client')
-    if client:
-        client.close()
+    for task_name in ('messages_watch_task', 'admins_refresh_task', 'leaderboard_task',
+                      'referral_graph_task', 'refcode_sweeper_task', 'mongo_stats_dump_task',
+                      'notifications_task', 'broadcast_resume_task'):
+        task = dispatcher.get(task_name)
+        if task:
+            task.cancel()
+    if resources.started:
+        # Незавершённые рассылки остаются running и продолжатся после рестарта
+        await resources.db_service.broadcasts.stop()
+    http_runner = dispatcher.get('http_runner')
+    if http_runner:
+        await http_runner.cleanup()
+    webhook_handler = dispatcher.get('webhook_handler')
+    if webhook_handler:
+        await webhook_handler.drain()
+    scheduler = dispatcher.get('scheduler')
+    if scheduler:
+        try:
+            await asyncio.wait_for(scheduler.drain(), config.SCHEDULER_DRAIN_TIMEOUT)
+        except asyncio.TimeoutError:
+            logging.warning(f"Scheduler drain timed out with {scheduler.pending} queued updates.")
+    if resources.started:
+        await resources.close()
         logging.info("Mongo client closed successfully.")
     else:
-        logging.warning("Mongo client was not found in dispatcher context.")
+        logging.warning("Mongo resources were not started.")
 
 async def main():
     bot = Bot(token=config.TELEGRAM_BOT_TOKEN.get_secret_value())
-    dp = Dispatcher()
+    if config.FSM_STORAGE == "mongo":
+        # Коллекция привязывается в on_startup, после создания клиента Mongo
+        fsm_storage = MongoStorage(
+            cache=TTLCache(maxsize=config.FSM_CACHE_SIZE, ttl=config.FSM_CACHE_TTL),
+            state_ttl=config.FSM_STATE_TTL
+        )
+        dp = Dispatcher(storage=MetricsStorage(fsm_storage))
+        dp['fsm_storage'] = fsm_storage
+    else:
+        dp = Dispatcher(storage=MetricsStorage(MemoryStorage()))
+    if config.SCHEDULER_ENABLED:
+        # Первым: дальнейшая цепочка выполняется в воркере чата
+        scheduler = ChatScheduler(
+            max_concurrency=config.SCHEDULER_MAX_CONCURRENCY,
+            max_pending=config.SCHEDULER_MAX_PENDING,
+            overloaded=lambda: resources.pool_listener.waiters > config.SCHEDULER_MONGO_WAITERS
+        )
+        dp.update.outer_middleware(scheduler)
+        dp['scheduler'] = scheduler
+    dp.update.outer_middleware(UpdateMetricsMiddleware())
+    dp.update.outer_middleware(RequestMemoMiddleware())
     dp.include_router(router)
+    instrument_routers(router)
     logging.info("Router included in Dispatcher.")
 
     dp.startup.register(on_startup)
     dp.shutdown.register(on_shutdown)
 
-    logging.info("Бот запущен. Начинаю опрос...")
-    await dp.start_polling(bot)
+    if config.BOT_MODE == "webhook":
+        if not config.WEBHOOK_URL:
+            raise RuntimeError("WEBHOOK_URL is required when BOT_MODE=webhook")
+        if not config.WEBHOOK_SECRET or not config.WEBHOOK_SECRET.get_secret_value():
+            raise RuntimeError("WEBHOOK_SECRET is required when BOT_MODE=webhook")
+        dp['webhook_handler'] = WebhookHandler(
+            dp, bot, config.WEBHOOK_SECRET.get_secret_value(), config.WEBHOOK_MAX_CONCURRENCY
+        )
+        logging.info("Бот запущен в режиме webhook.")
+        await run_webhook(dp, bot)
+    else:
+        logging.info("Бот запущен. Начинаю опрос...")
+        # С планировщиком polling не плодит задачи сам: очередь планировщика даёт backpressure
+        await dp.start_polling(bot, handle_as_tasks=not config.SCHEDULER_ENABLED)
 
 if __name__ == "__main__":
     asyncio.run(main())
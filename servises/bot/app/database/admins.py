@@ -0,0 +1,53 @@
+from typing import Dict, Optional, Any
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class AdminRegistry:
+    """
+    In-memory реестр администраторов: telegram_id -> access_level.
+    Загружается при старте, обновляется сразу при add_admin/remove_admin
+    и периодически сверяется с коллекцией admins: так подхватываются изменения
+    других реплик и записи, сделанные в БД напрямую (админка, mongosh).
+    """
+
+    def __init__(self):
+        self._levels: Dict[int, str] = {}
+        self.loaded = False
+
+    def access_level(self, telegram_id: int) -> Optional[str]:
+        return self._levels.get(telegram_id)
+
+    def is_admin(self, telegram_id: int) -> bool:
+        return telegram_id in self._levels
+
+    def set(self, telegram_id: int, access_level: str) -> None:
+        self._levels[telegram_id] = access_level
+
+    def remove(self, telegram_id: int) -> None:
+        self._levels.pop(telegram_id, None)
+
+    def replace(self, levels: Dict[int, str]) -> bool:
+        """Подменяет реестр целиком. Возвращает True, если состав или уровни изменились."""
+        changed = not self.loaded or levels != self._levels
+        self._levels = levels
+        self.loaded = True
+        return changed
+
+    def __len__(self) -> int:
+        return len(self._levels)
+
+
+async def refresh_admins_periodically(db_service: Any, interval: float = 30.0) -> None:
+    """Фоновая сверка реестра с коллекцией admins."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if await db_service.refresh_admins():
+                logger.info(f"Admin registry reloaded: {len(db_service.admins)} admins")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Admin registry refresh failed: {e}")
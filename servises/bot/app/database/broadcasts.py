@@ -0,0 +1,252 @@
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+import asyncio
+import contextvars
+import logging
+import time
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+from bson import ObjectId
+from pymongo import ASCENDING, ReturnDocument
+from app.database.leases import Lease
+from app.metrics.bot import BROADCAST_MESSAGES
+from app.utils.ratelimit import SendLimiter
+
+logger = logging.getLogger(__name__)
+
+# Сегменты получателей; заблокировавшие бота исключаются всегда
+BROADCAST_FILTERS: Dict[str, Dict[str, Any]] = {
+    "all": {},
+    "activated": {"is_activated": True},
+    "referrer": {"referrer_id": {"$ne": None}},
+}
+MAX_RETRIES = 3
+PROGRESS_EDIT_INTERVAL = 5.0
+
+
+def _format_eta(seconds: float) -> str:
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    return f"{hours}:{rest // 60:02d}:{rest % 60:02d}" if hours else f"{rest // 60}:{rest % 60:02d}"
+
+
+def render_progress(doc: Dict[str, Any], rate: Optional[float] = None) -> str:
+    total = doc.get("total") or 0
+    done = doc.get("sent", 0) + doc.get("blocked", 0) + doc.get("failed", 0)
+    percent = done * 100 // total if total else 100
+    lines = [
+        f"📣 Рассылка {doc['_id']} ({doc.get('segment')}): {doc.get('status')}",
+        f"Обработано {done}/{total} ({percent}%)",
+        f"✅ Доставлено: {doc.get('sent', 0)}  ⛔ Заблокировали: {doc.get('blocked', 0)}  ❌ Ошибки: {doc.get('failed', 0)}",
+    ]
+    if doc.get("status") == "running" and rate:
+        lines.append(f"⏱ Осталось ~{_format_eta(max(0, total - done) / rate)} ({rate:.1f} сообщ./с)")
+    return "\n".join(lines)
+
+
+class BroadcastEngine:
+    """
+    Рассылки администратора. Получатели читаются курсором по возрастанию telegram_id,
+    пачками по batch_size; пачка отправляется пулом из workers задач через общий
+    SendLimiter. После каждой пачки в документ broadcasts записываются счётчики и
+    checkpoint (последний telegram_id), так что после падения рассылка продолжается
+    с места остановки — повторно может уйти не больше одной пачки.
+    Каждую рассылку ведёт одна реплика (аренда broadcast:<id>); resume_periodically
+    подхватывает рассылки, аренда которых истекла вместе с упавшей репликой.
+    """
+
+    def __init__(self, collection: Any, col_users: Any, col_leases: Any,
+                 batch_size: int = 100, workers: int = 10, lease_ttl: float = 120.0):
+        self.collection = collection
+        self.col_users = col_users
+        self.col_leases = col_leases
+        self.batch_size = batch_size
+        self.workers = workers
+        self.lease_ttl = lease_ttl
+        self._tasks: Dict[ObjectId, asyncio.Task] = {}
+
+    async def ensure_indexes(self) -> None:
+        await self.collection.create_index([("status", ASCENDING), ("created_at", ASCENDING)], name="status_created")
+
+    @staticmethod
+    def recipients_query(segment: str, after_id: Optional[int] = None) -> Dict[str, Any]:
+        query: Dict[str, Any] = {**BROADCAST_FILTERS[segment], "is_blocked": {"$ne": True}}
+        if after_id is not None:
+            query["telegram_id"] = {"$gt": after_id}
+        return query
+
+    async def create(self, text: str, segment: str, created_by: int, admin_chat_id: int,
+                     progress_message_id: Optional[int] = None) -> Dict[str, Any]:
+        now = datetime.now()
+        doc = {
+            "text": text,
+            "segment": segment,
+            "status": "running",
+            "created_by": created_by,
+            "admin_chat_id": admin_chat_id,
+            "progress_message_id": progress_message_id,
+            "total": await self.col_users.count_documents(self.recipients_query(segment)),
+            "checkpoint": None,
+            "sent": 0,
+            "blocked": 0,
+            "failed": 0,
+            "created_at": now,
+            "updated_at": now,
+        }
+        doc["_id"] = (await self.collection.insert_one(doc)).inserted_id
+        return doc
+
+    async def cancel(self, broadcast_id: ObjectId) -> bool:
+        result = await self.collection.update_one(
+            {"_id": broadcast_id, "status": "running"},
+            {"$set": {"status": "cancelled", "updated_at": datetime.now()}}
+        )
+        return result.modified_count == 1
+
+    async def latest_running(self) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one({"status": "running"}, sort=[("created_at", -1)])
+
+    def start(self, bot: Bot, limiter: SendLimiter, broadcast_id: ObjectId) -> asyncio.Task:
+        task = self._tasks.get(broadcast_id)
+        if task is not None:
+            return task
+        # Чистый контекст: рассылка не должна унаследовать request-мемо апдейта, из которого запущена
+        task = asyncio.create_task(self.run(bot, limiter, broadcast_id), context=contextvars.Context())
+        self._tasks[broadcast_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(broadcast_id, None))
+        return task
+
+    async def resume_all(self, bot: Bot, limiter: SendLimiter) -> int:
+        """Запускает running-рассылки, которые не ведёт этот процесс (прерванные остановкой или падением реплики)."""
+        ids = [
+            doc["_id"] async for doc in self.collection.find({"status": "running"}, projection={"_id": True})
+            if doc["_id"] not in self._tasks
+        ]
+        for broadcast_id in ids:
+            self.start(bot, limiter, broadcast_id)
+        return len(ids)
+
+    async def resume_periodically(self, bot: Bot, limiter: SendLimiter, interval: float = 60.0) -> None:
+        """
+        Повторяет resume_all: аренда упавшей реплики занята ещё lease_ttl секунд,
+        поэтому её рассылку удаётся подхватить только со следующей попытки.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                resumed = await self.resume_all(bot, limiter)
+                if resumed:
+                    logger.debug(f"Broadcast resume tick started {resumed} tasks")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Broadcast resume failed: {e}")
+
+    async def stop(self) -> None:
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _send_one(self, bot: Bot, limiter: SendLimiter, telegram_id: int, text: str) -> str:
+        for _ in range(MAX_RETRIES):
+            await limiter.acquire(telegram_id)
+            try:
+                await bot.send_message(telegram_id, text)
+                return "sent"
+            except TelegramRetryAfter as e:
+                BROADCAST_MESSAGES.inc("retry_after")
+                limiter.retry_after(e.retry_after)
+                await asyncio.sleep(e.retry_after)
+            except TelegramForbiddenError:
+                return "blocked"
+            except TelegramBadRequest as e:
+                logger.debug(f"Broadcast to {telegram_id} rejected: {e}")
+                return "failed"
+            except Exception as e:
+                logger.warning(f"Broadcast to {telegram_id} failed: {e}")
+                return "failed"
+        return "failed"
+
+    async def _send_batch(self, bot: Bot, limiter: SendLimiter, ids: List[int], text: str) -> Dict[str, List[int]]:
+        queue: asyncio.Queue = asyncio.Queue()
+        for telegram_id in ids:
+            queue.put_nowait(telegram_id)
+        results: Dict[str, List[int]] = {"sent": [], "blocked": [], "failed": []}
+
+        async def worker() -> None:
+            while not queue.empty():
+                telegram_id = queue.get_nowait()
+                result = await self._send_one(bot, limiter, telegram_id, text)
+                BROADCAST_MESSAGES.inc(result)
+                results[result].append(telegram_id)
+
+        await asyncio.gather(*(worker() for _ in range(min(self.workers, len(ids)))))
+        return results
+
+    async def _report(self, bot: Bot, doc: Dict[str, Any], rate: Optional[float]) -> None:
+        if not doc.get("progress_message_id"):
+            return
+        try:
+            await bot.edit_message_text(
+                render_progress(doc, rate), chat_id=doc["admin_chat_id"], message_id=doc["progress_message_id"]
+            )
+        except TelegramRetryAfter as e:
+            logger.debug(f"Progress edit throttled for {e.retry_after}s")
+        except TelegramBadRequest as e:
+            # "message is not modified" и удалённое сообщение прогресса не мешают рассылке
+            logger.debug(f"Progress edit skipped: {e}")
+
+    async def run(self, bot: Bot, limiter: SendLimiter, broadcast_id: ObjectId) -> None:
+        lease = Lease(self.col_leases, f"broadcast:{broadcast_id}", self.lease_ttl)
+        if await lease.acquire() is None:
+            logger.debug(f"Broadcast {broadcast_id} is handled by another replica")
+            return
+        doc = await self.collection.find_one({"_id": broadcast_id})
+        started = time.monotonic()
+        processed = 0
+        last_report = started
+        try:
+            while doc is not None and doc["status"] == "running":
+                cursor = self.col_users.find(
+                    self.recipients_query(doc["segment"], doc.get("checkpoint")),
+                    projection={"_id": False, "telegram_id": True},
+                    batch_size=self.batch_size
+                ).sort("telegram_id", ASCENDING).limit(self.batch_size)
+                ids = [user["telegram_id"] async for user in cursor]
+                if not ids:
+                    doc = await self.collection.find_one_and_update(
+                        {"_id": broadcast_id, "status": "running"},
+                        {"$set": {"status": "done", "finished_at": datetime.now(), "updated_at": datetime.now()}},
+                        return_document=ReturnDocument.AFTER
+                    )
+                    break
+
+                results = await self._send_batch(bot, limiter, ids, doc["text"])
+                if results["blocked"]:
+                    await self.col_users.update_many(
+                        {"telegram_id": {"$in": results["blocked"]}}, {"$set": {"is_blocked": True}}
+                    )
+                processed += len(ids)
+                # Checkpoint только пока рассылка не отменена
+                doc = await self.collection.find_one_and_update(
+                    {"_id": broadcast_id, "status": "running"},
+                    {
+                        "$set": {"checkpoint": ids[-1], "updated_at": datetime.now()},
+                        "$inc": {name: len(values) for name, values in results.items()}
+                    },
+                    return_document=ReturnDocument.AFTER
+                ) or await self.collection.find_one({"_id": broadcast_id})
+                if await lease.acquire() is None:
+                    # Аренду забрала другая реплика (мы не продлили её вовремя) — рассылку ведёт она
+                    logger.warning(f"Broadcast {broadcast_id}: lease lost, stopping")
+                    return
+                if time.monotonic() - last_report >= PROGRESS_EDIT_INTERVAL:
+                    last_report = time.monotonic()
+                    await self._report(bot, doc, processed / (last_report - started))
+        finally:
+            await lease.release()
+        if doc is not None:
+            logger.info(f"Broadcast {broadcast_id} finished with status {doc['status']}")
+            await self._report(bot, doc, None)
@@ -0,0 +1,83 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Hashable, Iterator, Optional
+import time
+
+
+class TTLCache:
+    """
+    Ограниченный по размеру in-memory кэш с TTL и вытеснением по LRU.
+    Ведёт счётчики попаданий/промахов для проверки, что горячий путь не ходит в БД.
+    """
+
+    def __init__(self, maxsize: int = 512, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits / total) if total else 0.0,
+        }
+
+
+# Мемо на время обработки одного апдейта: один и тот же документ
+# не запрашивается дважды в рамках одного update (см. RequestMemoMiddleware)
+_request_memo: ContextVar[Optional[Dict[Hashable, Any]]] = ContextVar("request_memo", default=None)
+
+
+def get_request_memo() -> Optional[Dict[Hashable, Any]]:
+    return _request_memo.get()
+
+
+@contextmanager
+def request_scope() -> Iterator[Dict[Hashable, Any]]:
+    """Открывает новый request-scoped мемо на время блока."""
+    memo: Dict[Hashable, Any] = {}
+    token = _request_memo.set(memo)
+    try:
+        yield memo
+    finally:
+        _request_memo.reset(token)
@@ -1,9 +1,92 @@
+from typing import Optional, Dict, Any
+import asyncio
+import threading
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import monitoring
 from env.config_reader import config
+from app.database.monitoring import CommandStats
 
-async def create_mongo_client() -> AsyncIOMotorClient:
-    """Создаёт и возвращает AsyncIOMotorClient."""
-    return AsyncIOMotorClient(config.MONGO_URI)
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """
+    Счётчики пула соединений pymongo: открытые, выданные соединения и ожидающие.
+    События приходят из потоков motor, поэтому счётчики защищены блокировкой.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.open = 0
+        self.checked_out = 0
+        self.waiters = 0
+        self.checkout_failures = 0
+        self.pool_clears = 0
+
+    def _add(self, **deltas: int) -> None:
+        with self._lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "open": self.open,
+                "checked_out": self.checked_out,
+                "waiters": self.waiters,
+                "checkout_failures": self.checkout_failures,
+                "pool_clears": self.pool_clears,
+            }
+
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_closed(self, event): pass
+    def connection_ready(self, event): pass
+
+    def pool_cleared(self, event):
+        self._add(pool_clears=1)
+
+    def connection_created(self, event):
+        self._add(open=1)
+
+    def connection_closed(self, event):
+        self._add(open=-1)
+
+    def connection_check_out_started(self, event):
+        self._add(waiters=1)
+
+    def connection_check_out_failed(self, event):
+        self._add(waiters=-1, checkout_failures=1)
+
+    def connection_checked_out(self, event):
+        self._add(waiters=-1, checked_out=1)
+
+    def connection_checked_in(self, event):
+        self._add(checked_out=-1)
+
+
+def _client_options(listeners: Optional[list] = None) -> Dict[str, Any]:
+    """Параметры пула, таймаутов и сжатия из Settings."""
+    options: Dict[str, Any] = {
+        "maxPoolSize": config.MONGO_MAX_POOL_SIZE,
+        "minPoolSize": config.MONGO_MIN_POOL_SIZE,
+        "serverSelectionTimeoutMS": config.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": config.MONGO_CONNECT_TIMEOUT_MS,
+    }
+    if config.MONGO_SOCKET_TIMEOUT_MS is not None:
+        options["socketTimeoutMS"] = config.MONGO_SOCKET_TIMEOUT_MS
+    if config.MONGO_WAIT_QUEUE_TIMEOUT_MS is not None:
+        options["waitQueueTimeoutMS"] = config.MONGO_WAIT_QUEUE_TIMEOUT_MS
+    if config.MONGO_MAX_IDLE_TIME_MS is not None:
+        options["maxIdleTimeMS"] = config.MONGO_MAX_IDLE_TIME_MS
+    if config.MONGO_COMPRESSORS:
+        options["compressors"] = config.MONGO_COMPRESSORS
+    if listeners:
+        options["event_listeners"] = listeners
+    return options
+
+
+async def create_mongo_client(listeners: Optional[list] = None) -> AsyncIOMotorClient:
+    """Создаёт и возвращает AsyncIOMotorClient с настройками пула из config."""
+    return AsyncIOMotorClient(config.MONGO_URI, **_client_options(listeners))
 
 async def get_mongo_db(client: AsyncIOMotorClient | None = None) -> AsyncIOMotorDatabase:
     """Возвращает объект базы данных. Если client не передан — создаёт новый."""
@@ -12,3 +95,75 @@ async def get_mongo_db(client: AsyncIOMotorClient | None = None) -> AsyncIOMotor
     # Если в config есть имя базы как строка:
     db_name = getattr(config, "MONGO_DB_NAME", None) or config.MONGO_URI.rsplit("/", 1)[-1].split("?")[0]
     return client[db_name]
+
+
+class MongoResources:
+    """
+    Единый контейнер ресурсов приложения: один пул соединений и один DatabaseService.
+    Создаётся в on_startup, кладётся в workflow data диспетчера и доступен
+    вне хендлеров (send_message) через get_db_service().
+    """
+
+    def __init__(self):
+        self.client: Optional[AsyncIOMotorClient] = None
+        self.db: Optional[AsyncIOMotorDatabase] = None
+        self.db_service = None
+        self.pool_listener = PoolStatsListener()
+        self.command_stats = CommandStats(
+            slow_ms=config.MONGO_SLOW_MS,
+            explain_sample_rate=config.MONGO_EXPLAIN_SAMPLE_RATE
+        )
+        self._explain_task: Optional[asyncio.Task] = None
+
+    @property
+    def started(self) -> bool:
+        return self.db_service is not None
+
+    async def start(self):
+        """Создаёт клиент и DatabaseService (повторный вызов ничего не делает)."""
+        if self.started:
+            return self.db_service
+        # Импорт здесь, чтобы избежать цикла app.database.service -> db
+        from app.database.cache import TTLCache
+        from app.database.service import DatabaseService
+
+        self.client = await create_mongo_client(listeners=[self.pool_listener, self.command_stats])
+        self.command_stats.bind(asyncio.get_running_loop())
+        self._explain_task = asyncio.create_task(self.command_stats.explain_worker(self.client))
+        self.db = await get_mongo_db(self.client)
+        self.db_service = DatabaseService(
+            self.db,
+            message_cache=TTLCache(maxsize=config.MESSAGE_CACHE_SIZE, ttl=config.MESSAGE_CACHE_TTL),
+            user_cache=TTLCache(
+                maxsize=config.USER_CACHE_SIZE if config.USER_CACHE_ENABLED else 0,
+                ttl=config.USER_CACHE_TTL
+            ),
+            referral_code_secret=config.REFERRAL_CODE_SECRET.get_secret_value().encode()
+        )
+        return self.db_service
+
+    async def close(self) -> None:
+        if self._explain_task is not None:
+            self._explain_task.cancel()
+            self._explain_task = None
+        if self.client is not None:
+            self.client.close()
+        self.client = None
+        self.db = None
+        self.db_service = None
+
+    def pool_stats(self) -> Dict[str, int]:
+        """Статистика пула: open, checked_out, waiters, checkout_failures, pool_clears."""
+        stats = self.pool_listener.stats()
+        stats["max_pool_size"] = config.MONGO_MAX_POOL_SIZE
+        return stats
+
+
+resources = MongoResources()
+
+
+def get_db_service():
+    """Возвращает общий DatabaseService. Бросает RuntimeError, если ресурсы не запущены."""
+    if resources.db_service is None:
+        raise RuntimeError("Mongo resources are not started")
+    return resources.db_service
@@ -0,0 +1,147 @@
+from typing import Any, Dict, Iterator, List, Optional, TextIO
+from datetime import datetime
+import csv
+import json
+import logging
+import time
+
+from pymongo.errors import BulkWriteError
+
+from app.utils.phone import normalize_phone_batch
+
+logger = logging.getLogger(__name__)
+
+# Код ошибки дубликата уникального индекса
+DUPLICATE_KEY = 11000
+
+
+def iter_rows(fp: TextIO, fmt: str) -> Iterator[Dict[str, Any]]:
+    """Потоково читает CSV (с заголовком) или JSONL, не загружая файл целиком."""
+    if fmt == "csv":
+        yield from csv.DictReader(fp)
+        return
+    for line in fp:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield {"__error__": f"invalid json: {e}"}
+
+
+class UserImporter:
+    """
+    Импорт пользователей из CRM пачками:
+    нормализация телефонов пачкой, дедупликация по phone_number/telegram_id
+    одним запросом $in на пачку и insert_many(ordered=False).
+    Отклонённые строки пишутся в rejects (JSONL), а не копятся в памяти.
+    """
+
+    def __init__(self, db_service: Any, batch_size: int = 1000, rejects: Optional[TextIO] = None):
+        self.db_service = db_service
+        self.batch_size = batch_size
+        self.rejects = rejects
+        self.stats = {"rows": 0, "inserted": 0, "duplicates": 0, "rejected": 0}
+
+    def _reject(self, row_number: int, reason: str, row: Dict[str, Any]) -> None:
+        self.stats["rejected"] += 1
+        if self.rejects is not None:
+            self.rejects.write(json.dumps(
+                {"row": row_number, "reason": reason, "data": row}, ensure_ascii=False, default=str
+            ) + "\n")
+
+    async def _flush(self, batch: List[tuple]) -> None:
+        phones = normalize_phone_batch(row.get("phone_number") or row.get("phone") for _, row in batch)
+
+        candidates: List[tuple] = []
+        seen_phones = set()
+        seen_ids = set()
+        for (row_number, row), phone in zip(batch, phones):
+            if "__error__" in row:
+                self._reject(row_number, row["__error__"], row)
+                continue
+            try:
+                telegram_id = int(row.get("telegram_id"))
+            except (TypeError, ValueError):
+                self._reject(row_number, "invalid telegram_id", row)
+                continue
+            if phone is None:
+                self._reject(row_number, "invalid phone_number", row)
+                continue
+            if phone in seen_phones or telegram_id in seen_ids:
+                self.stats["duplicates"] += 1
+                continue
+            seen_phones.add(phone)
+            seen_ids.add(telegram_id)
+            candidates.append((row_number, row, telegram_id, phone))
+
+        if not candidates:
+            return
+
+        existing_phones = set()
+        existing_ids = set()
+        cursor = self.db_service.col_users.find(
+            {"$or": [
+                {"phone_number": {"$in": list(seen_phones)}},
+                {"telegram_id": {"$in": list(seen_ids)}}
+            ]},
+            projection={"_id": False, "phone_number": True, "telegram_id": True}
+        )
+        async for doc in cursor:
+            existing_phones.add(doc.get("phone_number"))
+            existing_ids.add(doc.get("telegram_id"))
+
+        now = datetime.now()
+        docs = []
+        for row_number, row, telegram_id, phone in candidates:
+            if phone in existing_phones or telegram_id in existing_ids:
+                self.stats["duplicates"] += 1
+                continue
+            docs.append({
+                "telegram_id": telegram_id,
+                "phone_number": phone,
+                "username": (row.get("username") or "").lstrip("@") or None,
+                "full_name": row.get("full_name") or None,
+                "referral_code": await self.db_service.generate_referral_code(),
+                "referrer_id": None,
+                "points": 0,
+                "is_activated": False,
+                "registration_date": now,
+                "refcode_deadline": None
+            })
+
+        if not docs:
+            return
+        try:
+            result = await self.db_service.col_users.insert_many(docs, ordered=False)
+            self.stats["inserted"] += len(result.inserted_ids)
+        except BulkWriteError as e:
+            details = e.details or {}
+            self.stats["inserted"] += details.get("nInserted", 0)
+            for error in details.get("writeErrors", []):
+                if error.get("code") == DUPLICATE_KEY:
+                    self.stats["duplicates"] += 1
+                else:
+                    self._reject(-1, error.get("errmsg", "write error"), docs[error["index"]])
+
+    async def run(self, fp: TextIO, fmt: str) -> Dict[str, Any]:
+        """Импортирует файл и возвращает отчёт с пропускной способностью."""
+        started = time.perf_counter()
+        batch: List[tuple] = []
+        for row_number, row in enumerate(iter_rows(fp, fmt), start=1):
+            self.stats["rows"] += 1
+            batch.append((row_number, row))
+            if len(batch) >= self.batch_size:
+                await self._flush(batch)
+                batch = []
+                if self.stats["rows"] % (self.batch_size * 100) == 0:
+                    logger.info(f"Import progress: {self.stats}")
+        if batch:
+            await self._flush(batch)
+
+        elapsed = time.perf_counter() - started
+        report = dict(self.stats)
+        report["elapsed_s"] = round(elapsed, 3)
+        report["rows_per_s"] = round(self.stats["rows"] / elapsed, 1) if elapsed else 0.0
+        return report
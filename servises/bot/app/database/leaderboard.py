@@ -0,0 +1,214 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from bisect import bisect_left, insort
+import asyncio
+import logging
+
+from pymongo import DESCENDING, ASCENDING, UpdateOne, ReturnDocument
+
+from app.database.monitoring import instrument
+
+logger = logging.getLogger(__name__)
+
+
+class TopN:
+    """
+    Отсортированный top-N в памяти: список (-score, member) + словарь member -> score.
+    Инвариант: любой участник вне списка стоит в рейтинге ниже последней записи списка
+    (с учётом тай-брейка по member), поэтому список всегда является корректным префиксом полного рейтинга.
+    """
+
+    def __init__(self, capacity: int = 100):
+        self.capacity = capacity
+        self._keys: List[Tuple[int, int]] = []
+        self._scores: Dict[int, int] = {}
+        # complete — в списке все участники коллекции (их меньше capacity)
+        self.complete = False
+        self.loaded = False
+
+    def load(self, items: Iterable[Tuple[int, int]]) -> None:
+        self._keys = []
+        self._scores = {}
+        for member, score in items:
+            self._scores[member] = score
+            self._keys.append((-score, member))
+        self._keys.sort()
+        del self._keys[self.capacity:]
+        self._scores = {member: -neg for neg, member in self._keys}
+        self.complete = len(self._keys) < self.capacity
+        self.loaded = True
+
+    def update(self, member: int, score: int) -> None:
+        """
+        Обновляет абсолютный счёт участника за O(log N + N) на сдвиг списка.
+        Порядок (-score, member) совпадает с сортировкой в БД (score desc, telegram_id asc):
+        участник входит в список, только если стоит строго выше его последней записи,
+        иначе при равном счёте он мог бы обогнать неизвестного участника вне списка.
+        """
+        old = self._scores.pop(member, None)
+        if old is not None:
+            index = bisect_left(self._keys, (-old, member))
+            del self._keys[index]
+
+        key = (-score, member)
+        if self.complete or (self._keys and key < self._keys[-1]):
+            insort(self._keys, key)
+            self._scores[member] = score
+            if len(self._keys) > self.capacity:
+                _, dropped = self._keys.pop()
+                self._scores.pop(dropped, None)
+                self.complete = False
+
+    def page(self, offset: int, limit: int) -> Optional[List[Tuple[int, int]]]:
+        """Страница из памяти или None, если она выходит за известный префикс."""
+        if not self.loaded:
+            return None
+        if offset + limit > len(self._keys) and not self.complete:
+            return None
+        return [(member, -neg) for neg, member in self._keys[offset:offset + limit]]
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+@instrument
+class Leaderboard:
+    """
+    Рейтинги по баллам и по числу активированных рефералов.
+    Рейтинг по баллам обновляется событиями ledger'а, по рефералам — через
+    rollup-коллекцию referrer_stats. Страница отдаётся из памяти за O(page);
+    хвост за пределами capacity читается из БД по индексу.
+    """
+
+    BOARDS = ("points", "referrers")
+
+    def __init__(self, col_users: Any, col_referrals: Any, col_referrer_stats: Any, capacity: int = 100):
+        self.col_users = col_users
+        self.col_referrals = col_referrals
+        self.col_referrer_stats = col_referrer_stats
+        self.points = TopN(capacity)
+        self.referrers = TopN(capacity)
+        self.capacity = capacity
+
+    async def rebuild(self) -> None:
+        """Перечитывает оба рейтинга из БД (по индексам points / activated_referrals)."""
+        cursor = self.col_users.find(
+            {}, projection={"_id": False, "telegram_id": True, "points": True}
+        ).sort([("points", DESCENDING), ("telegram_id", ASCENDING)]).limit(self.capacity)
+        self.points.load([(doc["telegram_id"], doc.get("points", 0)) async for doc in cursor])
+
+        if await self.col_referrer_stats.estimated_document_count() == 0:
+            await self.backfill_referrer_stats()
+        cursor = self.col_referrer_stats.find(
+            {}, projection={"_id": False, "telegram_id": True, "activated_referrals": True}
+        ).sort([("activated_referrals", DESCENDING), ("telegram_id", ASCENDING)]).limit(self.capacity)
+        self.referrers.load([(doc["telegram_id"], doc.get("activated_referrals", 0)) async for doc in cursor])
+
+    async def backfill_referrer_stats(self) -> None:
+        """Первичное заполнение rollup-коллекции из referrals (однократно)."""
+        pipeline = [
+            {"$match": {"status": "activated"}},
+            {"$group": {"_id": "$referrer_id", "count": {"$sum": 1}}},
+        ]
+        ops = []
+        async for row in self.col_referrals.aggregate(pipeline):
+            ops.append(UpdateOne(
+                {"telegram_id": row["_id"]},
+                {"$set": {"activated_referrals": row["count"]}},
+                upsert=True
+            ))
+            if len(ops) >= 1000:
+                await self.col_referrer_stats.bulk_write(ops, ordered=False)
+                ops = []
+        if ops:
+            await self.col_referrer_stats.bulk_write(ops, ordered=False)
+
+    def on_points(self, telegram_id: int, balance: int) -> None:
+        if self.points.loaded:
+            self.points.update(telegram_id, balance)
+
+    def mark_points_stale(self) -> None:
+        """Баланс изменён без известного итога (пакетные операции) — перечитать при запросе."""
+        self.points.loaded = False
+
+    async def on_referrals_activated(self, counts: Dict[int, int], session=None) -> Optional[Dict[int, int]]:
+        """
+        Увеличивает счётчики активированных рефералов у реферёров в БД.
+        Возвращает новые значения счётчиков (None — итог неизвестен) для apply_referrer_counts;
+        память здесь не трогается, чтобы повтор или откат транзакции её не портил.
+        """
+        if not counts:
+            return {}
+        if len(counts) == 1:
+            (referrer_id, count), = counts.items()
+            doc = await self.col_referrer_stats.find_one_and_update(
+                {"telegram_id": referrer_id},
+                {"$inc": {"activated_referrals": count}},
+                upsert=True,
+                projection={"_id": False, "activated_referrals": True},
+                return_document=ReturnDocument.AFTER,
+                session=session
+            )
+            return {referrer_id: doc["activated_referrals"]}
+        await self.col_referrer_stats.bulk_write([
+            UpdateOne({"telegram_id": referrer_id}, {"$inc": {"activated_referrals": count}}, upsert=True)
+            for referrer_id, count in counts.items()
+        ], ordered=False, session=session)
+        return None
+
+    def apply_referrer_counts(self, totals: Optional[Dict[int, int]]) -> None:
+        """Применяет к рейтингу в памяти итог on_referrals_activated (после фиксации транзакции)."""
+        if totals is None:
+            self.referrers.loaded = False
+        elif self.referrers.loaded:
+            for referrer_id, total in totals.items():
+                self.referrers.update(referrer_id, total)
+
+    async def top(self, board: str, offset: int = 0, limit: int = 10) -> List[Dict[str, Any]]:
+        """Страница рейтинга с именами пользователей: [{place, telegram_id, score, username, full_name}]."""
+        top_n = self.points if board == "points" else self.referrers
+        if not top_n.loaded:
+            await self.rebuild()
+        rows = top_n.page(offset, limit)
+        if rows is None:
+            rows = await self._page_from_db(board, offset, limit)
+
+        ids = [member for member, _ in rows]
+        names = {}
+        if ids:
+            async for doc in self.col_users.find(
+                {"telegram_id": {"$in": ids}},
+                projection={"_id": False, "telegram_id": True, "username": True, "full_name": True}
+            ):
+                names[doc["telegram_id"]] = doc
+        return [
+            {
+                "place": offset + i + 1,
+                "telegram_id": member,
+                "score": score,
+                "username": names.get(member, {}).get("username"),
+                "full_name": names.get(member, {}).get("full_name"),
+            }
+            for i, (member, score) in enumerate(rows)
+        ]
+
+    async def _page_from_db(self, board: str, offset: int, limit: int) -> List[Tuple[int, int]]:
+        if board == "points":
+            col, field = self.col_users, "points"
+        else:
+            col, field = self.col_referrer_stats, "activated_referrals"
+        cursor = col.find(
+            {}, projection={"_id": False, "telegram_id": True, field: True}
+        ).sort([(field, DESCENDING), ("telegram_id", ASCENDING)]).skip(offset).limit(limit)
+        return [(doc["telegram_id"], doc.get(field, 0)) async for doc in cursor]
+
+
+async def rebuild_leaderboard_periodically(leaderboard: Leaderboard, interval: float = 300.0) -> None:
+    """Периодическая сверка с БД: подхватывает изменения, сделанные другими репликами."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await leaderboard.rebuild()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Leaderboard rebuild failed: {e}")
@@ -0,0 +1,51 @@
+from typing import Any, Dict, Optional
+from datetime import datetime, timedelta
+import os
+import socket
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+# Идентификатор текущего процесса как владельца аренды
+OWNER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class Lease:
+    """
+    Аренда-документ в коллекции leases: фоновую задачу в один момент времени
+    выполняет только одна реплика. Документ также хранит checkpoint задачи.
+    """
+
+    def __init__(self, col_leases: Any, name: str, ttl: float, owner: str = OWNER_ID):
+        self.col_leases = col_leases
+        self.name = name
+        self.ttl = ttl
+        self.owner = owner
+
+    async def acquire(self) -> Optional[Dict[str, Any]]:
+        """Захватывает или продлевает аренду. Возвращает документ аренды или None, если она занята."""
+        now = datetime.now()
+        try:
+            return await self.col_leases.find_one_and_update(
+                {"_id": self.name, "$or": [{"owner": self.owner}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"owner": self.owner, "expires_at": now + timedelta(seconds=self.ttl)}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Документ существует и принадлежит другой живой реплике
+            return None
+
+    async def save_checkpoint(self, checkpoint: Dict[str, Any]) -> bool:
+        """Сохраняет checkpoint, только пока аренда принадлежит нам."""
+        result = await self.col_leases.update_one(
+            {"_id": self.name, "owner": self.owner},
+            {"$set": {"checkpoint": checkpoint}}
+        )
+        return result.matched_count == 1
+
+    async def release(self) -> None:
+        await self.col_leases.update_one(
+            {"_id": self.name, "owner": self.owner},
+            {"$set": {"expires_at": datetime.now()}}
+        )
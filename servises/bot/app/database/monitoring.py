@@ -0,0 +1,231 @@
+from typing import Any, Dict, List, Optional, Tuple
+from contextvars import ContextVar
+from collections import deque
+import asyncio
+import functools
+import inspect
+import json
+import logging
+import random
+import threading
+import time
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+# Метод DatabaseService (или другого инструментированного класса), выполняющий команду.
+# motor копирует контекст в поток исполнителя, поэтому значение видно в listener'е.
+current_db_method: ContextVar[str] = ContextVar("current_db_method", default="-")
+
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+EXPLAINABLE = {"find", "aggregate", "count", "distinct", "update", "delete", "findAndModify"}
+# Служебные поля, которые нельзя передавать в explain
+_STRIP_FIELDS = {"lsid", "$clusterTime", "$db", "txnNumber", "autocommit", "startTransaction", "$readPreference"}
+
+
+def instrument(cls):
+    """
+    Декоратор класса: каждый публичный async-метод помечает выполняемые
+    в нём команды Mongo своим именем (внешний вызов имеет приоритет).
+    """
+    for name, fn in list(vars(cls).items()):
+        if name.startswith("__") or not inspect.iscoroutinefunction(fn):
+            continue
+        tag = f"{cls.__name__}.{name}"
+
+        def wrap(fn=fn, tag=tag):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                if current_db_method.get() != "-":
+                    return await fn(*args, **kwargs)
+                token = current_db_method.set(tag)
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    current_db_method.reset(token)
+            return wrapper
+
+        setattr(cls, name, wrap())
+    return cls
+
+
+class LatencyHistogram:
+    __slots__ = ("buckets", "count", "total_ms", "max_ms", "docs")
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.docs = 0
+
+    def observe(self, ms: float, docs: int) -> None:
+        index = 0
+        while index < len(LATENCY_BUCKETS_MS) and ms > LATENCY_BUCKETS_MS[index]:
+            index += 1
+        self.buckets[index] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.docs += docs
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def quantile(self, q: float) -> float:
+        """Оценка квантиля по верхней границе корзины."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for index, bucket in enumerate(self.buckets):
+            seen += bucket
+            if seen >= target:
+                return float(LATENCY_BUCKETS_MS[index]) if index < len(LATENCY_BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "total_ms": round(self.total_ms, 3),
+            "avg_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "max_ms": round(self.max_ms, 3),
+            "docs": self.docs,
+        }
+
+
+def _reply_docs(reply: Dict[str, Any]) -> int:
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch") or cursor.get("nextBatch") or ())
+    n = reply.get("n")
+    return n if isinstance(n, int) else 0
+
+
+class CommandStats(monitoring.CommandListener):
+    """
+    CommandListener: гистограммы латентности и число документов по
+    (метод, команда); медленные команды выборочно отправляются на explain.
+    """
+
+    def __init__(self, slow_ms: float = 50.0, explain_sample_rate: float = 0.1, keep_samples: int = 50):
+        self.slow_ms = slow_ms
+        self.explain_sample_rate = explain_sample_rate
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple[Any, int], Tuple[str, Optional[Dict[str, Any]], str]] = {}
+        self.histograms: Dict[Tuple[str, str], LatencyHistogram] = {}
+        self.failures: Dict[Tuple[str, str], int] = {}
+        self.slow_samples: deque = deque(maxlen=keep_samples)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._explain_queue: Optional[asyncio.Queue] = None
+
+    def bind(self, loop: asyncio.AbstractEventLoop) -> asyncio.Queue:
+        self._loop = loop
+        self._explain_queue = asyncio.Queue(maxsize=100)
+        return self._explain_queue
+
+    def started(self, event):
+        method = current_db_method.get()
+        command = None
+        if event.command_name in EXPLAINABLE and method != "explain":
+            command = {k: v for k, v in event.command.items() if k not in _STRIP_FIELDS}
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = (method, command, event.database_name)
+
+    def succeeded(self, event):
+        with self._lock:
+            method, command, database = self._pending.pop((event.connection_id, event.request_id), ("-", None, ""))
+            ms = event.duration_micros / 1000
+            key = (method, event.command_name)
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = LatencyHistogram()
+            histogram.observe(ms, _reply_docs(event.reply))
+
+        if ms >= self.slow_ms and command is not None and random.random() < self.explain_sample_rate:
+            sample = {"method": method, "command": event.command_name, "ms": round(ms, 3), "database": database}
+            if self._loop is not None and self._explain_queue is not None:
+                self._loop.call_soon_threadsafe(self._enqueue, sample, command)
+            else:
+                self.slow_samples.append(sample)
+
+    def failed(self, event):
+        with self._lock:
+            method, _, _ = self._pending.pop((event.connection_id, event.request_id), ("-", None, ""))
+            key = (method, event.command_name)
+            self.failures[key] = self.failures.get(key, 0) + 1
+
+    def _enqueue(self, sample: Dict[str, Any], command: Dict[str, Any]) -> None:
+        try:
+            self._explain_queue.put_nowait((sample, command))
+        except asyncio.QueueFull:
+            self.slow_samples.append(sample)
+
+    async def explain_worker(self, client: Any) -> None:
+        """Выполняет explain для сэмплов медленных команд и сохраняет выигравший план."""
+        queue = self._explain_queue or self.bind(asyncio.get_running_loop())
+        while True:
+            sample, command = await queue.get()
+            token = current_db_method.set("explain")
+            try:
+                result = await client[sample["database"]].command(
+                    {"explain": command, "verbosity": "queryPlanner"}
+                )
+                winning = (result.get("queryPlanner") or {}).get("winningPlan", {})
+                sample["plan"] = _plan_stages(winning)
+                sample["collscan"] = "COLLSCAN" in sample["plan"]
+            except Exception as e:
+                sample["explain_error"] = str(e)
+            finally:
+                current_db_method.reset(token)
+            sample["filter"] = json.dumps(command.get("filter") or command.get("pipeline") or command.get("q"), default=str)[:500]
+            self.slow_samples.append(sample)
+
+    def top_offenders(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Пары (метод, команда) с наибольшим суммарным временем в БД."""
+        with self._lock:
+            items = [
+                {"method": method, "command": command, **histogram.as_dict(),
+                 "failures": self.failures.get((method, command), 0)}
+                for (method, command), histogram in self.histograms.items()
+            ]
+        items.sort(key=lambda item: item["total_ms"], reverse=True)
+        return items[:limit]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "slow_ms": self.slow_ms,
+            "top": self.top_offenders(50),
+            "slow_samples": list(self.slow_samples),
+        }
+
+    def dump(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2, default=str)
+
+
+def _plan_stages(plan: Dict[str, Any]) -> str:
+    """Цепочка стадий плана: FETCH <- IXSCAN и т.п."""
+    stages = []
+    node: Optional[Dict[str, Any]] = plan
+    while node:
+        stage = node.get("stage")
+        if stage:
+            stages.append(stage + (f"({node['indexName']})" if node.get("indexName") else ""))
+        node = node.get("inputStage") or (node.get("inputStages") or [None])[0]
+    return " <- ".join(stages)
+
+
+async def dump_stats_periodically(stats: CommandStats, path: str, interval: float = 300.0) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            stats.dump(path)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Failed to dump Mongo command stats: {e}")
@@ -0,0 +1,263 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from datetime import datetime, timedelta
+import asyncio
+import logging
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+from pymongo import ASCENDING, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from app.database.leases import Lease
+from app.metrics.bot import NOTIFICATIONS_TOTAL, NOTIFICATIONS_COALESCED
+from app.utils.ratelimit import SendLimiter
+
+logger = logging.getLogger(__name__)
+
+LEASE_NAME = "notifications_sender"
+# Сколько последних событий хранится в документе для перечисления имён
+MAX_ITEMS = 20
+MAX_ATTEMPTS = 5
+FINISHED_TTL = int(timedelta(days=3).total_seconds())
+
+REFCODE_REMINDER_TEXT = (
+    "⏰ Скоро истекает время для ввода реферального кода!\n"
+    "Успейте получить 100 баллов: отправьте /refcode и введите код."
+)
+
+
+def display_name(user: Dict[str, Any]) -> str:
+    if user.get("full_name"):
+        return user["full_name"]
+    if user.get("username"):
+        return f"@{user['username']}"
+    return str(user.get("telegram_id", ""))
+
+
+def _names(items: List[Dict[str, Any]], kind: str, total: int) -> str:
+    names = [item["name"] for item in items if item.get("kind") == kind and item.get("name")]
+    text = ", ".join(names)
+    if total > len(names):
+        text += f" и ещё {total - len(names)}"
+    return text
+
+
+def render_notification(doc: Dict[str, Any]) -> str:
+    """Собирает одно сообщение из всех накопленных событий документа."""
+    counts = doc.get("counts") or {}
+    points = doc.get("points") or {}
+    items = doc.get("items") or []
+    parts = []
+
+    joined = counts.get("referral_joined", 0)
+    if joined == 1:
+        parts.append(
+            f"🎉 По вашему реферальному коду зарегистрировался {_names(items, 'referral_joined', 1)}!\n"
+            f"💰 Вам начислено +{points.get('referral_joined', 0)} баллов."
+        )
+    elif joined > 1:
+        parts.append(
+            f"🎉 По вашему реферальному коду зарегистрировались {joined} человек: "
+            f"{_names(items, 'referral_joined', joined)}.\n"
+            f"💰 Вам начислено +{points.get('referral_joined', 0)} баллов."
+        )
+
+    activated = counts.get("referral_activated", 0)
+    if activated == 1:
+        parts.append(
+            f"✅ Ваш реферал {_names(items, 'referral_activated', 1)} активирован!\n"
+            f"💰 Вам начислено +{points.get('referral_activated', 0)} баллов."
+        )
+    elif activated > 1:
+        parts.append(
+            f"✅ Активированы {activated} ваших рефералов: {_names(items, 'referral_activated', activated)}.\n"
+            f"💰 Вам начислено +{points.get('referral_activated', 0)} баллов."
+        )
+
+    if counts.get("refcode_reminder"):
+        parts.append(REFCODE_REMINDER_TEXT)
+    return "\n\n".join(parts)
+
+
+class NotificationQueue:
+    """
+    Персистентная очередь уведомлений в коллекции notifications.
+
+    На чат существует не больше одного документа в статусе pending (частичный
+    уникальный индекс): новые события дописываются в него ($inc счётчиков,
+    $push последних имён), поэтому всплеск рефералов у одного пользователя
+    превращается в одно сообщение. Отправитель забирает документ (pending -> sending),
+    соблюдая глобальный и по-чатовый лимиты SendLimiter; на 429 ставит глобальную
+    паузу retry_after и возвращает документ в очередь. Отправляет одна реплика (аренда).
+    """
+
+    def __init__(self, collection: Any, col_leases: Any, lease_ttl: float = 60.0):
+        self.collection = collection
+        self.lease = Lease(col_leases, LEASE_NAME, lease_ttl)
+        self._wakeup = asyncio.Event()
+
+    async def ensure_indexes(self) -> None:
+        await self.collection.create_index([("status", ASCENDING), ("not_before", ASCENDING)], name="status_not_before")
+        await self.collection.create_index(
+            "chat_id", unique=True, partialFilterExpression={"status": "pending"}, name="pending_per_chat"
+        )
+        await self.collection.create_index("finished_at", expireAfterSeconds=FINISHED_TTL, name="finished_ttl")
+
+    @staticmethod
+    def _merge_update(items: List[Dict[str, Any]], counts: Dict[str, int], points: Dict[str, int], now: datetime) -> Dict[str, Any]:
+        inc: Dict[str, int] = {f"counts.{kind}": value for kind, value in counts.items()}
+        inc.update({f"points.{kind}": value for kind, value in points.items() if value})
+        return {
+            "$push": {"items": {"$each": items, "$slice": -MAX_ITEMS}},
+            "$inc": inc,
+            "$setOnInsert": {"created_at": now, "not_before": now, "attempts": 0}
+        }
+
+    @classmethod
+    def _item_update(cls, item: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+        kind = item["kind"]
+        return cls._merge_update([item], {kind: 1}, {kind: item.get("points", 0)}, now)
+
+    async def enqueue(self, chat_id: int, item: Dict[str, Any]) -> None:
+        """Добавляет событие {kind, name?, points?} к ожидающему уведомлению чата."""
+        update = self._item_update(item, datetime.now())
+        try:
+            await self.collection.update_one({"chat_id": chat_id, "status": "pending"}, update, upsert=True)
+        except DuplicateKeyError:
+            # Параллельный upsert уже создал документ — повтор попадёт в него
+            await self.collection.update_one({"chat_id": chat_id, "status": "pending"}, update, upsert=True)
+        self._wakeup.set()
+
+    async def enqueue_many(self, entries: Iterable[Tuple[int, Dict[str, Any]]]) -> int:
+        """Пакетная постановка: один bulk_write на все (chat_id, item)."""
+        now = datetime.now()
+        entries = list(entries)
+        if not entries:
+            return 0
+        requests = [
+            UpdateOne({"chat_id": chat_id, "status": "pending"}, self._item_update(item, now), upsert=True)
+            for chat_id, item in entries
+        ]
+        try:
+            await self.collection.bulk_write(requests, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                if error.get("code") != 11000:
+                    raise
+                chat_id, item = entries[error["index"]]
+                await self.enqueue(chat_id, item)
+        self._wakeup.set()
+        return len(entries)
+
+    async def recover(self, stale_after: float = 300.0) -> int:
+        """Возвращает в очередь документы, застрявшие в sending после падения процесса."""
+        stale = await self.collection.find(
+            {"status": "sending", "claimed_at": {"$lt": datetime.now() - timedelta(seconds=stale_after)}}
+        ).to_list(length=None)
+        for doc in stale:
+            await self._requeue(doc, 0.0)
+        return len(stale)
+
+    async def _claim(self) -> Optional[Dict[str, Any]]:
+        now = datetime.now()
+        return await self.collection.find_one_and_update(
+            {"status": "pending", "not_before": {"$lte": now}},
+            {"$set": {"status": "sending", "claimed_at": now}},
+            sort=[("not_before", ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _requeue(self, doc: Dict[str, Any], delay: float, attempt: bool = False) -> None:
+        now = datetime.now()
+        update: Dict[str, Any] = {"$set": {"status": "pending", "not_before": now + timedelta(seconds=delay)}}
+        if attempt:
+            update["$inc"] = {"attempts": 1}
+        while True:
+            try:
+                await self.collection.update_one({"_id": doc["_id"]}, update)
+                return
+            except DuplicateKeyError:
+                pass
+            # Пока документ отправлялся, для чата накопился новый pending — сливаем в него
+            result = await self.collection.update_one(
+                {"chat_id": doc["chat_id"], "status": "pending"},
+                self._merge_update(doc.get("items") or [], doc.get("counts") or {}, doc.get("points") or {}, now)
+            )
+            if result.matched_count == 1:
+                await self.collection.delete_one({"_id": doc["_id"]})
+                return
+            # pending успели забрать на отправку — удалять свой документ нельзя, пробуем вернуть его снова
+
+    async def _finish(self, doc: Dict[str, Any], status: str, error: Optional[str] = None) -> None:
+        await self.collection.update_one(
+            {"_id": doc["_id"]},
+            {"$set": {"status": status, "finished_at": datetime.now(), "error": error}}
+        )
+
+    async def _deliver(self, bot: Bot, limiter: SendLimiter, doc: Dict[str, Any]) -> None:
+        text = render_notification(doc)
+        if not text:
+            await self._finish(doc, "sent")
+            return
+        try:
+            await bot.send_message(doc["chat_id"], text)
+        except TelegramRetryAfter as e:
+            NOTIFICATIONS_TOTAL.inc("retry_after")
+            limiter.retry_after(e.retry_after)
+            await self._requeue(doc, e.retry_after)
+        except (TelegramForbiddenError, TelegramBadRequest) as e:
+            NOTIFICATIONS_TOTAL.inc("rejected")
+            await self._finish(doc, "failed", str(e))
+        except Exception as e:
+            if doc.get("attempts", 0) + 1 >= MAX_ATTEMPTS:
+                NOTIFICATIONS_TOTAL.inc("failed")
+                logger.warning(f"Notification to {doc['chat_id']} dropped after {MAX_ATTEMPTS} attempts: {e}")
+                await self._finish(doc, "failed", str(e))
+            else:
+                NOTIFICATIONS_TOTAL.inc("error")
+                await self._requeue(doc, 2 ** doc.get("attempts", 0), attempt=True)
+        else:
+            NOTIFICATIONS_TOTAL.inc("sent")
+            NOTIFICATIONS_COALESCED.observe(sum((doc.get("counts") or {}).values()))
+            await self._finish(doc, "sent")
+
+    async def run(self, bot: Bot, limiter: SendLimiter, concurrency: int = 8, poll_interval: float = 5.0) -> None:
+        """Цикл отправителя: работает, пока процесс держит аренду."""
+        slots = asyncio.Semaphore(concurrency)
+        tasks: set = set()
+        lease_renewed_at = 0.0
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                if loop.time() - lease_renewed_at > self.lease.ttl / 3:
+                    if await self.lease.acquire() is None:
+                        await asyncio.sleep(poll_interval)
+                        continue
+                    lease_renewed_at = loop.time()
+                    count = await self.recover()
+                    if count:
+                        logger.info(f"Requeued {count} interrupted notifications")
+
+                # Сбрасываем до claim: enqueue, пришедший после пустого claim, разбудит ожидание
+                self._wakeup.clear()
+                doc = await self._claim()
+                if doc is None:
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                delay = limiter.chats.delay(doc["chat_id"])
+                if delay > 0:
+                    await self._requeue(doc, delay)
+                    continue
+                limiter.chats.reserve(doc["chat_id"])
+                await limiter.global_bucket.acquire()
+                await slots.acquire()
+                task = asyncio.create_task(self._deliver(bot, limiter, doc))
+                tasks.add(task)
+                task.add_done_callback(lambda t: (tasks.discard(t), slots.release()))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Notification sender iteration failed: {e}")
+                await asyncio.sleep(poll_interval)
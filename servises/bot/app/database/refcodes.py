@@ -0,0 +1,126 @@
+from typing import Any, Optional
+import asyncio
+import hashlib
+import logging
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+CODE_LENGTH = 8
+# Пространство кодов ^[A-Z0-9]{8}$ (см. schemas/users.json)
+DOMAIN = len(ALPHABET) ** CODE_LENGTH
+# Сеть Фейстеля работает на 42 битах (2^42 > 36^8), лишнее отсекается cycle-walking
+_HALF_BITS = 21
+_HALF_MASK = (1 << _HALF_BITS) - 1
+_ROUNDS = 4
+
+COUNTER_ID = "referral_code"
+
+
+class CodePermutation:
+    """
+    Ключевая биекция [0, DOMAIN) -> [0, DOMAIN): сеть Фейстеля + cycle-walking.
+    Разные номера счётчика всегда дают разные коды, поэтому коллизий нет
+    по построению, а коды не выглядят последовательными.
+    """
+
+    def __init__(self, secret: bytes):
+        self._keys = [
+            hashlib.blake2b(secret, digest_size=16, person=f"refcode{i}".encode()).digest()
+            for i in range(_ROUNDS)
+        ]
+
+    def _round(self, i: int, value: int) -> int:
+        digest = hashlib.blake2b(value.to_bytes(4, "big"), digest_size=4, key=self._keys[i]).digest()
+        return int.from_bytes(digest, "big") & _HALF_MASK
+
+    def _feistel(self, value: int) -> int:
+        left, right = value >> _HALF_BITS, value & _HALF_MASK
+        for i in range(_ROUNDS):
+            left, right = right, left ^ self._round(i, right)
+        return (left << _HALF_BITS) | right
+
+    def permute(self, n: int) -> int:
+        if not 0 <= n < DOMAIN:
+            raise ValueError(f"counter value out of range: {n}")
+        value = self._feistel(n)
+        while value >= DOMAIN:
+            value = self._feistel(value)
+        return value
+
+    @staticmethod
+    def encode(value: int) -> str:
+        chars = []
+        for _ in range(CODE_LENGTH):
+            value, rem = divmod(value, len(ALPHABET))
+            chars.append(ALPHABET[rem])
+        return "".join(reversed(chars))
+
+    def code(self, n: int) -> str:
+        return self.encode(self.permute(n))
+
+
+class ReferralCodeAllocator:
+    """
+    Выдаёт короткие реферальные коды без повторов при DuplicateKeyError.
+    Номера берутся блоками из счётчика в коллекции counters (один
+    find_one_and_update на block_size регистраций), блок пополняется
+    в фоне, когда остаток падает ниже половины.
+    """
+
+    def __init__(self, col_counters: Any, secret: bytes, block_size: int = 100):
+        self.col_counters = col_counters
+        self.permutation = CodePermutation(secret)
+        self.block_size = block_size
+        self._next = 0
+        self._end = 0
+        self._pending: Optional[range] = None
+        self._lock = asyncio.Lock()
+        self._refill_task: Optional[asyncio.Task] = None
+
+    async def _reserve_block(self) -> range:
+        doc = await self.col_counters.find_one_and_update(
+            {"_id": COUNTER_ID},
+            {"$inc": {"seq": self.block_size}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        end = doc["seq"]
+        return range(end - self.block_size, end)
+
+    async def _refill(self) -> None:
+        async with self._lock:
+            if self._pending is None:
+                self._pending = await self._reserve_block()
+
+    def _take_pending(self) -> bool:
+        if self._next < self._end:
+            # Текущий блок ещё не исчерпан другим вызовом
+            return True
+        if self._pending is None:
+            return False
+        self._next, self._end = self._pending.start, self._pending.stop
+        self._pending = None
+        return True
+
+    @staticmethod
+    def _log_refill_error(task: asyncio.Task) -> None:
+        # Сбой фонового пополнения не фатален: allocate дозапросит блок синхронно
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Referral code block prefetch failed: {task.exception()!r}")
+
+    async def allocate(self) -> str:
+        while True:
+            if self._next < self._end:
+                n = self._next
+                self._next += 1
+                if self._end - self._next < self.block_size // 2 and self._pending is None:
+                    if self._refill_task is None or self._refill_task.done():
+                        self._refill_task = asyncio.create_task(self._refill())
+                        self._refill_task.add_done_callback(self._log_refill_error)
+                return self.permutation.code(n)
+            if not self._take_pending():
+                await self._refill()
+                self._take_pending()
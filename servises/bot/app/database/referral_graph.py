@@ -0,0 +1,142 @@
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime, timedelta
+import asyncio
+import heapq
+import logging
+import time
+
+from bson import ObjectId
+
+logger = logging.getLogger(__name__)
+
+# ObjectId генерирует клиент: у реплик с расхождением часов и у медленных вставок
+# _id приходит не по порядку, поэтому инкрементальная догрузка перечитывает это окно
+SYNC_OVERLAP = timedelta(minutes=5)
+
+
+class ReferralGraph:
+    """
+    Инкрементальный индекс смежности реферальной сети, построенный по referrals.
+    Размеры поддеревьев и число рефералов второго уровня поддерживаются при
+    добавлении ребра (O(глубина)), поэтому запросы размера — O(1),
+    дерево ограниченной глубины — O(размер результата).
+    """
+
+    def __init__(self):
+        self.children: Dict[int, List[int]] = {}
+        self.parent: Dict[int, int] = {}
+        self.subtree: Dict[int, int] = {}       # число потомков (без самого узла)
+        self.second_level: Dict[int, int] = {}  # число рефералов второго уровня
+        self.last_seen: Optional[datetime] = None  # самое позднее время создания среди прочитанных _id
+        self.loaded = False
+
+    def add_edge(self, referrer_id: int, referred_id: int) -> bool:
+        """Добавляет ребро referrer -> referred. Повторное или второе родительское ребро игнорируется."""
+        if referred_id in self.parent or referrer_id == referred_id:
+            return False
+        self.parent[referred_id] = referrer_id
+        self.children.setdefault(referrer_id, []).append(referred_id)
+
+        grandparent = self.parent.get(referrer_id)
+        if grandparent is not None:
+            self.second_level[grandparent] = self.second_level.get(grandparent, 0) + 1
+        # Рёбра могут прийти не по порядку: у referred уже могут быть свои рефералы
+        grandchildren = len(self.children.get(referred_id, ()))
+        if grandchildren:
+            self.second_level[referrer_id] = self.second_level.get(referrer_id, 0) + grandchildren
+
+        added = 1 + self.subtree.get(referred_id, 0)
+        node: Optional[int] = referrer_id
+        seen = {referred_id}
+        while node is not None and node not in seen:
+            seen.add(node)
+            self.subtree[node] = self.subtree.get(node, 0) + added
+            node = self.parent.get(node)
+        return True
+
+    def direct(self, telegram_id: int) -> List[int]:
+        return list(self.children.get(telegram_id, ()))
+
+    def subtree_size(self, telegram_id: int) -> int:
+        """Число всех рефералов пользователя на любой глубине."""
+        return self.subtree.get(telegram_id, 0)
+
+    def tree(self, telegram_id: int, max_depth: int = 3, limit: int = 1000) -> List[Tuple[int, int]]:
+        """Обход в ширину до max_depth: список (telegram_id, уровень), не больше limit узлов."""
+        result: List[Tuple[int, int]] = []
+        frontier = [telegram_id]
+        seen = {telegram_id}
+        for level in range(1, max_depth + 1):
+            next_frontier = []
+            for node in frontier:
+                for child in self.children.get(node, ()):
+                    if child in seen:
+                        continue
+                    seen.add(child)
+                    result.append((child, level))
+                    if len(result) >= limit:
+                        return result
+                    next_frontier.append(child)
+            if not next_frontier:
+                break
+            frontier = next_frontier
+        return result
+
+    def top_second_level(self, limit: int = 10) -> List[Tuple[int, int]]:
+        """Кто привёл больше всего рефералов второго уровня: [(telegram_id, count)]."""
+        return heapq.nlargest(limit, self.second_level.items(), key=lambda item: (item[1], -item[0]))
+
+    async def sync(self, col_referrals: Any, batch_size: int = 5000, overlap: timedelta = SYNC_OVERLAP) -> int:
+        """
+        Догружает рёбра с _id не старше last_seen - overlap (первый вызов строит индекс целиком).
+        Уже известные рёбра add_edge пропускает. Возвращает число добавленных рёбер.
+        """
+        query: Dict[str, Any] = {}
+        if self.last_seen is not None:
+            query = {"_id": {"$gte": ObjectId.from_datetime(self.last_seen - overlap)}}
+        cursor = col_referrals.find(
+            query, projection={"_id": True, "referrer_id": True, "referred_user_id": True}
+        ).sort("_id", 1).batch_size(batch_size)
+        added = 0
+        async for doc in cursor:
+            if self.add_edge(doc["referrer_id"], doc["referred_user_id"]):
+                added += 1
+            created = doc["_id"].generation_time
+            if self.last_seen is None or created > self.last_seen:
+                self.last_seen = created
+        self.loaded = True
+        return added
+
+    async def rebuild(self, col_referrals: Any, batch_size: int = 5000) -> int:
+        """
+        Строит индекс заново и подменяет текущий: подбирает рёбра, вставленные
+        с задержкой больше окна overlap. Возвращает число рёбер.
+        """
+        fresh = ReferralGraph()
+        edges = await fresh.sync(col_referrals, batch_size)
+        self.children = fresh.children
+        self.parent = fresh.parent
+        self.subtree = fresh.subtree
+        self.second_level = fresh.second_level
+        self.last_seen = fresh.last_seen
+        self.loaded = True
+        return edges
+
+
+async def sync_referral_graph_periodically(graph: ReferralGraph, col_referrals: Any, interval: float = 60.0,
+                                           rebuild_interval: float = 3600.0) -> None:
+    """Подтягивает рёбра, созданные другими репликами; раз в rebuild_interval перестраивает индекс целиком."""
+    last_rebuild = time.monotonic()
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if time.monotonic() - last_rebuild >= rebuild_interval:
+                edges = await graph.rebuild(col_referrals)
+                last_rebuild = time.monotonic()
+                logger.debug(f"Referral graph rebuilt: {edges} edges")
+            else:
+                await graph.sync(col_referrals)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Referral graph sync failed: {e}")
@@ -1,106 +1,291 @@
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple, Callable, Awaitable
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from pymongo import ASCENDING, DESCENDING
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, UpdateOne, ReturnDocument, IndexModel
+from pymongo.errors import DuplicateKeyError, PyMongoError, CollectionInvalid
 from pathlib import Path
 import json
 import logging
+import asyncio
+import copy
+import hashlib
+import time
 from datetime import datetime, timedelta
 import random
 import string
-import uuid
+from app.database.cache import TTLCache, get_request_memo
+from app.database.admins import AdminRegistry
+from app.database.refcodes import ReferralCodeAllocator
+from app.database.leaderboard import Leaderboard
+from app.database.referral_graph import ReferralGraph
+from app.database.notifications import NotificationQueue, display_name
+from app.database.broadcasts import BroadcastEngine
+from app.utils.timing import StageTimer
+from app.database.monitoring import instrument
 
+
+# Документ в meta с хэшем применённых схем
+SCHEMAS_META_ID = "schemas"
+
+# Поля, которые показывает /users
+USER_LIST_PROJECTION = {"_id": False, "telegram_id": True, "username": True, "full_name": True, "is_premium": True}
+
+# Бюджет времени БД на одно применение реферального кода
+REFERRAL_SLOW_MS = 20.0
+
+# Начисления реферальной программы (баллы): ledger, балансы и уведомления берут их отсюда
+REFCODE_BONUS_POINTS = 100        # новому пользователю за ввод кода
+REFERRER_JOIN_POINTS = 25         # рефереру за регистрацию по его коду
+REFERRER_ACTIVATION_POINTS = 75   # рефереру за активацию реферала
+
+
+class ReferralConflict(Exception):
+    """Реферальная связь не может быть применена (гонка или изменившиеся данные)."""
+
+
+@instrument
 class DatabaseService:
-    def __init__(self, db: AsyncIOMotorDatabase):
+    def __init__(
+        self,
+        db: AsyncIOMotorDatabase,
+        message_cache: Optional[TTLCache] = None,
+        user_cache: Optional[TTLCache] = None,
+        referral_code_secret: bytes = b"reflbot-referral-codes"
+    ):
         self.db = db
+        self.message_cache = message_cache if message_cache is not None else TTLCache()
+        # maxsize=0 отключает кэш пользователей (остаётся только мемо в рамках апдейта)
+        self.user_cache = user_cache if user_cache is not None else TTLCache(maxsize=10_000, ttl=5.0)
         self.col_messages = self.db.get_collection("messages")
         self.col_users = self.db.get_collection("users")
         self.col_referrals = self.db.get_collection("referrals")
         self.col_admins = self.db.get_collection("admins")
         self.col_point_transactions = self.db.get_collection("point_transactions")
+        self.col_meta = self.db.get_collection("meta")
+        self.col_counters = self.db.get_collection("counters")
+        self.referral_codes = ReferralCodeAllocator(self.col_counters, referral_code_secret)
+        self.col_referrer_stats = self.db.get_collection("referrer_stats")
+        self.leaderboard = Leaderboard(self.col_users, self.col_referrals, self.col_referrer_stats)
+        self.referral_graph = ReferralGraph()
+        self.notifications = NotificationQueue(self.db.get_collection("notifications"), self.db.get_collection("leases"))
+        self.broadcasts = BroadcastEngine(
+            self.db.get_collection("broadcasts"), self.col_users, self.db.get_collection("leases")
+        )
+        self.admins = AdminRegistry()
+        self._transactions_supported: Optional[bool] = None
 
+    async def _ensure_collection(self, name: str, existing: Optional[set] = None) -> None:
+        if existing is None:
+            existing = set(await self.db.list_collection_names())
+        if name not in existing:
+            try:
+                await self.db.create_collection(name)
+            except CollectionInvalid:
+                # Коллекцию успела создать другая реплика
+                pass
+
+    async def _apply_schema_spec(self, spec: Dict[str, Any], existing: set) -> None:
+        """Применяет одну спецификацию: collMod с валидатором и индексы одной командой."""
+        if "collMod" in spec:
+            coll_name = spec.get("collMod")
+            if coll_name:
+                await self._ensure_collection(coll_name, existing)
+                await self.db.command(spec)
+            return
+
+        collection = spec.get("collection")
+        if not collection:
+            return
+        await self._ensure_collection(collection, existing)
+
+        validator = spec.get("validator")
+        if validator:
+            await self.db.command({
+                "collMod": collection,
+                "validator": validator,
+                "validationLevel": spec.get("validationLevel", "moderate")
+            })
+
+        models = []
+        for index in spec.get("indexes", []):
+            keys = index.get("keys")
+            options = index.get("options", {})
+            if not keys:
+                continue
+            key_list = [(field, ASCENDING if order >= 0 else DESCENDING) for field, order in keys]
+            # Опции передаются целиком (partialFilterExpression, collation и т.д.), иначе индекс молча создастся другим
+            models.append(IndexModel(key_list, **{name: value for name, value in options.items() if value is not None}))
+        if models:
+            await self.db.get_collection(collection).create_indexes(models)
+
+    async def init_business_schemas_and_indexes(self) -> Dict[str, Any]:
+        """
+        Применяет JSON-схемы (collMod) и создаёт индексы для бизнес-коллекций.
+        Хэш набора схем хранится в meta: если он не изменился, DDL не выполняется.
+        Изменившиеся файлы применяются параллельно; возвращается отчёт
+        с временем по каждому файлу и ошибками.
+        """
+        started = time.perf_counter()
+        report: Dict[str, Any] = {"skipped": False, "applied": [], "failed": {}, "timings_ms": {}}
+        schemas_dir = Path(__file__).resolve().parent / "schemas"
+        specs: Dict[str, Dict[str, Any]] = {}
+        file_hashes: Dict[str, str] = {}
+        for schema_file in sorted(schemas_dir.glob("*.json")) if schemas_dir.exists() else []:
+            raw = schema_file.read_bytes()
+            try:
+                specs[schema_file.name] = json.loads(raw)
+            except ValueError as e:
+                report["failed"][schema_file.name] = f"invalid json: {e}"
+                continue
+            file_hashes[schema_file.name] = hashlib.sha256(raw).hexdigest()
+        set_hash = hashlib.sha256(json.dumps(file_hashes, sort_keys=True).encode()).hexdigest()
+
+        stored = await self.col_meta.find_one({"_id": SCHEMAS_META_ID}) or {}
+        if stored.get("hash") == set_hash and not report["failed"]:
+            report["skipped"] = True
+            report["timings_ms"]["total"] = round((time.perf_counter() - started) * 1000, 3)
+            return report
+
+        stored_files: Dict[str, str] = stored.get("files", {})
+        changed = [name for name, digest in file_hashes.items() if stored_files.get(name) != digest]
+        existing = set(await self.db.list_collection_names())
+
+        async def apply(name: str) -> None:
+            file_started = time.perf_counter()
+            try:
+                await self._apply_schema_spec(specs[name], existing)
+                report["applied"].append(name)
+            except Exception as e:
+                report["failed"][name] = str(e)
+            finally:
+                report["timings_ms"][name] = round((time.perf_counter() - file_started) * 1000, 3)
+
+        await asyncio.gather(*(apply(name) for name in changed))
+
+        applied_files = {
+            name: digest for name, digest in file_hashes.items()
+            if name not in report["failed"] and (name in report["applied"] or stored_files.get(name) == digest)
+        }
+        await self.col_meta.update_one(
+            {"_id": SCHEMAS_META_ID},
+            {"$set": {
+                "files": applied_files,
+                # Общий хэш фиксируем только при полном успехе, чтобы упавшее повторилось
+                "hash": set_hash if not report["failed"] else None,
+                "updated_at": datetime.now()
+            }},
+            upsert=True
+        )
+        report["timings_ms"]["total"] = round((time.perf_counter() - started) * 1000, 3)
+        if report["failed"]:
+            logging.error(f"Schema bootstrap failures: {report['failed']}")
+        return report
 
-    async def init_indexes(self):
-        """Создаёт необходимые индексы при старте."""
-        await self.col_messages.create_index("message_id", unique=True)
-
-    async def _ensure_collection(self, name: str) -> None:
-        collections: List[str] = await self.db.list_collection_names()
-        if name not in collections:
-            await self.db.create_collection(name)
-
-    async def init_business_schemas_and_indexes(self) -> None:
-        """Применяет JSON-схемы (collMod) и создаёт индексы для бизнес-коллекций."""
-        base_dir = Path(__file__).resolve().parent
-        schemas_dir = base_dir / "schemas"
-        has_schema_files = False
-        if schemas_dir.exists():
-            for schema_file in schemas_dir.glob("*.json"):
-                has_schema_files = True
-                try:
-                    with schema_file.open("r", encoding="utf-8") as f:
-                        spec = json.load(f)
-                    if "collMod" in spec:
-                        coll_name = spec.get("collMod")
-                        if coll_name:
-                            await self._ensure_collection(coll_name)
-                            await self.db.command(spec)
-                    else:
-                        collection = spec.get("collection")
-                        if not collection:
-                            continue
-                        await self._ensure_collection(collection)
-
-                        validator = spec.get("validator")
-                        validation_level = spec.get("validationLevel", "moderate")
-                        if validator:
-                            await self.db.command({
-                                "collMod": collection,
-                                "validator": validator,
-                                "validationLevel": validation_level
-                            })
-
-                        # Индексы
-                        indexes = spec.get("indexes", [])
-                        coll = self.db.get_collection(collection)
-                        for index in indexes:
-                            keys = index.get("keys")
-                            options = index.get("options", {})
-                            if not keys:
-                                continue
-                            key_list = []
-                            for field, order in keys:
-                                key_list.append((field, ASCENDING if order >= 0 else DESCENDING))
-                            await coll.create_index(
-                                key_list,
-                                name=options.get("name"),
-                                unique=options.get("unique", False),
-                                sparse=options.get("sparse")
-                            )
-                except Exception:
-                    pass
-    
     #-------MESAGE-------#
     async def get_message(self, message_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Возвращает шаблон сообщения, сначала из кэша, затем из БД.
+        Отдаётся копия: кэш общий для всех апдейтов, правка результата его не портит.
+        """
+        doc = self.message_cache.get(message_id)
+        if doc is not None:
+            return copy.deepcopy(doc)
         doc = await self.col_messages.find_one({"message_id": message_id}, projection={"_id": False})
+        if doc is not None:
+            self.message_cache.set(message_id, doc)
+            return copy.deepcopy(doc)
         return doc
 
-    async def add_message(self, message_id: str, text: str, media: Optional[str], keyboard: Optional[Dict[str, Any]]):
+    async def add_message(
+        self,
+        message_id: str,
+        text: str,
+        media: Optional[str],
+        keyboard: Optional[Dict[str, Any]],
+        placeholders: Optional[List[str]] = None
+    ):
         doc = {"message_id": message_id, "text": text, "media": media, "keyboard": keyboard}
-        await self.col_messages.update_one({"message_id": message_id}, {"$set": doc}, upsert=True)
+        if placeholders is not None:
+            doc["placeholders"] = list(placeholders)
+        await self.col_messages.update_one(
+            {"message_id": message_id},
+            {"$set": doc, "$inc": {"version": 1}, "$unset": {"content_hash": ""}},
+            upsert=True
+        )
+        self.message_cache.invalidate(message_id)
 
     async def delete_message(self, message_id: str) -> bool:
         res = await self.col_messages.delete_one({"message_id": message_id})
+        self.message_cache.invalidate(message_id)
         return res.deleted_count == 1
 
     async def update_message(self, message_id: str, **fields):
         if not fields:
             return
-        await self.col_messages.update_one({"message_id": message_id}, {"$set": fields})
+        fields.pop("version", None)
+        # Ручная правка сбрасывает хэш, чтобы дамп при следующем старте снова был источником истины
+        fields.pop("content_hash", None)
+        await self.col_messages.update_one(
+            {"message_id": message_id},
+            {"$set": fields, "$inc": {"version": 1}, "$unset": {"content_hash": ""}}
+        )
+        self.message_cache.invalidate(message_id)
+
+    async def get_message_hashes(self, message_ids: List[str]) -> Dict[str, Optional[str]]:
+        """Возвращает content_hash сохранённых сообщений одним запросом."""
+        cursor = self.col_messages.find(
+            {"message_id": {"$in": message_ids}},
+            projection={"_id": False, "message_id": True, "content_hash": True}
+        )
+        return {doc["message_id"]: doc.get("content_hash") async for doc in cursor}
+
+    async def bulk_upsert_messages(self, docs: List[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Upsert пачки сообщений одним неупорядоченным bulk_write.
+        Каждый doc должен содержать message_id. Возвращает счётчики inserted/updated.
+        """
+        if not docs:
+            return {"inserted": 0, "updated": 0}
+        ops = [
+            UpdateOne(
+                {"message_id": doc["message_id"]},
+                {"$set": doc, "$inc": {"version": 1}},
+                upsert=True
+            )
+            for doc in docs
+        ]
+        result = await self.col_messages.bulk_write(ops, ordered=False)
+        for doc in docs:
+            self.message_cache.invalidate(doc["message_id"])
+        return {"inserted": result.upserted_count, "updated": result.modified_count}
+
+    def message_cache_stats(self) -> Dict[str, Any]:
+        """Счётчики кэша шаблонов (hits/misses/evictions)."""
+        return self.message_cache.stats()
+
+    async def watch_messages(self) -> None:
+        """
+        Слушает change stream коллекции messages и сбрасывает кэш,
+        чтобы несколько реплик бота видели изменения шаблонов.
+        Требует replica set; на standalone просто завершается с предупреждением.
+        """
+        try:
+            async with self.col_messages.watch(full_document="updateLookup") as stream:
+                async for change in stream:
+                    full_doc = change.get("fullDocument") or {}
+                    message_id = full_doc.get("message_id")
+                    if message_id is not None:
+                        self.message_cache.invalidate(message_id)
+                    else:
+                        # delete/drop не несут message_id — сбрасываем кэш целиком
+                        self.message_cache.clear()
+        except PyMongoError as e:
+            logging.warning(f"Messages change stream stopped: {e}")
     
     #-------USER-------#
     async def generate_referral_code(self) -> str:
-        """Генерирует уникальный реферальный код."""
-        return str(uuid.uuid4())
+        """Генерирует уникальный реферальный код (8 символов A-Z0-9, без коллизий)."""
+        return await self.referral_codes.allocate()
 
     async def add_user(self, telegram_id: int, phone_number: str, username: Optional[str] = None, full_name: Optional[str] = None) -> Dict[str, Any]:
         """Создаёт нового пользователя."""
@@ -122,12 +307,66 @@ class DatabaseService:
         }
         
         result = await self.col_users.insert_one(doc)
+        self.invalidate_users(telegram_id)
         doc["_id"] = result.inserted_id
         return doc
 
-    async def get_user_by_telegram_id(self, telegram_id: int) -> Optional[Dict[str, Any]]:
-        """Получает пользователя по telegram_id."""
-        return await self.col_users.find_one({"telegram_id": telegram_id}, projection={"_id": False})
+    async def get_user_by_telegram_id(self, telegram_id: int, use_cache: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Получает пользователя по telegram_id.
+        Сначала смотрит мемо текущего апдейта, затем кэш процесса с коротким TTL.
+        use_cache=False — чтение напрямую из БД для путей, чувствительных к согласованности.
+        """
+        memo = get_request_memo()
+        key = ("user", telegram_id)
+        if use_cache:
+            if memo is not None and key in memo:
+                doc = memo[key]
+                return dict(doc) if doc is not None else None
+            doc = self.user_cache.get(telegram_id)
+            if doc is not None:
+                if memo is not None:
+                    memo[key] = doc
+                return dict(doc)
+
+        doc = await self.col_users.find_one({"telegram_id": telegram_id}, projection={"_id": False})
+        if memo is not None:
+            memo[key] = doc
+        if doc is not None:
+            self.user_cache.set(telegram_id, doc)
+            return dict(doc)
+        self.user_cache.invalidate(telegram_id)
+        return None
+
+    async def set_user_blocked(self, telegram_id: int, blocked: bool) -> bool:
+        """Отмечает, что пользователь заблокировал бота (рассылки его пропускают) или снова доступен."""
+        if blocked:
+            result = await self.col_users.update_one({"telegram_id": telegram_id}, {"$set": {"is_blocked": True}})
+        else:
+            result = await self.col_users.update_one(
+                {"telegram_id": telegram_id, "is_blocked": True}, {"$unset": {"is_blocked": ""}}
+            )
+        self.invalidate_users(telegram_id)
+        return result.modified_count == 1
+
+    async def _notify(self, entries: List[Tuple[int, Dict[str, Any]]]) -> None:
+        """Ставит уведомления в очередь; сбой очереди не отменяет уже выполненную операцию."""
+        try:
+            await self.notifications.enqueue_many(entries)
+        except PyMongoError as e:
+            logging.warning(f"Failed to enqueue notifications for {[chat_id for chat_id, _ in entries]}: {e}")
+
+    def invalidate_users(self, *telegram_ids: int) -> None:
+        """Сбрасывает кэш и мемо для пользователей после записи."""
+        memo = get_request_memo()
+        for telegram_id in telegram_ids:
+            self.user_cache.invalidate(telegram_id)
+            if memo is not None:
+                memo.pop(("user", telegram_id), None)
+
+    def user_cache_stats(self) -> Dict[str, Any]:
+        """Счётчики кэша пользователей (hits/misses/hit_rate)."""
+        return self.user_cache.stats()
         
     async def get_user_by_username(self, username: str) -> Optional[Dict[str, Any]]:
         """Получает пользователя по @username."""
@@ -144,61 +383,123 @@ class DatabaseService:
     async def process_referral_code(self, new_user_telegram_id: int, referral_code: str) -> Dict[str, Any]:
         """
         Обрабатывает ввод реферального кода новым пользователем.
-        Возвращает результат операции и данные для уведомлений.
+        Оба пользователя читаются одним запросом, а привязка реферера, запись
+        в referrals и начисление баллов выполняются в одной транзакции
+        (или последовательно, если транзакции не поддерживаются).
+        Возвращает результат операции, данные для уведомлений и timings_ms по этапам.
         """
+        timer = StageTimer()
+        new_user = None
+        referrer = None
+        with timer.stage("lookup"):
+            cursor = self.col_users.find(
+                {"$or": [{"telegram_id": new_user_telegram_id}, {"referral_code": referral_code}]},
+                projection={
+                    "_id": False, "telegram_id": True, "referral_code": True,
+                    "referrer_id": True, "refcode_deadline": True, "refcode_expired": True,
+                    "username": True, "full_name": True
+                }
+            )
+            async for doc in cursor:
+                if doc.get("telegram_id") == new_user_telegram_id:
+                    new_user = doc
+                if doc.get("referral_code") == referral_code:
+                    referrer = doc
+
+        def fail(error: str) -> Dict[str, Any]:
+            return {"success": False, "error": error, "timings_ms": timer.report()}
+
         # Проверяем, что пользователь существует и не имеет реферера
-        new_user = await self.get_user_by_telegram_id(new_user_telegram_id)
         if not new_user:
-            return {"success": False, "error": "Пользователь не найден"}
-        
+            return fail("Пользователь не найден")
         if new_user.get("referrer_id"):
-            return {"success": False, "error": "У вас уже есть реферер"}
-        
-        # Проверяем дедлайн 48 часов
-        if new_user.get("refcode_deadline") and datetime.now() > new_user["refcode_deadline"]:
-            return {"success": False, "error": "Время для ввода реферального кода истекло"}
-        
+            return fail("У вас уже есть реферер")
+        # Проверяем дедлайн 48 часов (истёкшие окна помечает RefcodeDeadlineSweeper)
+        now = datetime.now()
+        if new_user.get("refcode_expired"):
+            return fail("Время для ввода реферального кода истекло")
+        if new_user.get("refcode_deadline") and now > new_user["refcode_deadline"]:
+            return fail("Время для ввода реферального кода истекло")
         # Проверяем, что код не свой
         if new_user.get("referral_code") == referral_code:
-            return {"success": False, "error": "Нельзя использовать свой реферальный код"}
-        
-        # Ищем владельца реферального кода
-        referrer = await self.get_user_by_referral_code(referral_code)
+            return fail("Нельзя использовать свой реферальный код")
         if not referrer:
-            return {"success": False, "error": "Реферальный код не найден"}
-        
-        # Устанавливаем связь реферала
-        success = await self.update_user_referrer(new_user_telegram_id, referrer["telegram_id"])
-        if not success:
-            return {"success": False, "error": "Не удалось установить связь с реферером"}
-        
-        # Создаём запись в таблице рефералов
-        await self.add_referral(referrer["telegram_id"], new_user_telegram_id)
-        
-        # Начисляем баллы: +100 новому пользователю, +25 рефереру
-        await self.add_points(
-            new_user_telegram_id, 
-            100, 
-            "использование реферального кода",
-            {"referrer_id": referrer["telegram_id"], "referred_user_id": new_user_telegram_id},
-            bot
-        )
-        
-        await self.add_points(
-            referrer["telegram_id"], 
-            25, 
-            "использование реферального кода",
-            {"referrer_id": referrer["telegram_id"], "referred_user_id": new_user_telegram_id},
-            bot
-        )
-        
+            return fail("Реферальный код не найден")
+
+        referrer_id = referrer["telegram_id"]
+        ref_data = {"referrer_id": referrer_id, "referred_user_id": new_user_telegram_id}
+
+        balances: Dict[int, int] = {}
+
+        async def redeem(session):
+            # Привязка реферера и +100 новому пользователю одной условной записью:
+            # повторное/параллельное применение кода не пройдёт по фильтру
+            with timer.stage("link"):
+                linked = await self.col_users.find_one_and_update(
+                    {
+                        "telegram_id": new_user_telegram_id,
+                        "referrer_id": None,
+                        "refcode_expired": {"$ne": True},
+                        "$or": [{"refcode_deadline": None}, {"refcode_deadline": {"$gte": now}}]
+                    },
+                    {"$set": {"referrer_id": referrer_id}, "$inc": {"points": REFCODE_BONUS_POINTS}},
+                    projection={"_id": False, "points": True},
+                    return_document=ReturnDocument.AFTER,
+                    session=session
+                )
+            if linked is None:
+                raise ReferralConflict("Не удалось установить связь с реферером")
+            balances[new_user_telegram_id] = linked.get("points", 0)
+            with timer.stage("referral"):
+                await self.col_referrals.insert_one({
+                    "referrer_id": referrer_id,
+                    "referred_user_id": new_user_telegram_id,
+                    "status": "pending",
+                    "created_at": now,
+                    "activated_at": None
+                }, session=session)
+            with timer.stage("credit_referrer"):
+                credited = await self.col_users.find_one_and_update(
+                    {"telegram_id": referrer_id},
+                    {"$inc": {"points": REFERRER_JOIN_POINTS}},
+                    projection={"_id": False, "points": True},
+                    return_document=ReturnDocument.AFTER,
+                    session=session
+                )
+            if credited is not None:
+                balances[referrer_id] = credited.get("points", 0)
+            with timer.stage("ledger"):
+                await self.col_point_transactions.insert_many([
+                    self._point_transaction_doc(new_user_telegram_id, REFCODE_BONUS_POINTS, "начисление", "использование реферального кода", ref_data, now),
+                    self._point_transaction_doc(referrer_id, REFERRER_JOIN_POINTS, "начисление", "использование реферального кода", ref_data, now),
+                ], ordered=False, session=session)
+
+        try:
+            await self.run_atomic(redeem)
+        except ReferralConflict as e:
+            return fail(str(e))
+        except DuplicateKeyError:
+            return fail("Не удалось установить связь с реферером")
+        finally:
+            self.invalidate_users(new_user_telegram_id, referrer_id)
+        for telegram_id, balance in balances.items():
+            self.leaderboard.on_points(telegram_id, balance)
+        self.referral_graph.add_edge(referrer_id, new_user_telegram_id)
+        await self._notify([(referrer_id, {"kind": "referral_joined", "name": display_name(new_user), "points": REFERRER_JOIN_POINTS})])
+
+        timings = timer.report()
+        if timings["total"] > REFERRAL_SLOW_MS:
+            logging.warning(f"Slow referral redemption for {new_user_telegram_id}: {timings}")
+        else:
+            logging.debug(f"Referral redemption for {new_user_telegram_id}: {timings}")
         return {
             "success": True,
-            "new_user_points": 100,
-            "referrer_points": 25,
-            "referrer_telegram_id": referrer["telegram_id"],
+            "new_user_points": REFCODE_BONUS_POINTS,
+            "referrer_points": REFERRER_JOIN_POINTS,
+            "referrer_telegram_id": referrer_id,
             "referrer_username": referrer.get("username"),
-            "referrer_full_name": referrer.get("full_name")
+            "referrer_full_name": referrer.get("full_name"),
+            "timings_ms": timings
         }
 
     async def activate_user(self, telegram_id: int) -> Dict[str, Any]:
@@ -206,7 +507,7 @@ class DatabaseService:
         Активирует пользователя и начисляет +75 баллов рефереру.
         Возвращает результат операции и данные для уведомлений.
         """
-        user = await self.get_user_by_telegram_id(telegram_id)
+        user = await self.get_user_by_telegram_id(telegram_id, use_cache=False)
         if not user:
             return {"success": False, "error": "Пользователь не найден"}
         
@@ -218,31 +519,36 @@ class DatabaseService:
             {"telegram_id": telegram_id},
             {"$set": {"is_activated": True}}
         )
+        self.invalidate_users(telegram_id)
         
         if result.modified_count == 0:
             return {"success": False, "error": "Не удалось активировать пользователя"}
         
         # Активируем реферала в таблице referrals
-        await self.activate_referral(telegram_id)
+        if await self.activate_referral(telegram_id) and user.get("referrer_id"):
+            self.leaderboard.apply_referrer_counts(
+                await self.leaderboard.on_referrals_activated({user["referrer_id"]: 1})
+            )
         
         # Если есть реферер, начисляем ему +75 баллов
         referrer_data = None
         if user.get("referrer_id"):
             await self.add_points(
                 user["referrer_id"], 
-                75, 
+                REFERRER_ACTIVATION_POINTS, 
                 "активация реферала",
                 {"referrer_id": user["referrer_id"], "referred_user_id": telegram_id}
             )
             
-            # Получаем данные реферера для уведомления
+            await self._notify([(user["referrer_id"], {"kind": "referral_activated", "name": display_name(user), "points": REFERRER_ACTIVATION_POINTS})])
+            # Получаем данные реферера для ответа
             referrer = await self.get_user_by_telegram_id(user["referrer_id"])
             if referrer:
                 referrer_data = {
                     "telegram_id": referrer["telegram_id"],
                     "username": referrer.get("username"),
                     "full_name": referrer.get("full_name"),
-                    "points": 75
+                    "points": REFERRER_ACTIVATION_POINTS
                 }
         
         return {
@@ -255,63 +561,230 @@ class DatabaseService:
             "referrer": referrer_data
         }
 
+    async def activate_users(self, identifiers: List[Tuple[str, Any]]) -> Dict[str, Any]:
+        """
+        Массовая активация пользователей.
+        identifiers — пары (kind, value), где kind: "id", "phone" (нормализованный) или "username".
+        Пользователи находятся одним запросом с $in, активация, смена статуса рефералов,
+        начисление +75 реферерам и записи транзакций выполняются пакетно в одной транзакции.
+        Возвращает сводку и результат по каждому идентификатору.
+        """
+        field_by_kind = {"id": "telegram_id", "phone": "phone_number", "username": "username"}
+        values: Dict[str, set] = {field: set() for field in field_by_kind.values()}
+        for kind, value in identifiers:
+            values[field_by_kind[kind]].add(value)
+
+        conditions = [{field: {"$in": list(vals)}} for field, vals in values.items() if vals]
+        users: List[Dict[str, Any]] = []
+        if conditions:
+            users = await self.col_users.find(
+                {"$or": conditions},
+                projection={
+                    "_id": False, "telegram_id": True, "phone_number": True, "username": True,
+                    "full_name": True, "referrer_id": True, "is_activated": True
+                }
+            ).to_list(length=None)
+        index = {
+            (field, user.get(field)): user
+            for user in users for field in field_by_kind.values()
+        }
+
+        results: List[Dict[str, Any]] = []
+        to_activate: Dict[int, Dict[str, Any]] = {}
+        for kind, value in identifiers:
+            user = index.get((field_by_kind[kind], value))
+            if user is None:
+                status = "not_found"
+            elif user.get("is_activated"):
+                status = "already_activated"
+            elif user["telegram_id"] in to_activate:
+                status = "duplicate"
+            else:
+                status = "activated"
+                to_activate[user["telegram_id"]] = user
+            results.append({
+                "identifier": value,
+                "status": status,
+                "telegram_id": user["telegram_id"] if user else None
+            })
+
+        # Заполняются внутри транзакции: только пользователи, которых активировал именно этот вызов
+        activated: Dict[int, Dict[str, Any]] = {}
+        referrer_credits: Dict[int, int] = {}
+        referrer_totals: Dict[str, Optional[Dict[int, int]]] = {"value": {}}
+
+        async def apply(session):
+            activated.clear()
+            referrer_credits.clear()
+            referrer_totals["value"] = {}
+            if not to_activate:
+                return
+            ids = list(to_activate)
+            now = datetime.now()
+            # Метка пакета: по ней видно, какие документы изменил этот update_many,
+            # а какие параллельно успела активировать другая команда или реплика
+            batch = str(ObjectId())
+            await self.col_users.update_many(
+                {"telegram_id": {"$in": ids}, "is_activated": False},
+                {"$set": {"is_activated": True, "activation_batch": batch}},
+                session=session
+            )
+            async for doc in self.col_users.find(
+                {"telegram_id": {"$in": ids}, "activation_batch": batch},
+                projection={"_id": False, "telegram_id": True},
+                session=session
+            ):
+                activated[doc["telegram_id"]] = to_activate[doc["telegram_id"]]
+            if not activated:
+                return
+            await self.col_referrals.update_many(
+                {"referred_user_id": {"$in": list(activated)}, "status": "pending"},
+                {"$set": {"status": "activated", "activated_at": now}},
+                session=session
+            )
+            for user in activated.values():
+                if user.get("referrer_id"):
+                    referrer_credits[user["referrer_id"]] = referrer_credits.get(user["referrer_id"], 0) + REFERRER_ACTIVATION_POINTS
+            if referrer_credits:
+                await self.col_users.bulk_write([
+                    UpdateOne({"telegram_id": referrer_id}, {"$inc": {"points": amount}})
+                    for referrer_id, amount in referrer_credits.items()
+                ], ordered=False, session=session)
+                await self.col_point_transactions.insert_many([
+                    self._point_transaction_doc(
+                        user["referrer_id"], REFERRER_ACTIVATION_POINTS, "начисление", "активация реферала",
+                        {"referrer_id": user["referrer_id"], "referred_user_id": user["telegram_id"]},
+                        now
+                    )
+                    for user in activated.values() if user.get("referrer_id")
+                ], ordered=False, session=session)
+                referrer_totals["value"] = await self.leaderboard.on_referrals_activated(
+                    {referrer_id: amount // REFERRER_ACTIVATION_POINTS for referrer_id, amount in referrer_credits.items()},
+                    session=session
+                )
+            # Метка нужна только на время пакета
+            await self.col_users.update_many(
+                {"telegram_id": {"$in": list(activated)}, "activation_batch": batch},
+                {"$unset": {"activation_batch": ""}},
+                session=session
+            )
+
+        try:
+            await self.run_atomic(apply)
+        finally:
+            self.invalidate_users(*to_activate, *referrer_credits)
+        for result in results:
+            if result["status"] == "activated" and result["telegram_id"] not in activated:
+                result["status"] = "already_activated"
+        if referrer_credits:
+            # Рейтинги в памяти меняем только после фиксации транзакции
+            self.leaderboard.mark_points_stale()
+            self.leaderboard.apply_referrer_counts(referrer_totals["value"])
+            await self._notify([
+                (user["referrer_id"], {"kind": "referral_activated", "name": display_name(user), "points": REFERRER_ACTIVATION_POINTS})
+                for user in activated.values() if user.get("referrer_id")
+            ])
+
+        summary: Dict[str, int] = {}
+        for result in results:
+            summary[result["status"]] = summary.get(result["status"], 0) + 1
+        return {
+            "success": bool(activated),
+            "summary": summary,
+            "results": results,
+            "referrer_credits": referrer_credits
+        }
+
+    #-------POINTS LEDGER-------#
+    async def supports_transactions(self) -> bool:
+        """Проверяет (один раз), поддерживает ли деплой транзакции: replica set или mongos."""
+        if self._transactions_supported is None:
+            try:
+                hello = await self.db.command("hello")
+                self._transactions_supported = bool(hello.get("setName") or hello.get("msg") == "isdbgrid")
+            except PyMongoError:
+                self._transactions_supported = False
+        return self._transactions_supported
+
+    async def run_atomic(self, fn: Callable[[Any], Awaitable[Any]]) -> Any:
+        """
+        Выполняет fn(session) в транзакции, если деплой их поддерживает.
+        Иначе вызывает fn(None): каждая операция атомарна сама по себе, но не вместе.
+        """
+        if await self.supports_transactions():
+            async with await self.db.client.start_session() as session:
+                return await session.with_transaction(fn)
+        return await fn(None)
+
+    async def _ledger_apply(
+        self,
+        telegram_id: int,
+        condition: Dict[str, Any],
+        update: Dict[str, Any],
+        transaction_type: str,
+        reason: str,
+        amount: Optional[int] = None,
+        ref_data: Optional[Dict] = None
+    ) -> Optional[int]:
+        """
+        Условное изменение баланса одним find_one_and_update и запись транзакции.
+        Если amount не указан, баланс обнуляется и в транзакцию пишется -старый баланс.
+        Возвращает новый баланс или None, если условие не выполнено.
+        """
+        query = {"telegram_id": telegram_id, **condition}
+
+        async def apply(session):
+            before = await self.col_users.find_one_and_update(
+                query,
+                update,
+                projection={"_id": False, "points": True},
+                return_document=ReturnDocument.BEFORE,
+                session=session
+            )
+            if before is None:
+                return None
+            old_points = before.get("points", 0)
+            delta = amount if amount is not None else -old_points
+            await self.add_point_transaction(
+                telegram_id, delta, transaction_type, reason, ref_data, session=session
+            )
+            return old_points + delta
+
+        try:
+            new_balance = await self.run_atomic(apply)
+        finally:
+            self.invalidate_users(telegram_id)
+        if new_balance is not None:
+            self.leaderboard.on_points(telegram_id, new_balance)
+        return new_balance
+
     async def add_points(self, telegram_id: int, amount: int, reason: str, ref_data: Optional[Dict] = None) -> bool:
         """Добавляет баллы пользователю."""
-        # Получаем текущий баланс
-        user = await self.get_user_by_telegram_id(telegram_id)
-        if not user:
+        if amount <= 0:
             return False
-            
-        # Обновляем баланс
-        result = await self.col_users.update_one(
-            {"telegram_id": telegram_id},
-            {"$inc": {"points": amount}}
+        new_balance = await self._ledger_apply(
+            telegram_id, {}, {"$inc": {"points": amount}},
+            "начисление", reason, amount=amount, ref_data=ref_data
         )
-        
-        if result.modified_count > 0:
-            # Записываем транзакцию
-            await self.add_point_transaction(telegram_id, amount, "начисление", reason, ref_data)
-            return True
-        return False
+        return new_balance is not None
 
     async def subtract_points(self, telegram_id: int, amount: int, reason: str) -> bool:
-        """Списывает баллы с пользователя."""
-        # Проверяем, что у пользователя достаточно баллов
-        user = await self.get_user_by_telegram_id(telegram_id)
-        if not user or user["points"] < amount:
+        """Списывает баллы с пользователя. Проверка баланса входит в условие обновления."""
+        if amount <= 0:
             return False
-            
-        # Обновляем баланс
-        result = await self.col_users.update_one(
-            {"telegram_id": telegram_id},
-            {"$inc": {"points": -amount}}
+        new_balance = await self._ledger_apply(
+            telegram_id, {"points": {"$gte": amount}}, {"$inc": {"points": -amount}},
+            "списание", reason, amount=-amount
         )
-        
-        if result.modified_count > 0:
-            # Записываем транзакцию
-            await self.add_point_transaction(telegram_id, -amount, "списание", reason)
-            return True
-        return False
+        return new_balance is not None
 
     async def zero_points(self, telegram_id: int, reason: str) -> bool:
         """Обнуляет баллы пользователя."""
-        user = await self.get_user_by_telegram_id(telegram_id)
-        if not user or user["points"] == 0:
-            return False
-            
-        current_points = user["points"]
-        
-        # Обнуляем баланс
-        result = await self.col_users.update_one(
-            {"telegram_id": telegram_id},
-            {"$set": {"points": 0}}
+        new_balance = await self._ledger_apply(
+            telegram_id, {"points": {"$ne": 0}}, {"$set": {"points": 0}},
+            "обнуление", reason
         )
-        
-        if result.modified_count > 0:
-            # Записываем транзакцию
-            await self.add_point_transaction(telegram_id, -current_points, "обнуление", reason)
-            return True
-        return False
+        return new_balance is not None
 
     async def get_user_referrals(self, telegram_id: int) -> List[Dict[str, Any]]:
         """Получает список рефералов пользователя."""
@@ -326,6 +799,34 @@ class DatabaseService:
         users = await self.col_users.find(projection={"_id": False}).to_list(length=None)
         return users
 
+    async def get_users_page(
+        self,
+        after_id: Optional[int] = None,
+        before_id: Optional[int] = None,
+        limit: int = 20,
+        projection: Optional[Dict[str, Any]] = None
+    ) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Keyset-пагинация пользователей по telegram_id.
+        after_id — страница вперёд, before_id — страница назад.
+        Возвращает (пользователи по возрастанию telegram_id, есть ли ещё записи в направлении запроса).
+        """
+        projection = projection or USER_LIST_PROJECTION
+        if before_id is not None:
+            query: Dict[str, Any] = {"telegram_id": {"$lt": before_id}}
+            sort = DESCENDING
+        else:
+            query = {"telegram_id": {"$gt": after_id}} if after_id is not None else {}
+            sort = ASCENDING
+
+        cursor = self.col_users.find(query, projection=projection).sort("telegram_id", sort).limit(limit + 1)
+        users = [user async for user in cursor]
+        has_more = len(users) > limit
+        users = users[:limit]
+        if sort == DESCENDING:
+            users.reverse()
+        return users, has_more
+
     #-------REFERRALS-------#
     async def add_referral(self, referrer_id: int, referred_user_id: int) -> bool:
         """Создаёт связь реферала."""
@@ -352,37 +853,69 @@ class DatabaseService:
         return result.modified_count > 0
 
     #-------POINT_TRANSACTIONS-------#
-    async def add_point_transaction(self, user_id: int, amount: int, transaction_type: str, reason: str, ref_data: Optional[Dict] = None):
-        """Добавляет запись о транзакции баллов."""
-        doc = {
+    @staticmethod
+    def _point_transaction_doc(
+        user_id: int,
+        amount: int,
+        transaction_type: str,
+        reason: str,
+        ref_data: Optional[Dict] = None,
+        timestamp: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        return {
             "user_id": user_id,
             "amount": amount,
             "transaction_type": transaction_type,
             "reason": reason,
             "ref": ref_data,
-            "timestamp": datetime.now()
+            "timestamp": timestamp or datetime.now()
         }
-        await self.col_point_transactions.insert_one(doc)
+
+    async def add_point_transaction(
+        self,
+        user_id: int,
+        amount: int,
+        transaction_type: str,
+        reason: str,
+        ref_data: Optional[Dict] = None,
+        session=None
+    ):
+        """Добавляет запись о транзакции баллов."""
+        doc = self._point_transaction_doc(user_id, amount, transaction_type, reason, ref_data)
+        await self.col_point_transactions.insert_one(doc, session=session)
 
     #-------ADMINS-------#
+    async def _read_admins(self) -> Dict[int, str]:
+        levels: Dict[int, str] = {}
+        async for doc in self.col_admins.find(projection={"_id": False, "telegram_id": True, "access_level": True}):
+            levels[int(doc["telegram_id"])] = doc.get("access_level") or "full"
+        return levels
+
+    async def load_admins(self) -> int:
+        """Загружает всех админов в реестр. Возвращает их количество."""
+        self.admins.replace(await self._read_admins())
+        return len(self.admins)
+
+    async def refresh_admins(self) -> bool:
+        """
+        Перечитывает коллекцию admins (она маленькая) и подменяет реестр.
+        Возвращает True, если список изменился.
+        """
+        return self.admins.replace(await self._read_admins())
+
     async def is_admin(self, telegram_id: int) -> bool:
         """Проверяет, является ли пользователь администратором."""
+        if self.admins.loaded:
+            return self.admins.is_admin(int(telegram_id))
         admin = await self.col_admins.find_one({"telegram_id": telegram_id})
         return admin is not None
 
-    async def add_admin(self, telegram_id: int, username: Optional[str] = None, access_level: str = "full") -> bool:
-        """Добавляет администратора."""
-        doc = {
-            "telegram_id": telegram_id,
-            "username": username,
-            "access_level": access_level
-        }
-        
-        try:
-            await self.col_admins.insert_one(doc)
-            return True
-        except Exception:
-            return False
+    async def get_admin_access_level(self, telegram_id: int) -> Optional[str]:
+        """Уровень доступа админа из реестра (без I/O после загрузки) или None."""
+        if self.admins.loaded:
+            return self.admins.access_level(int(telegram_id))
+        admin = await self.get_admin_by_telegram_id(telegram_id)
+        return (admin.get("access_level") or "full") if admin else None
 
     async def get_admin_by_telegram_id(self, telegram_id: int) -> Optional[Dict[str, Any]]:
         """
@@ -415,9 +948,10 @@ class DatabaseService:
         }
 
         try:
-            result = await self.col_admins.insert_one(doc)
+            await self.col_admins.insert_one(doc)
         except DuplicateKeyError:
             raise DuplicateKeyError(f"Admin with telegram_id {telegram_id} already exists")
+        self.admins.set(doc["telegram_id"], access_level)
         return {
             "telegram_id": doc["telegram_id"],
             "username": doc.get("username"),
@@ -435,4 +969,5 @@ class DatabaseService:
             )
         except PyMongoError:
             raise
-        return doc
\ No newline at end of file
+        self.admins.remove(int(telegram_id))
+        return doc
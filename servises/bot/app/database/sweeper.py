@@ -0,0 +1,116 @@
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from datetime import datetime, timedelta
+import asyncio
+import logging
+
+from app.database.leases import Lease
+from app.database.monitoring import instrument
+
+logger = logging.getLogger(__name__)
+
+LEASE_NAME = "refcode_sweeper"
+
+
+@instrument
+class RefcodeDeadlineSweeper:
+    """
+    Фоновая обработка истёкших 48-часовых окон ввода реферального кода.
+    По индексу refcode_deadline пачками помечает истёкших пользователей
+    (refcode_expired=True, refcode_deadline=None) и отправляет напоминания
+    тем, у кого окно скоро закроется. Запрос по индексу сам служит точкой
+    возобновления: обработанные записи из него выпадают. Между пачками —
+    пауза, за прогон — не больше max_batches; на нескольких репликах работает
+    только владелец аренды.
+    """
+
+    def __init__(
+        self,
+        db_service: Any,
+        batch_size: int = 500,
+        batch_pause: float = 0.2,
+        max_batches: int = 20,
+        remind_before: timedelta = timedelta(hours=6),
+        on_remind: Optional[Callable[[List[int]], Awaitable[Any]]] = None,
+        lease_ttl: float = 120.0
+    ):
+        self.db_service = db_service
+        self.col_users = db_service.col_users
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.max_batches = max_batches
+        self.remind_before = remind_before
+        self.on_remind = on_remind
+        self.lease = Lease(db_service.db.get_collection("leases"), LEASE_NAME, lease_ttl)
+
+    async def _expire_batch(self, now: datetime) -> int:
+        cursor = self.col_users.find(
+            {"refcode_deadline": {"$lte": now}},
+            projection={"_id": False, "telegram_id": True}
+        ).sort("refcode_deadline", 1).limit(self.batch_size)
+        ids = [doc["telegram_id"] async for doc in cursor]
+        if not ids:
+            return 0
+        await self.col_users.update_many(
+            {"telegram_id": {"$in": ids}, "refcode_deadline": {"$lte": now}},
+            {"$set": {"refcode_deadline": None, "refcode_expired": True}}
+        )
+        self.db_service.invalidate_users(*ids)
+        return len(ids)
+
+    async def _remind_batch(self, now: datetime) -> int:
+        cursor = self.col_users.find(
+            {
+                "refcode_deadline": {"$gt": now, "$lte": now + self.remind_before},
+                "referrer_id": None,
+                "refcode_reminded": {"$ne": True}
+            },
+            projection={"_id": False, "telegram_id": True}
+        ).sort("refcode_deadline", 1).limit(self.batch_size)
+        ids = [doc["telegram_id"] async for doc in cursor]
+        if not ids:
+            return 0
+        # Сначала помечаем, потом шлём: при сбое напоминание не уйдёт дважды
+        await self.col_users.update_many(
+            {"telegram_id": {"$in": ids}},
+            {"$set": {"refcode_reminded": True}}
+        )
+        if self.on_remind is not None:
+            await self.on_remind(ids)
+        return len(ids)
+
+    async def run_once(self) -> Dict[str, Any]:
+        """Один прогон под арендой. Возвращает счётчики или пустой dict, если аренда занята."""
+        lease = await self.lease.acquire()
+        if lease is None:
+            return {}
+        checkpoint = dict(lease.get("checkpoint") or {})
+        stats = {"expired": 0, "reminded": 0}
+        for _ in range(self.max_batches):
+            now = datetime.now()
+            expired = await self._expire_batch(now)
+            reminded = await self._remind_batch(now)
+            stats["expired"] += expired
+            stats["reminded"] += reminded
+            if expired < self.batch_size and reminded < self.batch_size:
+                break
+            if await self.lease.acquire() is None:
+                break
+            await asyncio.sleep(self.batch_pause)
+
+        checkpoint["last_run"] = datetime.now()
+        checkpoint["expired_total"] = checkpoint.get("expired_total", 0) + stats["expired"]
+        checkpoint["reminded_total"] = checkpoint.get("reminded_total", 0) + stats["reminded"]
+        await self.lease.save_checkpoint(checkpoint)
+        if stats["expired"] or stats["reminded"]:
+            logger.info(f"Refcode sweeper: {stats}")
+        return stats
+
+    async def run_forever(self, interval: float = 60.0) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Refcode sweeper run failed: {e}")
+            await asyncio.sleep(interval)
@@ -1,6 +1,9 @@
 import json
 import os
 import logging
+import hashlib
+from typing import Any, Dict
+from app.messages.template import validate_template
 
 logger = logging.getLogger(__name__)
 
@@ -10,21 +13,49 @@ MESSAGES_PATH = os.path.join(
     "damp", "messages", "message.json"
 )
 
-async def load_initial_messages(db_service):
+def message_content_hash(doc: Dict[str, Any]) -> str:
+    """Стабильный хэш содержимого сообщения (без служебных полей)."""
+    payload = json.dumps(doc, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+async def load_initial_messages(db_service) -> Dict[str, int]:
+    """
+    Загружает дамп сообщений в БД.
+    Сравнивает хэши с сохранёнными и отправляет только изменившиеся записи
+    одним bulk_write. Возвращает отчёт inserted/updated/unchanged.
+    """
+    report = {"inserted": 0, "updated": 0, "unchanged": 0}
     if not os.path.exists(MESSAGES_PATH):
         logger.warning(f"File not found, skipping message dump: {MESSAGES_PATH}")
-        return
+        return report
 
     try:
         with open(MESSAGES_PATH, 'r', encoding='utf-8') as f:
             messages_data = json.load(f)
-            for msg_id, msg_data in messages_data.items():
-                await db_service.add_message(
-                    message_id=msg_id,
-                    text=msg_data.get("text"),
-                    media=msg_data.get("media"),
-                    keyboard=msg_data.get("keyboard")
-                )
-        logger.info("Initial messages from JSON file loaded/updated in the database.")
+
+        docs = {}
+        for msg_id, msg_data in messages_data.items():
+            # Шаблоны проверяются при загрузке, а не при каждой отправке
+            validate_template(msg_id, msg_data.get("text") or "", msg_data.get("placeholders"))
+            doc = {
+                "message_id": msg_id,
+                "text": msg_data.get("text"),
+                "media": msg_data.get("media"),
+                "keyboard": msg_data.get("keyboard")
+            }
+            if msg_data.get("placeholders") is not None:
+                doc["placeholders"] = list(msg_data["placeholders"])
+            doc["content_hash"] = message_content_hash(doc)
+            docs[msg_id] = doc
+
+        stored_hashes = await db_service.get_message_hashes(list(docs))
+        changed = [doc for msg_id, doc in docs.items() if stored_hashes.get(msg_id) != doc["content_hash"]]
+        report["unchanged"] = len(docs) - len(changed)
+        report.update(await db_service.bulk_upsert_messages(changed))
+        logger.info(
+            "Initial messages loaded: inserted=%(inserted)s updated=%(updated)s unchanged=%(unchanged)s",
+            report
+        )
     except Exception as e:
-        logger.error(f"An error occurred while loading messages from JSON: {e}", exc_info=True)
\ No newline at end of file
+        logger.error(f"An error occurred while loading messages from JSON: {e}", exc_info=True)
+    return report
@@ -0,0 +1,78 @@
+from typing import Any, Callable, Dict, Optional, Tuple, Type
+import logging
+from aiogram import Router, types
+from aiogram.dispatcher.event.bases import SkipHandler
+from aiogram.dispatcher.event.handler import FilterObject, HandlerObject
+from aiogram.filters.callback_data import CallbackData
+
+logger = logging.getLogger(__name__)
+
+
+class CallbackTable:
+    """
+    Таблица callback-хендлеров: префикс CallbackData -> HandlerObject.
+    Вместо перебора фильтров всех роутеров по очереди callback_data разбирается
+    один раз: префикс ищется в словаре, данные распаковываются фабрикой маршрута.
+    Хендлер получает типизированный callback_data и обычные зависимости
+    (db_service, state, ...); дополнительные фильтры маршрута (DBAdminFilter)
+    проверяются только для найденного маршрута.
+
+    Фабрика без полей (prefix="register") упаковывается в голую строку "register",
+    поэтому старые кнопки из сообщений в БД продолжают работать.
+    """
+
+    def __init__(self, name: str = "callback.table", separator: str = ":"):
+        self.separator = separator
+        self._routes: Dict[str, Tuple[Type[CallbackData], HandlerObject]] = {}
+        self.router = Router(name=name)
+        self.router.callback_query.register(self._dispatch, self._match)
+
+    def handler(self, factory: Type[CallbackData], *filters: Any) -> Callable:
+        """Декоратор: @callback_table.handler(UsersPage, DBAdminFilter())."""
+        prefix = factory.__prefix__
+        if factory.__separator__ != self.separator:
+            raise ValueError(f"{factory.__name__} must use separator {self.separator!r}")
+
+        def decorator(callback: Callable) -> Callable:
+            if prefix in self._routes:
+                raise ValueError(f"Callback prefix {prefix!r} is already registered")
+            self._routes[prefix] = (
+                factory,
+                HandlerObject(callback=callback, filters=[FilterObject(f) for f in filters] or None)
+            )
+            return callback
+        return decorator
+
+    def resolve(self, data: Optional[str]) -> Optional[Tuple[CallbackData, HandlerObject]]:
+        """O(1): маршрут по префиксу и распакованные данные, либо None."""
+        if not data:
+            return None
+        prefix, separator, _ = data.partition(self.separator)
+        route = self._routes.get(prefix)
+        if route is None:
+            return None
+        factory, handler = route
+        try:
+            return (factory.unpack(data) if separator else factory()), handler
+        except (TypeError, ValueError):
+            return None
+
+    def __len__(self) -> int:
+        return len(self._routes)
+
+    async def _match(self, callback: types.CallbackQuery) -> Any:
+        resolved = self.resolve(callback.data)
+        if resolved is None:
+            return False
+        callback_data, handler = resolved
+        return {"callback_data": callback_data, "callback_route": handler}
+
+    async def _dispatch(self, callback: types.CallbackQuery, callback_route: HandlerObject, **kwargs: Any) -> Any:
+        passed, data = await callback_route.check(callback, **kwargs)
+        if not passed:
+            # Как у обычного хендлера с непройденным фильтром: апдейт идёт дальше
+            raise SkipHandler()
+        return await callback_route.call(callback, **data)
+
+
+callback_table = CallbackTable()
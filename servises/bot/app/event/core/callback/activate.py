@@ -1,21 +1,19 @@
-
-from aiogram import Router, types
-from aiogram.fsm.context import FSMContext
+from aiogram import types
 from app.database.service import DatabaseService
-from app.utils.phone import validate_phone_number, normalize_phone_number
-from app.event.function.activate import activate_user
+from app.event.callback_table import callback_table
+from app.event.functions.activate import activate_user
+from app.filters.Admin import DBAdminFilter
+from app.keyboards.callbacks import ActivateUser
 import logging
 
 logger = logging.getLogger(__name__)
 
-router = Router()
-
-@router.callback_query(lambda c: c.data == "activate")
-async def QueryActivate(callback: types.CallbackQuery, db_service: DatabaseService):
+@callback_table.handler(ActivateUser, DBAdminFilter())
+async def QueryActivate(callback: types.CallbackQuery, callback_data: ActivateUser, db_service: DatabaseService):
     """Активация пользователя."""
     
     logger.info(f"Activating user with callback data: {callback.data}")
-    result = await activate_user(callback, db_service)
+    result = await activate_user(callback, db_service, target=callback_data.target)
 
     if result:
         await callback.answer("Пользователь успешно активирован!")
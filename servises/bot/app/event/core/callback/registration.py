@@ -3,13 +3,15 @@ from aiogram.fsm.context import FSMContext
 from app.database.service import DatabaseService
 from app.utils.phone import validate_phone_number, normalize_phone_number
 from app.fsm.registration import RegistrationStates
+from app.event.callback_table import callback_table
+from app.keyboards.callbacks import RegisterStart, SkipReferral
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = Router()
 
-@router.callback_query(lambda c: c.data == "register")
+@callback_table.handler(RegisterStart)
 async def start_registration(callback: types.CallbackQuery, state: FSMContext):
     """Начинает процесс регистрации."""
     await callback.answer()
@@ -20,7 +22,7 @@ async def start_registration(callback: types.CallbackQuery, state: FSMContext):
         "Форматы: +7XXXXXXXXXX, 8XXXXXXXXXX, 7XXXXXXXXXX"
     )
 
-@router.callback_query(lambda c: c.data == "skip")
+@callback_table.handler(SkipReferral)
 async def skip_referral_code(callback: types.CallbackQuery, state: FSMContext, db_service: DatabaseService):
     """Пропускает ввод реферального кода."""
     current_state = await state.get_state()
@@ -99,7 +101,7 @@ async def process_phone_input(message: types.Message, state: FSMContext, db_serv
         from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
         
         keyboard = InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text="⏭️ Пропустить", callback_data="skip")]
+            [InlineKeyboardButton(text="⏭️ Пропустить", callback_data=SkipReferral().pack())]
         ])
         
         await message.answer(
@@ -0,0 +1,13 @@
+from aiogram import types
+from app.database.service import DatabaseService
+from app.event.callback_table import callback_table
+from app.event.functions.top import build_top_page
+from app.filters.Admin import DBAdminFilter
+from app.keyboards.callbacks import TopPage
+
+@callback_table.handler(TopPage, DBAdminFilter())
+async def top_page(callback: types.CallbackQuery, callback_data: TopPage, db_service: DatabaseService):
+    """Листание админского рейтинга."""
+    text, keyboard = await build_top_page(db_service, callback_data.board, callback_data.page, with_keyboard=True)
+    await callback.answer()
+    await callback.message.edit_text(text, reply_markup=keyboard)
@@ -0,0 +1,25 @@
+from aiogram import types
+from app.database.service import DatabaseService
+from app.event.callback_table import callback_table
+from app.event.functions.users import build_users_page
+from app.filters.Admin import DBAdminFilter
+from app.keyboards.callbacks import UsersPage
+
+@callback_table.handler(UsersPage, DBAdminFilter())
+async def users_page(callback: types.CallbackQuery, callback_data: UsersPage, db_service: DatabaseService):
+    """Листание списка пользователей."""
+    if callback_data.direction == "prev":
+        chunks, keyboard = await build_users_page(db_service, before_id=callback_data.cursor)
+    else:
+        chunks, keyboard = await build_users_page(db_service, after_id=callback_data.cursor)
+
+    await callback.answer()
+    if not chunks:
+        return
+
+    if len(chunks) == 1:
+        await callback.message.edit_text(chunks[0], reply_markup=keyboard)
+        return
+    for chunk in chunks[:-1]:
+        await callback.message.answer(chunk)
+    await callback.message.answer(chunks[-1], reply_markup=keyboard)
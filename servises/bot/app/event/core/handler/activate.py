@@ -1,17 +1,50 @@
 from aiogram import Router, types
-from aiogram.filters import Command
+from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
-from app.messages.message import send_message
 from app.database.service import DatabaseService
-from app.event.function.activate import activate_user
+from app.event.functions.activate import activate_user, activate_users_bulk
+from app.filters.Admin import DBAdminFilter
 
 router = Router()
 
-@router.message(Command("activate"))
-async def start_command(message: types.Message, state: FSMContext, db_service: DatabaseService):
+STATUS_LABELS = {
+    "activated": "✅ Активировано",
+    "already_activated": "☑️ Уже активированы",
+    "duplicate": "🔁 Повторы",
+    "not_found": "❌ Не найдено",
+}
+
+@router.message(Command("activate"), DBAdminFilter())
+async def activate_command(message: types.Message, command: CommandObject, state: FSMContext, db_service: DatabaseService):
+    """
+    /activate <id|телефон|@username> — активация одного пользователя.
+    /activate a b c или приложенный файл со списком — массовая активация.
+    """
     await state.clear()
-    result = await activate_user_from_message_by_tg_id(message, db_service)
-    if result is None:
-        await send_message(message, "activate_not_found")
+    args = (command.args or "").strip()
+
+    if not message.document and len(args.split()) <= 1:
+        result = await activate_user(message, db_service)
+        if not result:
+            await message.answer("❌ Пользователь не найден.")
+        elif not result.get("success"):
+            await message.answer(f"❌ {result['error']}")
+        else:
+            await message.answer("✅ Пользователь успешно активирован!")
         return
-    await send_message(message, "activate_11")
+
+    result = await activate_users_bulk(message, db_service, args)
+    if not result:
+        await message.answer("❌ Не указаны пользователи для активации.")
+        return
+
+    lines = ["Результат массовой активации:"]
+    for status, label in STATUS_LABELS.items():
+        if result["summary"].get(status):
+            lines.append(f"{label}: {result['summary'][status]}")
+    not_found = [str(r["identifier"]) for r in result["results"] if r["status"] == "not_found"]
+    if not_found:
+        shown = ", ".join(not_found[:50])
+        more = f" и ещё {len(not_found) - 50}" if len(not_found) > 50 else ""
+        lines.append(f"\nНе найдены: {shown}{more}")
+    await message.answer("\n".join(lines))
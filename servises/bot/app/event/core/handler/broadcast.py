@@ -0,0 +1,43 @@
+from aiogram import Router, types
+from aiogram.filters import Command, CommandObject
+from app.database.broadcasts import BROADCAST_FILTERS, render_progress
+from app.database.service import DatabaseService
+from app.filters.Admin import DBAdminFilter
+from app.utils.ratelimit import SendLimiter
+
+router = Router()
+
+@router.message(Command("broadcast"), DBAdminFilter(required_access="full"))
+async def broadcast_command(message: types.Message, command: CommandObject, db_service: DatabaseService, send_limiter: SendLimiter):
+    """
+    /broadcast [all|activated|referrer] <текст> — рассылка всем или сегменту.
+    Вместо текста можно ответить командой на сообщение, которое нужно разослать.
+    """
+    args = (command.args or "").strip()
+    segment, _, rest = args.partition(" ")
+    if segment not in BROADCAST_FILTERS:
+        segment, rest = "all", args
+    text = rest.strip() or (message.reply_to_message.text if message.reply_to_message else None)
+    if not text:
+        await message.answer(
+            "Использование: /broadcast [all|activated|referrer] <текст>\n"
+            "или ответьте командой /broadcast на сообщение с текстом."
+        )
+        return
+
+    progress = await message.answer("📣 Рассылка подготавливается...")
+    doc = await db_service.broadcasts.create(
+        text, segment, created_by=message.from_user.id,
+        admin_chat_id=message.chat.id, progress_message_id=progress.message_id
+    )
+    await progress.edit_text(render_progress(doc))
+    db_service.broadcasts.start(message.bot, send_limiter, doc["_id"])
+
+@router.message(Command("broadcast_cancel"), DBAdminFilter(required_access="full"))
+async def broadcast_cancel_command(message: types.Message, db_service: DatabaseService):
+    """Останавливает последнюю запущенную рассылку."""
+    doc = await db_service.broadcasts.latest_running()
+    if doc and await db_service.broadcasts.cancel(doc["_id"]):
+        await message.answer(f"⏹ Рассылка {doc['_id']} остановлена.")
+    else:
+        await message.answer("Нет активных рассылок.")
@@ -0,0 +1,17 @@
+from aiogram import F, Router, types
+from aiogram.enums import ChatType
+from aiogram.filters import ChatMemberUpdatedFilter, KICKED, MEMBER
+from app.database.service import DatabaseService
+
+router = Router()
+router.my_chat_member.filter(F.chat.type == ChatType.PRIVATE)
+
+@router.my_chat_member(ChatMemberUpdatedFilter(member_status_changed=KICKED))
+async def bot_blocked(event: types.ChatMemberUpdated, db_service: DatabaseService):
+    """Пользователь заблокировал бота — исключаем его из рассылок."""
+    await db_service.set_user_blocked(event.from_user.id, True)
+
+@router.my_chat_member(ChatMemberUpdatedFilter(member_status_changed=MEMBER))
+async def bot_unblocked(event: types.ChatMemberUpdated, db_service: DatabaseService):
+    """Пользователь разблокировал бота — снова включаем его в рассылки."""
+    await db_service.set_user_blocked(event.from_user.id, False)
@@ -0,0 +1,32 @@
+from aiogram import Router, types
+from aiogram.filters import Command
+from app.database.db import resources
+from app.filters.Admin import DBAdminFilter
+from app.utils.text import chunk_records
+
+router = Router()
+
+@router.message(Command("dbstats"), DBAdminFilter(required_access="full"))
+async def dbstats_command(message: types.Message):
+    """Самые затратные по времени БД методы и последние медленные запросы."""
+    stats = resources.command_stats
+    records = ["📊 Топ по суммарному времени в БД:"]
+    for item in stats.top_offenders(10):
+        records.append(
+            f"{item['method']} / {item['command']}: {item['count']} выз., "
+            f"всего {item['total_ms']:.0f} мс, p95 {item['p95_ms']:.0f} мс, "
+            f"док. {item['docs']}, ошибок {item['failures']}"
+        )
+    samples = list(stats.slow_samples)[-5:]
+    if samples:
+        records.append(f"🐢 Медленные запросы (> {stats.slow_ms:.0f} мс):")
+        for sample in samples:
+            plan = sample.get("plan") or sample.get("explain_error") or "—"
+            warn = " ⚠️ COLLSCAN" if sample.get("collscan") else ""
+            records.append(f"{sample['method']} / {sample['command']}: {sample['ms']:.0f} мс, план: {plan}{warn}")
+    pool = resources.pool_stats()
+    records.append(
+        f"🔌 Пул: открыто {pool['open']}, занято {pool['checked_out']}, ожидают {pool['waiters']}"
+    )
+    for chunk in chunk_records(records, sep="\n"):
+        await message.answer(chunk)
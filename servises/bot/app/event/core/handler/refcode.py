@@ -23,8 +23,8 @@ async def add_referral_code_later(message: types.Message, state: FSMContext, db_
         await message.answer("❌ У вас уже есть реферер.")
         return
     
-    # Проверяем дедлайн 48 часов
-    if user.get("refcode_deadline") and datetime.now() > user["refcode_deadline"]:
+    # Проверяем дедлайн 48 часов (флаг ставит фоновый RefcodeDeadlineSweeper)
+    if user.get("refcode_expired") or (user.get("refcode_deadline") and datetime.now() > user["refcode_deadline"]):
         await message.answer("❌ Время для ввода реферального кода истекло (48 часов).")
         return
     
@@ -0,0 +1,38 @@
+from aiogram import Router, types
+from aiogram.filters import Command, CommandObject
+from app.database.service import DatabaseService
+from app.filters.Admin import DBAdminFilter
+from app.utils.text import chunk_records
+
+router = Router()
+
+@router.message(Command("reftree"), DBAdminFilter())
+async def reftree_command(message: types.Message, command: CommandObject, db_service: DatabaseService):
+    """/reftree <telegram_id> [глубина] — дерево рефералов и размер поддерева."""
+    args = (command.args or "").split()
+    if not args or not args[0].isdigit():
+        await message.answer("Использование: /reftree <telegram_id> [глубина]")
+        return
+    root = int(args[0])
+    depth = min(int(args[1]), 10) if len(args) > 1 and args[1].isdigit() else 3
+
+    graph = db_service.referral_graph
+    tree = graph.tree(root, max_depth=depth, limit=300)
+    lines = [
+        f"Рефералы {root}: прямых {len(graph.direct(root))}, "
+        f"всего {graph.subtree_size(root)}, второго уровня {graph.second_level.get(root, 0)}"
+    ]
+    lines.extend(f"{'  ' * (level - 1)}└ {node} (ур. {level}, всего {graph.subtree_size(node)})" for node, level in tree)
+    for chunk in chunk_records(lines, sep="\n"):
+        await message.answer(chunk)
+
+@router.message(Command("reftop"), DBAdminFilter())
+async def reftop_command(message: types.Message, db_service: DatabaseService):
+    """Кто привёл больше всего рефералов второго уровня."""
+    top = db_service.referral_graph.top_second_level(10)
+    if not top:
+        await message.answer("Рефералов второго уровня пока нет.")
+        return
+    lines = ["Топ по рефералам второго уровня:"]
+    lines.extend(f"{place}. {telegram_id} — {count}" for place, (telegram_id, count) in enumerate(top, start=1))
+    await message.answer("\n".join(lines))
@@ -14,6 +14,9 @@ async def start_command(message: types.Message, state: FSMContext, db_service: D
     await state.clear()
     user = await db_service.get_user_by_telegram_id(message.from_user.id)
     
+    if user and user.get("is_blocked"):
+        # /start после разблокировки бота — пользователь снова получает рассылки
+        await db_service.set_user_blocked(message.from_user.id, False)
     if user:
         # Пользователь уже зарегистрирован
         await message.answer(
@@ -0,0 +1,22 @@
+from aiogram import Router, types
+from aiogram.filters import Command, CommandObject
+from app.database.service import DatabaseService
+from app.event.functions.top import build_top_page
+from app.filters.Admin import DBAdminFilter
+
+router = Router()
+
+@router.message(Command("top"))
+async def top_command(message: types.Message, db_service: DatabaseService):
+    """Топ пользователей по баллам."""
+    text, _ = await build_top_page(db_service, "points")
+    await message.answer(text)
+
+@router.message(Command("top_admin"), DBAdminFilter())
+async def top_admin_command(message: types.Message, command: CommandObject, db_service: DatabaseService):
+    """/top_admin [points|referrers] [страница] — рейтинг с листанием."""
+    args = (command.args or "").split()
+    board = args[0] if args else "points"
+    page = int(args[1]) - 1 if len(args) > 1 and args[1].isdigit() and int(args[1]) > 0 else 0
+    text, keyboard = await build_top_page(db_service, board, page, with_keyboard=True)
+    await message.answer(text, reply_markup=keyboard)
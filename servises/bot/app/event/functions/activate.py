@@ -1,12 +1,33 @@
-from typing import Optional, Dict, Any, Union
+from typing import Optional, Dict, Any, Union, List, Tuple, Iterable
 from aiogram import types
 from app.database.service import DatabaseService
 from app.utils.phone import validate_phone_number, normalize_phone_number
 
+
+def classify_identifier(arg: str) -> Tuple[str, Any]:
+    """Определяет тип идентификатора пользователя: id, телефон или username."""
+    if arg.isdigit():
+        return "id", int(arg)
+    if validate_phone_number(arg):
+        return "phone", normalize_phone_number(arg)
+    return "username", arg.lstrip("@")
+
+
+def parse_identifiers(text: str) -> List[Tuple[str, Any]]:
+    """Разбирает идентификаторы, разделённые пробелами, запятыми или переводами строк."""
+    tokens: Iterable[str] = text.replace(",", " ").replace(";", " ").split()
+    return [classify_identifier(token) for token in tokens if token]
+
+
 async def activate_user(
     source: Union[types.Message, types.CallbackQuery],
     db_service: DatabaseService,
+    target: Optional[str] = None,
 ) -> Optional[Dict[str, Any]]:
+    """
+    Активирует одного пользователя: по пересланной команде /activate, по аргументу
+    команды или по target из ActivateUser (для callback).
+    """
     msg = source.message if isinstance(source, types.CallbackQuery) else source
     tg_id: Optional[int] = None
 
@@ -18,36 +39,47 @@ async def activate_user(
     if tg_id is None:
         args = ""
         if isinstance(source, types.CallbackQuery):
-            args = (source.data or "").strip()
-            if args.lower().startswith("activate"):
-                parts = args.split(maxsplit=1)
-                args = parts[1].strip() if len(parts) > 1 else ""
+            args = (target or "").strip()
         else:
-            args = msg.get_args().strip()
+            parts = (msg.text or msg.caption or "").split(maxsplit=1)
+            args = parts[1].strip() if len(parts) > 1 else ""
 
         if not args:
             return None
 
-        arg0 = args.split()[0]
-        kind = (
-            "id" if arg0.isdigit()
-            else "phone" if validate_phone_number(arg0)
-            else "username"
-        )
+        kind, value = classify_identifier(args.split()[0])
 
         match kind:
             case "id":
-                tg_id = int(arg0)
+                tg_id = value
             case "phone":
-                phone = normalize_phone_number(arg0)
-                user = await db_service.get_user_by_phone(phone)
+                user = await db_service.get_user_by_phone(value)
                 tg_id = user.get("telegram_id") if user else None
             case "username":
-                username = arg0.lstrip("@")
-                user = await db_service.get_user_by_username(username)
+                user = await db_service.get_user_by_username(value)
                 tg_id = user.get("telegram_id") if user else None
 
         if not tg_id:
             return None
 
-    return await db_service.activate_user(telegram_id=tg_id)
\ No newline at end of file
+    return await db_service.activate_user(telegram_id=tg_id)
+
+
+async def activate_users_bulk(
+    message: types.Message,
+    db_service: DatabaseService,
+    args: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Массовая активация: идентификаторы из аргументов команды и/или
+    из приложенного текстового файла (по одному или несколько в строке).
+    """
+    identifiers = parse_identifiers(args or "")
+    if message.document:
+        file = await message.bot.download(message.document)
+        if file is not None:
+            identifiers.extend(parse_identifiers(file.read().decode("utf-8", errors="ignore")))
+
+    if not identifiers:
+        return None
+    return await db_service.activate_users(identifiers)
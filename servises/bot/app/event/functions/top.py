@@ -0,0 +1,35 @@
+from typing import Optional, Tuple
+from aiogram import types
+from app.database.service import DatabaseService
+from app.keyboards.buttons import top_page_keyboard
+
+TOP_PAGE_SIZE = 10
+
+BOARD_TITLES = {
+    "points": ("🏆 Топ по баллам", "баллов"),
+    "referrers": ("👥 Топ по активированным рефералам", "рефералов"),
+}
+
+
+async def build_top_page(
+    db_service: DatabaseService,
+    board: str = "points",
+    page: int = 0,
+    with_keyboard: bool = False,
+) -> Tuple[str, Optional[types.InlineKeyboardMarkup]]:
+    """Текст страницы рейтинга и (для админов) клавиатура листания."""
+    board = board if board in BOARD_TITLES else "points"
+    rows = await db_service.leaderboard.top(board, offset=page * TOP_PAGE_SIZE, limit=TOP_PAGE_SIZE + 1)
+    has_next = len(rows) > TOP_PAGE_SIZE
+    rows = rows[:TOP_PAGE_SIZE]
+
+    title, unit = BOARD_TITLES[board]
+    lines = [f"{title} (стр. {page + 1}):" if with_keyboard else f"{title}:"]
+    for row in rows:
+        name = f"@{row['username']}" if row.get("username") else (row.get("full_name") or str(row["telegram_id"]))
+        lines.append(f"{row['place']}. {name} — {row['score']} {unit}")
+    if not rows:
+        lines.append("Пока пусто.")
+
+    keyboard = top_page_keyboard(board, page, has_next) if with_keyboard else None
+    return "\n".join(lines), keyboard
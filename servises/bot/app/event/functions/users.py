@@ -0,0 +1,46 @@
+from typing import Optional, List, Tuple
+from aiogram import types
+from app.database.service import DatabaseService
+from app.keyboards.buttons import users_page_keyboard
+from app.utils.text import chunk_records
+
+USERS_PAGE_SIZE = 20
+
+
+def format_user(user: dict) -> str:
+    username = f"@{user.get('username')}" if user.get('username') else "Нет username"
+    full_name = user.get('full_name') or "Нет имени"
+    premium_status = "⭐ Premium" if user.get('is_premium') else ""
+    return "ID: {id}\nИмя: {name}\nUsername: {username} {premium}".format(
+        id=user.get('telegram_id'),
+        name=full_name,
+        username=username,
+        premium=premium_status
+    )
+
+
+async def build_users_page(
+    db_service: DatabaseService,
+    after_id: Optional[int] = None,
+    before_id: Optional[int] = None,
+) -> Tuple[List[str], Optional[types.InlineKeyboardMarkup]]:
+    """
+    Загружает одну страницу пользователей (keyset по telegram_id) и возвращает
+    части текста в пределах лимита Telegram и клавиатуру листания.
+    """
+    users, has_more = await db_service.get_users_page(
+        after_id=after_id, before_id=before_id, limit=USERS_PAGE_SIZE
+    )
+    if not users:
+        return [], None
+
+    if before_id is not None:
+        has_prev, has_next = has_more, True
+    else:
+        has_prev, has_next = after_id is not None, has_more
+
+    chunks = list(chunk_records(format_user(user) for user in users))
+    keyboard = users_page_keyboard(
+        users[0]["telegram_id"], users[-1]["telegram_id"], has_prev, has_next
+    )
+    return chunks, keyboard
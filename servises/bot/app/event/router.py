@@ -6,7 +6,7 @@ import pkgutil
 logger = logging.getLogger(__name__)
 
 
-router = Router()
+router = Router(name="root")
 
 
 core_module_name = '.core'
@@ -18,21 +18,30 @@ handler_module = importlib.import_module(f"{core_module_name}.handler", package=
 for _, handler_name, _ in pkgutil.iter_modules(handler_module.__path__):
     handler_module_instance = importlib.import_module(f"{core_module_name}.handler.{handler_name}", package=__name__.rsplit('.', 1)[0])
     if hasattr(handler_module_instance, 'router'):
+        # Стабильное имя роутера — метка в метриках латентности
+        handler_module_instance.router.name = f"handler.{handler_name}"
         routers.append(handler_module_instance.router)
 
 callback_module = importlib.import_module(f"{core_module_name}.callback", package=__name__.rsplit('.', 1)[0])
 for _, callback_name, _ in pkgutil.iter_modules(callback_module.__path__):
     callback_module_instance = importlib.import_module(f"{core_module_name}.callback.{callback_name}", package=__name__.rsplit('.', 1)[0])
     if hasattr(callback_module_instance, 'router'):
+        callback_module_instance.router.name = f"callback.{callback_name}"
         routers.append(callback_module_instance.router)
 
 # Подключаем FSM модули
 try:
     from app.fsm.registration import router as registration_router
+    registration_router.name = "fsm.registration"
     routers.append(registration_router)
     logger.info("FSM registration router loaded")
 except ImportError as e:
     logger.warning(f"Failed to load FSM registration router: {e}")
 
+# Все callback-хендлеры зарегистрированы в таблице при импорте модулей выше
+from app.event.callback_table import callback_table
+routers.append(callback_table.router)
+logger.info(f"Callback table: {len(callback_table)} routes")
+
 logger.info(f"Loaded routers: {routers}")
 router.include_routers(*routers)
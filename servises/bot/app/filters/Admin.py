@@ -1,27 +1,22 @@
 from aiogram.filters import BaseFilter
-from aiogram.types import Message
+from aiogram.types import Message, CallbackQuery
+from app.database.service import DatabaseService
 
 class DBAdminFilter(BaseFilter):
     def __init__(self, required_access: str | None = None):
         self.required_access = required_access
 
-    async def __call__(self, message: Message) -> bool:
-        if not message.from_user:
+    async def __call__(self, message: Message | CallbackQuery, db_service: DatabaseService | None = None) -> bool:
+        # db_service приходит из workflow data диспетчера (см. MongoResources)
+        if not message.from_user or db_service is None:
             return False
 
-        dispatcher = getattr(message.bot, "dispatcher", None)
-        if not dispatcher:
-           return False
-
-        db_service = dispatcher.get("db_service")
-        if not db_service:
-            return False
-            
-        admin = await db_service.get_admin_by_telegram_id(message.from_user.id)
-        if not admin:
+        # После загрузки реестра проверка идёт по памяти, без запроса в БД
+        access_level = await db_service.get_admin_access_level(message.from_user.id)
+        if access_level is None:
             return False
 
-        if self.required_access and admin.get("access_level") != self.required_access:
+        if self.required_access and access_level != self.required_access:
             return False
 
         return True
@@ -0,0 +1,91 @@
+from typing import Any, Dict, Optional
+from datetime import datetime
+import logging
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StorageKey, StateType
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import ReturnDocument
+from app.database.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+FSM_COLLECTION = "fsm_states"
+
+
+class MongoStorage(BaseStorage):
+    """
+    FSM-хранилище в коллекции fsm_states: один документ на ключ {_id, state, data, updated_at}.
+    TTL-индекс по updated_at удаляет брошенные регистрации.
+    Локальный write-through кэш отвечает на get_state/get_data без похода в БД;
+    кэшируются только непустые состояния, прочитанные из БД или подтверждённые записью.
+    Запись всегда идёт в БД (кэш другой реплики мог устареть); сброс значения
+    у пользователя без документа (state.clear() на /start) документ не создаёт.
+    При нескольких репликах TTL кэша ограничивает окно устаревания.
+
+    Коллекция привязывается в on_startup (bind), когда клиент Mongo уже создан.
+    """
+
+    def __init__(self, collection: Optional[AsyncIOMotorCollection] = None, cache: Optional[TTLCache] = None, state_ttl: int = 86400):
+        self.collection = collection
+        self.cache = cache if cache is not None else TTLCache(maxsize=10000, ttl=10.0)
+        self.state_ttl = state_ttl
+
+    async def bind(self, collection: AsyncIOMotorCollection) -> None:
+        """Привязывает коллекцию и создаёт TTL-индекс (идемпотентно)."""
+        self.collection = collection
+        await collection.create_index("updated_at", expireAfterSeconds=self.state_ttl, name="fsm_updated_at_ttl")
+
+    @staticmethod
+    def _doc_id(key: StorageKey) -> str:
+        parts = [str(key.bot_id), str(key.chat_id), str(key.user_id)]
+        if key.thread_id:
+            parts.append(f"t{key.thread_id}")
+        if key.business_connection_id:
+            parts.append(f"b{key.business_connection_id}")
+        if key.destiny != "default":
+            parts.append(key.destiny)
+        return ":".join(parts)
+
+    async def _load(self, doc_id: str) -> Dict[str, Any]:
+        entry = self.cache.get(doc_id)
+        if entry is None:
+            doc = await self.collection.find_one({"_id": doc_id}, projection={"state": True, "data": True})
+            entry = {"state": (doc or {}).get("state"), "data": (doc or {}).get("data") or {}}
+            # Пустое состояние не кэшируем: его могла только что заполнить другая реплика
+            if entry["state"] is not None or entry["data"]:
+                self.cache.set(doc_id, entry)
+        return entry
+
+    async def _write(self, doc_id: str, field: str, value: Any) -> None:
+        try:
+            doc = await self.collection.find_one_and_update(
+                {"_id": doc_id},
+                {"$set": {field: value, "updated_at": datetime.now()}},
+                projection={"state": True, "data": True},
+                upsert=bool(value),
+                return_document=ReturnDocument.AFTER
+            )
+        except Exception:
+            # Итог записи неизвестен — следующее чтение пойдёт в БД
+            self.cache.invalidate(doc_id)
+            raise
+        if doc is None or (doc.get("state") is None and not doc.get("data")):
+            self.cache.invalidate(doc_id)
+        else:
+            self.cache.set(doc_id, {"state": doc.get("state"), "data": doc.get("data") or {}})
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        value = state.state if isinstance(state, State) else state
+        await self._write(self._doc_id(key), "state", value)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return (await self._load(self._doc_id(key)))["state"]
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        await self._write(self._doc_id(key), "data", dict(data))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return dict((await self._load(self._doc_id(key)))["data"])
+
+    async def close(self) -> None:
+        self.cache.clear()
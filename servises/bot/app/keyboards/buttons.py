@@ -0,0 +1,38 @@
+from typing import Optional
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from app.keyboards.callbacks import UsersPage, TopPage
+
+
+def users_page_keyboard(first_id: Optional[int], last_id: Optional[int], has_prev: bool, has_next: bool) -> Optional[InlineKeyboardMarkup]:
+    """Кнопки «назад/вперёд» для /users; курсор хранится в callback_data."""
+    row = []
+    if has_prev and first_id is not None:
+        row.append(InlineKeyboardButton(
+            text="⬅️ Назад",
+            callback_data=UsersPage(direction="prev", cursor=first_id).pack()
+        ))
+    if has_next and last_id is not None:
+        row.append(InlineKeyboardButton(
+            text="Вперёд ➡️",
+            callback_data=UsersPage(direction="next", cursor=last_id).pack()
+        ))
+    return InlineKeyboardMarkup(inline_keyboard=[row]) if row else None
+
+
+def top_page_keyboard(board: str, page: int, has_next: bool) -> InlineKeyboardMarkup:
+    """Переключение рейтинга (баллы/рефералы) и страниц для админского /top_admin."""
+    other = "referrers" if board == "points" else "points"
+    nav = []
+    if page > 0:
+        nav.append(InlineKeyboardButton(
+            text="⬅️ Назад", callback_data=TopPage(board=board, page=page - 1).pack()
+        ))
+    if has_next:
+        nav.append(InlineKeyboardButton(
+            text="Вперёд ➡️", callback_data=TopPage(board=board, page=page + 1).pack()
+        ))
+    switch = [InlineKeyboardButton(
+        text="👥 По рефералам" if other == "referrers" else "💰 По баллам",
+        callback_data=TopPage(board=other, page=0).pack()
+    )]
+    return InlineKeyboardMarkup(inline_keyboard=[row for row in (nav, switch) if row])
@@ -0,0 +1,27 @@
+from typing import Optional
+from aiogram.filters.callback_data import CallbackData
+
+
+class UsersPage(CallbackData, prefix="users"):
+    """Листание /users: direction — next/prev, cursor — граничный telegram_id."""
+    direction: str
+    cursor: int
+
+
+class TopPage(CallbackData, prefix="top"):
+    """Листание рейтинга: board — points/referrers, page — номер страницы с нуля."""
+    board: str
+    page: int
+
+
+class RegisterStart(CallbackData, prefix="register"):
+    """Кнопка «Зарегистрироваться»; упаковывается в "register"."""
+
+
+class SkipReferral(CallbackData, prefix="skip"):
+    """Пропуск ввода реферального кода; упаковывается в "skip"."""
+
+
+class ActivateUser(CallbackData, prefix="activate"):
+    """Активация пользователя: target — id, телефон или @username; без target — "activate"."""
+    target: Optional[str] = None
@@ -0,0 +1,141 @@
+from typing import Optional, Any, Dict, List, Tuple, Hashable
+from string import Formatter
+from aiogram import types
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+_formatter = Formatter()
+
+
+def _has_placeholders(value: str) -> bool:
+    return any(field is not None for _, field, _, _ in _formatter.parse(value))
+
+
+def _normalize_rows(reply_markup: Any) -> List[List[Dict[str, str]]]:
+    """Приводит сырой reply_markup (dict или JSON-строка) к списку рядов кнопок."""
+    if isinstance(reply_markup, str):
+        try:
+            reply_markup = json.loads(reply_markup)
+        except Exception:
+            return []
+    if not reply_markup or not isinstance(reply_markup, dict):
+        return []
+
+    rows = reply_markup.get("inline_keyboard")
+    if not rows or not isinstance(rows, list):
+        return []
+
+    serialized_rows: List[List[Dict[str, str]]] = []
+    for row in rows:
+        if not isinstance(row, list):
+            continue
+        serialized_row: List[Dict[str, str]] = []
+        for btn in row:
+            if not isinstance(btn, dict):
+                continue
+            btn_payload: Dict[str, str] = {"text": str(btn.get("text", ""))}
+            cb = btn.get("callback_data")
+            url = btn.get("url")
+            if cb is not None:
+                btn_payload["callback_data"] = str(cb)
+            elif url is not None:
+                btn_payload["url"] = str(url)
+            serialized_row.append(btn_payload)
+        if serialized_row:
+            serialized_rows.append(serialized_row)
+    return serialized_rows
+
+
+class CompiledKeyboard:
+    """
+    Скомпилированная inline-клавиатура.
+    Статическая клавиатура валидируется один раз и переиспользуется как есть;
+    для клавиатур с {плейсхолдерами} повторная валидация pydantic не выполняется —
+    кнопки собираются через model_construct из уже проверенной структуры.
+    """
+
+    __slots__ = ("markup", "rows", "dynamic")
+
+    def __init__(self, rows: List[List[Dict[str, str]]], markup: types.InlineKeyboardMarkup):
+        self.rows = rows
+        self.markup = markup
+        self.dynamic = any(
+            _has_placeholders(value)
+            for row in rows for btn in row for key, value in btn.items()
+            if key in ("text", "callback_data")
+        )
+
+    def render(self, **kwargs) -> types.InlineKeyboardMarkup:
+        if not self.dynamic or not kwargs:
+            return self.markup
+        inline_keyboard = []
+        for row in self.rows:
+            buttons = []
+            for btn in row:
+                payload = dict(btn)
+                for key in ("text", "callback_data"):
+                    if key in payload:
+                        try:
+                            payload[key] = payload[key].format(**kwargs)
+                        except (KeyError, IndexError, ValueError):
+                            pass
+                buttons.append(types.InlineKeyboardButton.model_construct(**payload))
+            inline_keyboard.append(buttons)
+        return types.InlineKeyboardMarkup.model_construct(inline_keyboard=inline_keyboard)
+
+
+def compile_keyboard(reply_markup: Any) -> Optional[CompiledKeyboard]:
+    """Разбирает и валидирует reply_markup. Возвращает None, если кнопок нет."""
+    rows = _normalize_rows(reply_markup)
+    if not rows:
+        return None
+    try:
+        markup = types.InlineKeyboardMarkup.model_validate({"inline_keyboard": rows})
+    except Exception:
+        logger.exception("failed to construct InlineKeyboardMarkup")
+        return None
+    if not markup.inline_keyboard:
+        return None
+    return CompiledKeyboard(rows, markup)
+
+
+class KeyboardRegistry:
+    """
+    Кэш скомпилированных клавиатур: message_id -> (содержимое reply_markup, CompiledKeyboard).
+    Ключ — само содержимое, а не version: правка напрямую в Mongo version не меняет,
+    но после обновления кэша сообщений приходит новый reply_markup и вытесняет старую компиляцию.
+    """
+
+    def __init__(self):
+        self._compiled: Dict[Hashable, Tuple[str, Optional[CompiledKeyboard]]] = {}
+
+    @staticmethod
+    def _content_key(reply_markup: Any) -> str:
+        if isinstance(reply_markup, str):
+            return reply_markup
+        return json.dumps(reply_markup, sort_keys=True, ensure_ascii=False, default=str)
+
+    def get(self, message_doc: Dict[str, Any]) -> Optional[CompiledKeyboard]:
+        reply_markup = message_doc.get("reply_markup")
+        if not reply_markup:
+            return None
+        message_id = message_doc.get("message_id")
+        content = self._content_key(reply_markup)
+        cached = self._compiled.get(message_id)
+        if cached is not None and cached[0] == content:
+            return cached[1]
+        compiled = compile_keyboard(reply_markup)
+        self._compiled[message_id] = (content, compiled)
+        logger.debug("compiled keyboard for %s: %s", message_id, reply_markup)
+        return compiled
+
+    def invalidate(self, message_id: Hashable) -> None:
+        self._compiled.pop(message_id, None)
+
+    def clear(self) -> None:
+        self._compiled.clear()
+
+
+keyboards = KeyboardRegistry()
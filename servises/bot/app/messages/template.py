@@ -0,0 +1,131 @@
+from typing import Optional, Any, Dict, Hashable, Iterable, List, Tuple, FrozenSet
+from string import Formatter
+import logging
+import operator
+
+logger = logging.getLogger(__name__)
+
+_formatter = Formatter()
+
+
+class TemplateError(ValueError):
+    """Шаблон не удалось разобрать."""
+
+
+class CompiledTemplate:
+    """
+    Шаблон текста, разобранный в сегменты один раз.
+    Простые шаблоны ({name}) компилируются в %-строку и operator.itemgetter,
+    поэтому рендер — одна C-операция без повторного разбора str.format.
+    Поля со спецификатором формата, конверсией или доступом к атрибутам
+    ({a.b}, {x:>5}, {y!r}) рендерятся через str.format_map исходника.
+    """
+
+    __slots__ = ("source", "placeholders", "segments", "_static", "_fmt", "_getter", "_single")
+
+    def __init__(self, source: str):
+        self.source = source
+        segments: List[str] = []
+        names: List[str] = []
+        simple = True
+        literal_acc = ""
+        try:
+            for literal, field, spec, conversion in _formatter.parse(source):
+                literal_acc += literal
+                if field is None:
+                    continue
+                if not field.isidentifier() or spec or conversion:
+                    simple = False
+                names.append(field.split(".", 1)[0].split("[", 1)[0])
+                segments.append(literal_acc)
+                segments.append(field)
+                literal_acc = ""
+            segments.append(literal_acc)
+        except ValueError as e:
+            raise TemplateError(f"invalid template {source!r}: {e}") from e
+        if any(not name or name.isdigit() for name in names):
+            raise TemplateError(f"positional placeholders are not supported: {source!r}")
+
+        # Чётные элементы — литералы, нечётные — имена плейсхолдеров
+        self.segments: Tuple[str, ...] = tuple(segments)
+        self.placeholders: FrozenSet[str] = frozenset(names)
+        self._static: Optional[str] = segments[0] if not names else None
+        self._single = len(names) == 1
+        if names and simple:
+            self._fmt = "%s".join(lit.replace("%", "%%") for lit in segments[::2])
+            self._getter = operator.itemgetter(*segments[1::2])
+        else:
+            self._fmt = None
+            self._getter = None
+
+    def render(self, **kwargs) -> str:
+        """Подставляет значения. При нехватке аргументов возвращает исходный текст."""
+        if self._static is not None:
+            return self._static
+        try:
+            if self._fmt is None:
+                return self.source.format_map(kwargs)
+            if self._single:
+                return self._fmt % (self._getter(kwargs),)
+            return self._fmt % self._getter(kwargs)
+        except (KeyError, IndexError, AttributeError, ValueError):
+            return self.source
+
+    def check(self, names: Iterable[str]) -> Tuple[FrozenSet[str], FrozenSet[str]]:
+        """Возвращает (missing, extra) относительно переданного набора имён."""
+        provided = frozenset(names)
+        return self.placeholders - provided, provided - self.placeholders
+
+
+def validate_template(message_id: Hashable, text: str, declared: Optional[Iterable[str]] = None) -> Optional[CompiledTemplate]:
+    """
+    Компилирует шаблон и логирует ошибки разбора и расхождения
+    с объявленным списком плейсхолдеров (поле "placeholders" сообщения).
+    """
+    try:
+        compiled = CompiledTemplate(text or "")
+    except TemplateError as e:
+        logger.error(f"Template '{message_id}': {e}")
+        return None
+    if declared is not None:
+        missing, extra = compiled.check(declared)
+        if missing:
+            logger.warning(f"Template '{message_id}' uses undeclared placeholders: {sorted(missing)}")
+        if extra:
+            logger.warning(f"Template '{message_id}' declares unused placeholders: {sorted(extra)}")
+    return compiled
+
+
+class TemplateRegistry:
+    """
+    Кэш скомпилированных шаблонов: message_id -> ((text, placeholders), CompiledTemplate).
+    Ключ — содержимое шаблона, а не version: правка текста напрямую в Mongo
+    version не меняет, но после обновления кэша сообщений перекомпилируется.
+    """
+
+    def __init__(self):
+        self._compiled: Dict[Hashable, Tuple[Any, CompiledTemplate]] = {}
+
+    def get(self, message_doc: Dict[str, Any]) -> CompiledTemplate:
+        message_id = message_doc.get("message_id")
+        text = message_doc.get("text", "") or ""
+        placeholders = message_doc.get("placeholders")
+        content = (text, tuple(placeholders) if placeholders is not None else None)
+        cached = self._compiled.get(message_id)
+        if cached is not None and cached[0] == content:
+            return cached[1]
+        compiled = validate_template(message_id, text, placeholders)
+        if compiled is None:
+            # Некорректный шаблон отдаём как есть, без подстановок
+            compiled = CompiledTemplate(text.replace("{", "{{").replace("}", "}}"))
+        self._compiled[message_id] = (content, compiled)
+        return compiled
+
+    def invalidate(self, message_id: Hashable) -> None:
+        self._compiled.pop(message_id, None)
+
+    def clear(self) -> None:
+        self._compiled.clear()
+
+
+templates = TemplateRegistry()
@@ -0,0 +1,26 @@
+from app.metrics.registry import REGISTRY
+
+# Метрики обработки апдейтов aiogram
+UPDATES_TOTAL = REGISTRY.counter("bot_updates_total", "Received updates by type", ("update_type",))
+UPDATES_IN_FLIGHT = REGISTRY.gauge("bot_updates_in_flight", "Updates currently being processed")
+UPDATE_LATENCY = REGISTRY.histogram("bot_update_duration_seconds", "Full update processing time", ("update_type",))
+UPDATE_ERRORS = REGISTRY.counter("bot_update_errors_total", "Updates that raised an exception", ("update_type", "error"))
+HANDLER_LATENCY = REGISTRY.histogram("bot_handler_duration_seconds", "Handler execution time", ("router", "handler", "event"))
+HANDLER_ERRORS = REGISTRY.counter("bot_handler_errors_total", "Handler exceptions", ("router", "handler", "event"))
+FSM_TRANSITIONS = REGISTRY.counter("bot_fsm_transitions_total", "FSM state transitions", ("from_state", "to_state"))
+
+# Планировщик апдейтов по чатам (ChatScheduler)
+SCHEDULER_PENDING = REGISTRY.gauge("bot_scheduler_pending_updates", "Updates queued or running in the scheduler")
+SCHEDULER_RUNNING = REGISTRY.gauge("bot_scheduler_running_updates", "Updates currently executing")
+SCHEDULER_CHATS = REGISTRY.gauge("bot_scheduler_active_chats", "Chats with a non-empty queue")
+SCHEDULER_QUEUE_WAIT = REGISTRY.histogram("bot_scheduler_queue_wait_seconds", "Time from enqueue to execution start")
+SCHEDULER_THROTTLED = REGISTRY.counter("bot_scheduler_throttled_total", "Pauses caused by database backpressure")
+
+# Очередь уведомлений
+NOTIFICATIONS_TOTAL = REGISTRY.counter("bot_notifications_total", "Notification delivery attempts by result", ("result",))
+NOTIFICATIONS_COALESCED = REGISTRY.histogram(
+    "bot_notifications_coalesced_items", "Events merged into one delivered message", buckets=(1, 2, 5, 10, 25, 50, 100)
+)
+
+# Рассылки
+BROADCAST_MESSAGES = REGISTRY.counter("bot_broadcast_messages_total", "Broadcast deliveries by result", ("result",))
@@ -0,0 +1,31 @@
+from typing import Any, Iterable, List
+
+
+def mongo_collector(resources: Any):
+    """Метрики пула, кэшей и команд Mongo, снимаемые в момент scrape."""
+
+    def collect() -> Iterable[str]:
+        lines: List[str] = []
+        if not resources.started:
+            return lines
+        pool = resources.pool_stats()
+        lines.append("# TYPE mongo_pool_connections gauge")
+        for state in ("open", "checked_out", "waiters"):
+            lines.append(f'mongo_pool_connections{{state="{state}"}} {pool[state]}')
+        lines.append("# TYPE mongo_pool_checkout_failures_total counter")
+        lines.append(f"mongo_pool_checkout_failures_total {pool['checkout_failures']}")
+
+        db_service = resources.db_service
+        lines.append("# TYPE bot_cache_requests_total counter")
+        for cache_name, stats in (("messages", db_service.message_cache_stats()), ("users", db_service.user_cache_stats())):
+            lines.append(f'bot_cache_requests_total{{cache="{cache_name}",result="hit"}} {stats["hits"]}')
+            lines.append(f'bot_cache_requests_total{{cache="{cache_name}",result="miss"}} {stats["misses"]}')
+
+        lines.append("# TYPE mongo_command_duration_seconds summary")
+        for item in resources.command_stats.top_offenders(limit=1000):
+            labels = f'method="{item["method"]}",command="{item["command"]}"'
+            lines.append(f"mongo_command_duration_seconds_count{{{labels}}} {item['count']}")
+            lines.append(f"mongo_command_duration_seconds_sum{{{labels}}} {item['total_ms'] / 1000}")
+        return lines
+
+    return collect
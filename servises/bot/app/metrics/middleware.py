@@ -0,0 +1,98 @@
+from typing import Any, Awaitable, Callable, Dict, Optional
+import time
+from aiogram import BaseMiddleware, Router
+from aiogram.fsm.storage.base import BaseStorage, StorageKey, StateType
+from aiogram.types import TelegramObject, Update
+from app.metrics.bot import (
+    UPDATES_TOTAL, UPDATES_IN_FLIGHT, UPDATE_LATENCY, UPDATE_ERRORS,
+    HANDLER_LATENCY, HANDLER_ERRORS, FSM_TRANSITIONS
+)
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """Outer-middleware на dp.update: счётчики типов апдейтов, in-flight, латентность и ошибки."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        update_type = getattr(event, "event_type", None) if isinstance(event, Update) else type(event).__name__
+        update_type = update_type or "unknown"
+        UPDATES_TOTAL.inc(update_type)
+        UPDATES_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            UPDATE_ERRORS.inc(update_type, type(e).__name__)
+            raise
+        finally:
+            UPDATE_LATENCY.observe(time.perf_counter() - started, update_type)
+            UPDATES_IN_FLIGHT.dec()
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Inner-middleware роутера: латентность и ошибки конкретного хендлера."""
+
+    def __init__(self, router_name: str, event_name: str):
+        self.router_name = router_name
+        self.event_name = event_name
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        # Для таблицы callback'ов метка — конечный хендлер маршрута, а не диспетчер таблицы
+        handler_object = data.get("callback_route") or data.get("handler")
+        callback = getattr(handler_object, "callback", None)
+        handler_name = getattr(callback, "__qualname__", None) or "unknown"
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.inc(self.router_name, handler_name, self.event_name)
+            raise
+        finally:
+            HANDLER_LATENCY.observe(time.perf_counter() - started, self.router_name, handler_name, self.event_name)
+
+
+def instrument_routers(root: Router) -> None:
+    """
+    Вешает HandlerMetricsMiddleware на наблюдатели роутеров, у которых есть хендлеры.
+    Inner-middleware наследуются вложенными роутерами, поэтому роутеры-контейнеры пропускаются.
+    """
+    for router in root.chain_tail:
+        for event_name, observer in router.observers.items():
+            if event_name in ("update", "error") or not observer.handlers:
+                continue
+            observer.middleware(HandlerMetricsMiddleware(router.name, event_name))
+
+
+class MetricsStorage(BaseStorage):
+    """Обёртка над FSM-хранилищем, считающая переходы состояний."""
+
+    def __init__(self, inner: BaseStorage):
+        self.inner = inner
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        previous = await self.inner.get_state(key)
+        await self.inner.set_state(key, state)
+        new = state.state if hasattr(state, "state") else state
+        if previous != new:
+            FSM_TRANSITIONS.inc(previous or "none", new or "none")
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return await self.inner.get_state(key)
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        await self.inner.set_data(key, data)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return await self.inner.get_data(key)
+
+    async def close(self) -> None:
+        await self.inner.close()
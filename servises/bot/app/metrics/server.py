@@ -0,0 +1,35 @@
+import logging
+from typing import Optional
+from aiohttp import web
+from app.metrics.registry import REGISTRY, Registry
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def metrics_handler(registry: Registry = REGISTRY):
+    async def handle(request: web.Request) -> web.Response:
+        return web.Response(body=registry.render().encode("utf-8"), headers={"Content-Type": CONTENT_TYPE})
+    return handle
+
+
+async def healthz_handler(request: web.Request) -> web.Response:
+    return web.Response(text="ok")
+
+
+def create_app(registry: Optional[Registry] = REGISTRY) -> web.Application:
+    """aiohttp-приложение с /metrics (если передан registry) и /healthz."""
+    app = web.Application()
+    if registry is not None:
+        app.router.add_get("/metrics", metrics_handler(registry))
+    app.router.add_get("/healthz", healthz_handler)
+    return app
+
+
+async def start_server(app: web.Application, host: str, port: int) -> web.AppRunner:
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"HTTP server listening on {host}:{port}")
+    return runner
@@ -0,0 +1,17 @@
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from app.database.cache import request_scope
+
+
+class RequestMemoMiddleware(BaseMiddleware):
+    """Открывает request-scoped мемо DatabaseService на время обработки апдейта."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        with request_scope():
+            return await handler(event, data)
@@ -0,0 +1,119 @@
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Optional, Set, Tuple
+import asyncio
+import logging
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from app.metrics.bot import (
+    SCHEDULER_PENDING, SCHEDULER_RUNNING, SCHEDULER_CHATS, SCHEDULER_QUEUE_WAIT, SCHEDULER_THROTTLED
+)
+
+logger = logging.getLogger(__name__)
+
+Job = Tuple[Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]], TelegramObject, Dict[str, Any], float]
+
+
+class ChatScheduler(BaseMiddleware):
+    """
+    Outer-middleware на dp.update: апдейты одного чата выполняются строго по очереди,
+    разные чаты — параллельно, но не больше max_concurrency одновременно.
+
+    Апдейт ставится в очередь своего чата, и middleware сразу возвращает управление;
+    остальная цепочка (метрики, мемо, хендлеры) выполняется воркером чата.
+    Постановка в очередь не уступает управление, пока есть место, поэтому порядок
+    приёма сохраняется. Когда в работе max_pending апдейтов, постановка ждёт —
+    при start_polling(handle_as_tasks=False) это останавливает getUpdates.
+    Пока overloaded() истинно (очередь ожидания пула Mongo), новые апдейты не запускаются.
+
+    Должен регистрироваться первым из пользовательских outer-middleware: к этому моменту
+    встроенные middleware aiogram (ошибки, контекст пользователя, FSM) уже отработали.
+    Поэтому состояние FSM, прочитанное при постановке в очередь, перечитывается в воркере
+    перед запуском хендлера, а исключения хендлеров логируются здесь — до ErrorsMiddleware
+    они уже не доходят.
+    """
+
+    def __init__(self, max_concurrency: int = 64, max_pending: int = 1000,
+                 overloaded: Optional[Callable[[], bool]] = None, pressure_pause: float = 0.05):
+        self._running = asyncio.Semaphore(max_concurrency)
+        self._pending = asyncio.Semaphore(max_pending)
+        self._overloaded = overloaded
+        self._pressure_pause = pressure_pause
+        self._queues: Dict[Hashable, Deque[Job]] = {}
+        self._workers: Set[asyncio.Task] = set()
+
+    @staticmethod
+    def _chat_key(data: Dict[str, Any]) -> Optional[Hashable]:
+        chat = data.get("event_chat")
+        if chat is not None:
+            return chat.id
+        user = data.get("event_from_user")
+        return ("user", user.id) if user is not None else None
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        await self._pending.acquire()
+        SCHEDULER_PENDING.inc()
+        job = (handler, event, data, asyncio.get_running_loop().time())
+        key = self._chat_key(data)
+        if key is None:
+            self._spawn(self._drain(None, deque([job])))
+            return None
+        queue = self._queues.get(key)
+        if queue is not None:
+            queue.append(job)
+            return None
+        self._queues[key] = deque([job])
+        SCHEDULER_CHATS.set(len(self._queues))
+        self._spawn(self._drain(key, self._queues[key]))
+        return None
+
+    def _spawn(self, coro: Awaitable[None]) -> None:
+        task = asyncio.create_task(coro)
+        self._workers.add(task)
+        task.add_done_callback(self._workers.discard)
+
+    async def _drain(self, key: Optional[Hashable], queue: Deque[Job]) -> None:
+        try:
+            while queue:
+                await self._run(queue.popleft())
+        finally:
+            if key is not None:
+                self._queues.pop(key, None)
+                SCHEDULER_CHATS.set(len(self._queues))
+
+    async def _run(self, job: Job) -> None:
+        handler, event, data, enqueued_at = job
+        try:
+            while self._overloaded is not None and self._overloaded():
+                SCHEDULER_THROTTLED.inc()
+                await asyncio.sleep(self._pressure_pause)
+            async with self._running:
+                SCHEDULER_QUEUE_WAIT.observe(asyncio.get_running_loop().time() - enqueued_at)
+                SCHEDULER_RUNNING.inc()
+                try:
+                    # raw_state зафиксирован FSMContextMiddleware при постановке в очередь;
+                    # предыдущий апдейт чата мог его изменить (телефон -> код)
+                    state = data.get("state")
+                    if state is not None:
+                        data["raw_state"] = await state.get_state()
+                    await handler(event, data)
+                except Exception:
+                    logger.exception(f"Update {getattr(event, 'update_id', None)} processing failed")
+                finally:
+                    SCHEDULER_RUNNING.dec()
+        finally:
+            self._pending.release()
+            SCHEDULER_PENDING.dec()
+
+    @property
+    def pending(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    async def drain(self) -> None:
+        """Дожидается выполнения всех принятых апдейтов."""
+        while self._workers:
+            await asyncio.gather(*list(self._workers), return_exceptions=True)
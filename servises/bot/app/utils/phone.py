@@ -1,19 +1,19 @@
 import re
+from typing import Iterable, List, Optional
+
+_NON_PHONE_CHARS = re.compile(r'[^\d+]')
+_PHONE_PATTERNS = [
+    re.compile(r'^\+7\d{10}$'),  # +7XXXXXXXXXX
+    re.compile(r'^8\d{10}$'),    # 8XXXXXXXXXX
+    re.compile(r'^7\d{10}$')     # 7XXXXXXXXXX
+]
 
 def validate_phone_number(phone: str) -> bool:
     """Валидация номера телефона."""
-    clean_phone = re.sub(r'[^\d+]', '', phone)
-    patterns = [
-        r'^\+7\d{10}$',  # +7XXXXXXXXXX
-        r'^8\d{10}$',    # 8XXXXXXXXXX
-        r'^7\d{10}$'     # 7XXXXXXXXXX
-    ]
-    return any(re.match(pattern, clean_phone) for pattern in patterns)
+    clean_phone = _NON_PHONE_CHARS.sub('', phone)
+    return any(pattern.match(clean_phone) for pattern in _PHONE_PATTERNS)
 
-def normalize_phone_number(phone: str) -> str:
-    """Нормализует номер телефона к формату +7XXXXXXXXXX."""
-    clean_phone = re.sub(r'[^\d+]', '', phone)
-    
+def _normalize_clean(clean_phone: str) -> str:
     if clean_phone.startswith('+7'):
         return clean_phone
     elif clean_phone.startswith('8'):
@@ -23,3 +23,23 @@ def normalize_phone_number(phone: str) -> str:
     else:
         return '+7' + clean_phone
 
+def normalize_phone_number(phone: str) -> str:
+    """Нормализует номер телефона к формату +7XXXXXXXXXX."""
+    return _normalize_clean(_NON_PHONE_CHARS.sub('', phone))
+
+def normalize_phone_batch(phones: Iterable[Optional[str]]) -> List[Optional[str]]:
+    """
+    Валидирует и нормализует пачку номеров за один проход:
+    очистка выполняется один раз на номер, невалидные дают None.
+    """
+    result: List[Optional[str]] = []
+    for phone in phones:
+        if not phone:
+            result.append(None)
+            continue
+        clean_phone = _NON_PHONE_CHARS.sub('', str(phone))
+        if any(pattern.match(clean_phone) for pattern in _PHONE_PATTERNS):
+            result.append(_normalize_clean(clean_phone))
+        else:
+            result.append(None)
+    return result
@@ -0,0 +1,87 @@
+from typing import Dict, Hashable, Optional
+import asyncio
+import time
+
+
+class TokenBucket:
+    """
+    Token bucket: rate токенов в секунду, не больше capacity накопленных.
+    Ожидающие обслуживаются по очереди (FIFO через lock).
+    block() обнуляет бакет на заданное время — для ответа 429 retry_after.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self) -> float:
+        """Сколько ждать до следующего токена (без списания)."""
+        now = time.monotonic()
+        self._refill(now)
+        blocked = max(0.0, self._blocked_until - now)
+        return max(blocked, (1 - self._tokens) / self.rate if self._tokens < 1 else 0.0)
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                wait = self.delay()
+                if wait <= 0:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep(wait)
+
+    def block(self, seconds: float) -> None:
+        now = time.monotonic()
+        self._blocked_until = max(self._blocked_until, now + seconds)
+        self._refill(now)
+        self._tokens = 0.0
+
+
+class ChatRateLimiter:
+    """Не чаще rate сообщений в секунду в один чат: chat_id -> момент следующей разрешённой отправки."""
+
+    def __init__(self, rate: float = 1.0, prune_above: int = 10_000):
+        self.interval = 1.0 / rate
+        self.prune_above = prune_above
+        self._next: Dict[Hashable, float] = {}
+
+    def delay(self, chat_id: Hashable) -> float:
+        return max(0.0, self._next.get(chat_id, 0.0) - time.monotonic())
+
+    def reserve(self, chat_id: Hashable) -> float:
+        """Занимает ближайший слот чата и возвращает, сколько до него ждать."""
+        now = time.monotonic()
+        slot = max(now, self._next.get(chat_id, 0.0))
+        self._next[chat_id] = slot + self.interval
+        if len(self._next) > self.prune_above:
+            self._next = {key: at for key, at in self._next.items() if at > now}
+        return slot - now
+
+
+class SendLimiter:
+    """
+    Общие лимиты исходящих сообщений Telegram: глобальный бакет (~30/с)
+    и по чату (~1/с). Один экземпляр на процесс — его используют и очередь
+    уведомлений, и рассылки.
+    """
+
+    def __init__(self, global_rate: float = 30.0, chat_rate: float = 1.0):
+        self.global_bucket = TokenBucket(global_rate)
+        self.chats = ChatRateLimiter(chat_rate)
+
+    async def acquire(self, chat_id: Hashable) -> None:
+        wait = self.chats.reserve(chat_id)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        await self.global_bucket.acquire()
+
+    def retry_after(self, seconds: float) -> None:
+        self.global_bucket.block(seconds)
@@ -0,0 +1,25 @@
+from typing import Iterable, Iterator
+
+# Ограничение Telegram на длину текста сообщения
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+
+def chunk_records(records: Iterable[str], limit: int = TELEGRAM_MESSAGE_LIMIT, sep: str = "\n\n") -> Iterator[str]:
+    """
+    Склеивает записи в сообщения не длиннее limit, разрывая только между записями.
+    Запись длиннее limit обрезается, чтобы не потерять остальные.
+    """
+    chunk: list[str] = []
+    size = 0
+    for record in records:
+        if len(record) > limit:
+            record = record[:limit - 1] + "…"
+        added = len(record) + (len(sep) if chunk else 0)
+        if chunk and size + added > limit:
+            yield sep.join(chunk)
+            chunk, size = [], 0
+            added = len(record)
+        chunk.append(record)
+        size += added
+    if chunk:
+        yield sep.join(chunk)
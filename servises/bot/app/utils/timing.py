@@ -0,0 +1,25 @@
+from contextlib import contextmanager
+from typing import Dict, Iterator
+import time
+
+
+class StageTimer:
+    """Замер длительности этапов операции в миллисекундах."""
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + (time.perf_counter() - started) * 1000
+
+    def report(self) -> Dict[str, float]:
+        """Этапы плюс total — время с момента создания таймера."""
+        result = {name: round(ms, 3) for name, ms in self.stages.items()}
+        result["total"] = round((time.perf_counter() - self._started) * 1000, 3)
+        return result
@@ -0,0 +1,102 @@
+from typing import Any, Set
+import asyncio
+import hmac
+import logging
+import signal
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookHandler:
+    """
+    Приём апдейтов от Telegram через webhook.
+    Апдейт подтверждается сразу после постановки в обработку; одновременно
+    обрабатывается не больше max_concurrency апдейтов. Когда все слоты заняты,
+    ответ задерживается до освобождения слота — Telegram сам притормозит отправку.
+    """
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, secret_token: str, max_concurrency: int = 100):
+        if not secret_token:
+            raise ValueError("webhook secret token is required")
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.secret_token = secret_token
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._tasks: Set[asyncio.Task] = set()
+
+    def register(self, app: web.Application, path: str) -> None:
+        app.router.add_post(path, self.handle)
+
+    def _check_secret(self, request: web.Request) -> bool:
+        # Без секрета запрос не принимается никогда: иначе любой может прислать поддельный апдейт
+        if not self.secret_token:
+            return False
+        provided = request.headers.get(SECRET_HEADER, "")
+        return hmac.compare_digest(provided.encode(), self.secret_token.encode())
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if not self._check_secret(request):
+            return web.Response(status=401)
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": self.bot})
+        except Exception as e:
+            logger.warning(f"Rejected malformed webhook update: {e}")
+            return web.Response(status=400)
+        await self._semaphore.acquire()
+        task = asyncio.create_task(self._process(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return web.Response()
+
+    async def _process(self, update: Update) -> None:
+        try:
+            await self.dispatcher.feed_update(self.bot, update)
+        except Exception:
+            logger.exception(f"Failed to process update {update.update_id}")
+        finally:
+            self._semaphore.release()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._tasks)
+
+    async def drain(self) -> None:
+        """Дожидается обработки уже принятых апдейтов."""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+async def run_webhook(dispatcher: Dispatcher, bot: Bot, **kwargs: Any) -> None:
+    """
+    Аналог start_polling для webhook-режима: вызывает startup/shutdown
+    хендлеры диспетчера и ждёт SIGINT/SIGTERM (или отмены).
+    HTTP-сервер поднимается в on_startup; on_shutdown дожидается уже принятых апдейтов.
+    """
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    signals = (signal.SIGINT, signal.SIGTERM)
+    for sig in signals:
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            # Windows или не главный поток — остаётся только отмена задачи
+            pass
+
+    workflow_data = {"dispatcher": dispatcher, "bots": [bot], **dispatcher.workflow_data, **kwargs}
+    await dispatcher.emit_startup(bot=bot, **workflow_data)
+    try:
+        await stop.wait()
+        logger.info("Stop signal received, shutting down webhook mode")
+    finally:
+        for sig in signals:
+            try:
+                loop.remove_signal_handler(sig)
+            except (NotImplementedError, RuntimeError):
+                pass
+        await dispatcher.emit_shutdown(bot=bot, **workflow_data)
+        await bot.session.close()
@@ -0,0 +1,115 @@
+"""
+Диспетчеризация callback_query при сотнях зарегистрированных callback'ов:
+линейные lambda-фильтры (c.data == "..."), фильтры CallbackData.filter()
+и таблица CallbackTable (словарь по префиксу).
+
+    python -m bench.bench_callback_dispatch
+"""
+import asyncio
+import random
+import time
+import types as pytypes
+
+from aiogram import Bot, Dispatcher, Router
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import CallbackQuery, Update
+
+from app.event.callback_table import CallbackTable
+
+FAKE_TOKEN = "123456:" + "A" * 35
+UPDATES = 2000
+
+
+def make_factory(i: int):
+    return pytypes.new_class(
+        f"Cb{i}", (CallbackData,), {"prefix": f"cb{i}"},
+        lambda ns: ns.update({"__annotations__": {"value": int}, "__module__": __name__})
+    )
+
+
+async def noop(callback: CallbackQuery) -> None:
+    return None
+
+
+def lambda_dispatcher(n: int) -> Dispatcher:
+    router = Router()
+    for i in range(n):
+        router.callback_query.register(noop, lambda c, prefix=f"cb{i}:": c.data.startswith(prefix))
+    dp = Dispatcher()
+    dp.include_router(router)
+    return dp
+
+
+def factory_dispatcher(n: int, factories) -> Dispatcher:
+    router = Router()
+    for factory in factories[:n]:
+        router.callback_query.register(noop, factory.filter())
+    dp = Dispatcher()
+    dp.include_router(router)
+    return dp
+
+
+def table_dispatcher(n: int, factories) -> Dispatcher:
+    table = CallbackTable()
+    for factory in factories[:n]:
+        table.handler(factory)(noop)
+    dp = Dispatcher()
+    dp.include_router(table.router)
+    return dp
+
+
+def make_updates(n: int, bot: Bot):
+    rng = random.Random(1)
+    return [
+        Update.model_validate({
+            "update_id": i,
+            "callback_query": {
+                "id": str(i),
+                "from": {"id": 1, "is_bot": False, "first_name": "u"},
+                "chat_instance": "bench",
+                "data": f"cb{rng.randrange(n)}:{i}",
+            },
+        }, context={"bot": bot})
+        for i in range(UPDATES)
+    ]
+
+
+async def timed_feed(dp: Dispatcher, bot: Bot, updates) -> float:
+    started = time.perf_counter()
+    for update in updates:
+        await dp.feed_update(bot, update)
+    return (time.perf_counter() - started) / len(updates) * 1e6
+
+
+def timed_resolve(fn, data) -> float:
+    started = time.perf_counter()
+    for value in data:
+        fn(value)
+    return (time.perf_counter() - started) / len(data) * 1e6
+
+
+async def main() -> None:
+    import logging
+    logging.disable(logging.INFO)
+    factories = [make_factory(i) for i in range(500)]
+    bot = Bot(FAKE_TOKEN)
+    for n in (10, 100, 500):
+        updates = make_updates(n, bot)
+        print(f"{n} callbacks, {UPDATES} updates (us per update, full feed_update)")
+        print(f"  lambda filters           {await timed_feed(lambda_dispatcher(n), bot, updates):8.1f}")
+        print(f"  CallbackData.filter()    {await timed_feed(factory_dispatcher(n, factories), bot, updates):8.1f}")
+        print(f"  CallbackTable            {await timed_feed(table_dispatcher(n, factories), bot, updates):8.1f}")
+
+        data = [u.callback_query.data for u in updates]
+        prefixes = [f"cb{i}:" for i in range(n)]
+        table = CallbackTable()
+        for factory in factories[:n]:
+            table.handler(factory)(noop)
+        linear = lambda value: next(p for p in prefixes if value.startswith(p))
+        print(f"  resolve only: linear prefix scan {timed_resolve(linear, data):6.2f} us, "
+              f"table lookup + unpack {timed_resolve(table.resolve, data):6.2f} us")
+    await bot.session.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
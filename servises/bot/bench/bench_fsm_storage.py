@@ -0,0 +1,81 @@
+"""
+FSM-хранилища на сценарии регистрации: /start (clear), ввод телефона,
+несколько текстовых сообщений с get_state, update_data, ввод кода, clear.
+Сравниваются MemoryStorage, MongoStorage с локальным кэшем и без него.
+
+Нужен доступный MongoDB:
+
+    MONGO_URI=mongodb://localhost:27017 python -m bench.bench_fsm_storage [USERS]
+"""
+import asyncio
+import os
+import sys
+import time
+
+from aiogram.fsm.storage.base import BaseStorage, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.database.cache import TTLCache
+from app.fsm.registration import RegistrationStates
+from app.fsm.storage import MongoStorage, FSM_COLLECTION
+
+BENCH_DB = "reflbot_bench"
+BOT_ID = 42
+TEXT_MESSAGES = 3
+
+
+async def registration_flow(storage: BaseStorage, user_id: int) -> int:
+    """Возвращает число операций с хранилищем."""
+    key = StorageKey(bot_id=BOT_ID, chat_id=user_id, user_id=user_id)
+    ops = 0
+    await storage.set_state(key, None)
+    await storage.set_data(key, {})
+    await storage.set_state(key, RegistrationStates.waiting_for_phone)
+    ops += 3
+    for _ in range(TEXT_MESSAGES):
+        await storage.get_state(key)
+        ops += 1
+    data = await storage.get_data(key)
+    data["phone"] = f"+7900{user_id:07d}"
+    await storage.set_data(key, data)
+    await storage.set_state(key, RegistrationStates.waiting_for_referral_code)
+    await storage.get_state(key)
+    await storage.get_data(key)
+    await storage.set_state(key, None)
+    await storage.set_data(key, {})
+    return ops + 7
+
+
+async def run(label: str, storage: BaseStorage, users: int, concurrency: int = 50) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(user_id: int) -> int:
+        async with semaphore:
+            return await registration_flow(storage, user_id)
+
+    started = time.perf_counter()
+    ops = sum(await asyncio.gather(*(one(1_000_000 + i) for i in range(users))))
+    elapsed = time.perf_counter() - started
+    print(f"  {label:<26} {users / elapsed:10,.0f} flows/s  {elapsed / ops * 1e6:8.1f} us/op")
+
+
+async def main(users: int = 2000) -> None:
+    print(f"{users} registration flows, {TEXT_MESSAGES} text messages each")
+    await run("MemoryStorage", MemoryStorage(), users)
+
+    client = AsyncIOMotorClient(os.environ.get("MONGO_URI", "mongodb://localhost:27017"))
+    collection = client[BENCH_DB][FSM_COLLECTION]
+    for label, cache in (("MongoStorage (no cache)", TTLCache(maxsize=0)),
+                         ("MongoStorage (cache)", TTLCache(maxsize=10000, ttl=10.0))):
+        await collection.delete_many({})
+        storage = MongoStorage(cache=cache)
+        await storage.bind(collection)
+        await run(label, storage, users)
+        if cache.maxsize:
+            print(f"    cache: {cache.stats()}")
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000))
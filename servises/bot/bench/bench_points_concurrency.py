@@ -0,0 +1,72 @@
+"""
+Нагрузочная проверка атомарных списаний: N параллельных subtract_points
+по одному пользователю. Баланс не должен уйти в минус, а число успешных
+списаний должно совпасть с тем, на сколько хватает баллов.
+
+Нужен доступный MongoDB:
+
+    MONGO_URI=mongodb://localhost:27017 python -m bench.bench_points_concurrency [N]
+"""
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.database.service import DatabaseService
+
+BENCH_DB = "reflbot_bench"
+TELEGRAM_ID = 999_000_001
+AMOUNT = 10
+
+
+async def main(parallel: int = 500) -> None:
+    client = AsyncIOMotorClient(os.environ.get("MONGO_URI", "mongodb://localhost:27017"))
+    db = client[BENCH_DB]
+    service = DatabaseService(db)
+    await db.users.delete_many({"telegram_id": TELEGRAM_ID})
+    await db.point_transactions.delete_many({"user_id": TELEGRAM_ID})
+
+    # Баллов хватает ровно на половину списаний
+    start_balance = AMOUNT * parallel // 2
+    await db.users.insert_one({
+        "telegram_id": TELEGRAM_ID,
+        "phone_number": "+70000000000",
+        "referral_code": "BENCH01",
+        "points": start_balance,
+        "is_activated": True,
+        "registration_date": datetime.now(),
+    })
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(
+        service.subtract_points(TELEGRAM_ID, AMOUNT, "bench") for _ in range(parallel)
+    ))
+    elapsed = time.perf_counter() - started
+
+    user = await db.users.find_one({"telegram_id": TELEGRAM_ID})
+    tx_sum = 0
+    async for tx in db.point_transactions.find({"user_id": TELEGRAM_ID}):
+        tx_sum += tx["amount"]
+    succeeded = sum(results)
+
+    print(f"transactions supported: {await service.supports_transactions()}")
+    print(f"parallel debits:        {parallel}")
+    print(f"succeeded:              {succeeded} (expected {start_balance // AMOUNT})")
+    print(f"final balance:          {user['points']}")
+    print(f"ledger sum:             {tx_sum} (expected {-succeeded * AMOUNT})")
+    print(f"elapsed:                {elapsed * 1000:.1f} ms ({parallel / elapsed:.0f} ops/s)")
+
+    assert user["points"] >= 0, "balance went negative"
+    assert succeeded == start_balance // AMOUNT
+    assert user["points"] == start_balance + tx_sum
+
+    await db.users.delete_many({"telegram_id": TELEGRAM_ID})
+    await db.point_transactions.delete_many({"user_id": TELEGRAM_ID})
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 500))
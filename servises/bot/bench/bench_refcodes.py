@@ -0,0 +1,56 @@
+"""
+Бенчмарк выдачи реферальных кодов: пропускная способность перестановки и
+аллокатора на разных смещениях счётчика и доля коллизий.
+
+    python -m bench.bench_refcodes [N]
+"""
+import asyncio
+import sys
+import time
+
+from app.database.refcodes import CodePermutation, ReferralCodeAllocator, DOMAIN
+
+
+class InMemoryCounters:
+    """Замена коллекции counters: считает обращения, как если бы это были round-trip'ы."""
+
+    def __init__(self, start: int = 0):
+        self.seq = start
+        self.calls = 0
+
+    async def find_one_and_update(self, query, update, **kwargs):
+        self.calls += 1
+        self.seq += update["$inc"]["seq"]
+        await asyncio.sleep(0)
+        return {"_id": query["_id"], "seq": self.seq}
+
+
+async def bench_allocator(n: int, offset: int) -> None:
+    counters = InMemoryCounters(offset)
+    allocator = ReferralCodeAllocator(counters, b"bench")
+    started = time.perf_counter()
+    codes = set()
+    for _ in range(n):
+        codes.add(await allocator.allocate())
+    elapsed = time.perf_counter() - started
+    collisions = n - len(codes)
+    print(
+        f"offset {offset:>17,}: {n / elapsed:>10,.0f} codes/s, "
+        f"{elapsed / n * 1e6:6.2f} us/code, collisions {collisions} ({collisions / n:.2%}), "
+        f"counter round-trips {counters.calls}"
+    )
+
+
+def main(n: int = 1_000_000) -> None:
+    permutation = CodePermutation(b"bench")
+    started = time.perf_counter()
+    values = {permutation.permute(i) for i in range(n)}
+    elapsed = time.perf_counter() - started
+    print(f"permutation: {n / elapsed:,.0f} values/s, distinct {len(values):,} of {n:,}, domain {DOMAIN:,}")
+
+    for offset in (0, 10_000_000, DOMAIN - n - 1):
+        asyncio.run(bench_allocator(n // 10, offset))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
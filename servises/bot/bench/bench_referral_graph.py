@@ -0,0 +1,51 @@
+"""
+Бенчмарк in-memory реферального графа на 10^5 и 10^6 рёбер:
+построение, размер поддерева, дерево ограниченной глубины, топ второго уровня.
+
+    python -m bench.bench_referral_graph
+"""
+import random
+import time
+
+from app.database.referral_graph import ReferralGraph
+
+
+def synthetic_edges(n: int, seed: int = 42):
+    """Преференциальное присоединение: активные рефереры приводят больше людей."""
+    rng = random.Random(seed)
+    referrers = [0]
+    for user in range(1, n + 1):
+        referrer = rng.choice(referrers)
+        yield referrer, user
+        referrers.append(user)
+        if rng.random() < 0.3:
+            referrers.append(referrer)
+
+
+def timed(label: str, fn, repeat: int = 1):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    elapsed = (time.perf_counter() - started) / repeat
+    unit, scale = ("ms", 1e3) if elapsed >= 1e-3 else ("us", 1e6)
+    print(f"  {label:<32} {elapsed * scale:10.2f} {unit}")
+    return result
+
+
+def main() -> None:
+    for n in (100_000, 1_000_000):
+        print(f"{n:,} edges")
+        graph = ReferralGraph()
+        edges = list(synthetic_edges(n))
+        timed("build", lambda: [graph.add_edge(a, b) for a, b in edges])
+        root = max(graph.children, key=lambda node: len(graph.children[node]))
+        sample = random.Random(1).sample(range(n), 1000)
+        timed("subtree_size x1000", lambda: [graph.subtree_size(node) for node in sample])
+        size = timed("subtree_size(root)", lambda: graph.subtree_size(0), repeat=1000)
+        tree = timed("tree(busiest, depth=3, limit=1000)", lambda: graph.tree(root, 3), repeat=100)
+        timed("top_second_level(10)", lambda: graph.top_second_level(10), repeat=10)
+        print(f"  root subtree {size:,}, busiest referrer {root} tree nodes {len(tree)}")
+
+
+if __name__ == "__main__":
+    main()
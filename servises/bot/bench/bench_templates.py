@@ -0,0 +1,42 @@
+"""
+Микробенчмарк: рендер скомпилированного шаблона против text.format(**kwargs).
+
+    python -m bench.bench_templates
+"""
+import timeit
+
+from app.messages.template import CompiledTemplate
+
+CASES = {
+    "static": ("Привет! Я — бот-помощник реферальной системы.", {}),
+    "one_field": ("Список зарегистрированных пользователей:\n\n{user_list_text}", {"user_list_text": "ID: 1\nИмя: Test"}),
+    "many_fields": (
+        "Ваш реферальный код: {code}\nБаланс: {points} баллов\nСтатус: {status}\nРеферер: {referrer}",
+        {"code": "AB12CD", "points": 175, "status": "Активирован", "referrer": "@someone"},
+    ),
+}
+
+
+def _format_path(text, **kwargs):
+    # Текущий путь send_message до компиляции шаблонов
+    try:
+        return text.format(**kwargs) if kwargs else text
+    except Exception:
+        return text
+
+
+def main(number: int = 200_000) -> None:
+    print(f"{'case':<12} {'str.format':>12} {'compiled':>12} {'speedup':>8}")
+    for name, (text, kwargs) in CASES.items():
+        compiled = CompiledTemplate(text)
+        assert compiled.render(**kwargs) == _format_path(text, **kwargs)
+        t_format = min(timeit.repeat(lambda: _format_path(text, **kwargs), number=number, repeat=5))
+        t_compiled = min(timeit.repeat(lambda: compiled.render(**kwargs), number=number, repeat=5))
+        print(
+            f"{name:<12} {t_format / number * 1e9:>9.0f} ns {t_compiled / number * 1e9:>9.0f} ns"
+            f" {t_format / t_compiled:>7.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Пропускная способность webhook-режима против long polling.
+Хендлер имитирует обращение к БД (--io-ms). Polling моделируется так же, как
+его выполняет aiogram: пачки по 100 апдейтов с задержкой getUpdates (--rtt-ms),
+обработка последовательно (handle_as_tasks=False) или задачами.
+Webhook — реальные POST на локальный aiohttp-сервер с WebhookHandler,
+параллельно в --connections соединений (max_connections у Telegram).
+
+    python -m bench.bench_webhook
+    python -m bench.bench_webhook --url http://localhost:3001/webhook --secret XXX --file updates.json
+
+Во втором варианте записанные апдейты (JSON-массив или по одному на строку)
+отправляются в уже запущенного бота.
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+from aiohttp import ClientSession, TCPConnector, web
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import Message, Update
+
+from app.webhook import SECRET_HEADER, WebhookHandler
+
+FAKE_TOKEN = "123456:" + "A" * 35
+BATCH = 100
+
+
+def synthetic_updates(n: int, chats: int = 50) -> List[Dict[str, Any]]:
+    return [
+        {
+            "update_id": i,
+            "message": {
+                "message_id": i,
+                "date": 0,
+                "chat": {"id": 1000 + i % chats, "type": "private"},
+                "from": {"id": 1000 + i % chats, "is_bot": False, "first_name": "u"},
+                "text": "/start",
+            },
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+def load_updates(path: str) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        raw = f.read().strip()
+    if raw.startswith("["):
+        return json.loads(raw)
+    return [json.loads(line) for line in raw.splitlines() if line.strip()]
+
+
+def make_dispatcher(io_ms: float) -> Dispatcher:
+    router = Router()
+    delay = io_ms / 1000
+
+    @router.message()
+    async def handle(message: Message) -> None:
+        await asyncio.sleep(delay)
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    return dp
+
+
+async def bench_polling(payloads, io_ms: float, rtt_ms: float, as_tasks: bool) -> float:
+    dp, bot = make_dispatcher(io_ms), Bot(FAKE_TOKEN)
+    updates = [Update.model_validate(p, context={"bot": bot}) for p in payloads]
+    tasks = []
+    started = time.perf_counter()
+    for offset in range(0, len(updates), BATCH):
+        await asyncio.sleep(rtt_ms / 1000)
+        for update in updates[offset:offset + BATCH]:
+            if as_tasks:
+                tasks.append(asyncio.create_task(dp.feed_update(bot, update)))
+            else:
+                await dp.feed_update(bot, update)
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    await bot.session.close()
+    return elapsed
+
+
+async def post_all(url: str, payloads, connections: int, secret: Optional[str]) -> List[float]:
+    headers = {SECRET_HEADER: secret} if secret else {}
+    queue: asyncio.Queue = asyncio.Queue()
+    for payload in payloads:
+        queue.put_nowait(json.dumps(payload))
+    acks: List[float] = []
+
+    async def worker(session: ClientSession) -> None:
+        while not queue.empty():
+            body = queue.get_nowait()
+            sent = time.perf_counter()
+            async with session.post(url, data=body, headers={"Content-Type": "application/json", **headers}) as resp:
+                if resp.status != 200:
+                    raise RuntimeError(f"webhook answered {resp.status}")
+            acks.append(time.perf_counter() - sent)
+
+    async with ClientSession(connector=TCPConnector(limit=connections)) as session:
+        await asyncio.gather(*(worker(session) for _ in range(connections)))
+    return acks
+
+
+async def bench_webhook(payloads, io_ms: float, connections: int, concurrency: int) -> tuple:
+    dp, bot = make_dispatcher(io_ms), Bot(FAKE_TOKEN)
+    handler = WebhookHandler(dp, bot, "bench-secret", concurrency)
+    app = web.Application()
+    handler.register(app, "/webhook")
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    started = time.perf_counter()
+    acks = await post_all(f"http://127.0.0.1:{port}/webhook", payloads, connections, "bench-secret")
+    await handler.drain()
+    elapsed = time.perf_counter() - started
+    await runner.cleanup()
+    await bot.session.close()
+    return elapsed, acks
+
+
+def quantile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--io-ms", type=float, default=5.0)
+    parser.add_argument("--rtt-ms", type=float, default=30.0)
+    parser.add_argument("--connections", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--url")
+    parser.add_argument("--secret")
+    parser.add_argument("--file")
+    args = parser.parse_args()
+
+    payloads = load_updates(args.file) if args.file else synthetic_updates(args.updates)
+    n = len(payloads)
+
+    if args.url:
+        started = time.perf_counter()
+        acks = await post_all(args.url, payloads, args.connections, args.secret)
+        elapsed = time.perf_counter() - started
+        print(f"posted {n} updates in {elapsed:.2f}s ({n / elapsed:,.0f}/s), "
+              f"ack p50={quantile(acks, 0.5) * 1e3:.2f}ms p99={quantile(acks, 0.99) * 1e3:.2f}ms")
+        return
+
+    print(f"{n} updates, handler io={args.io_ms}ms, getUpdates rtt={args.rtt_ms}ms")
+    elapsed = await bench_polling(payloads, args.io_ms, args.rtt_ms, as_tasks=False)
+    print(f"  polling, sequential        {n / elapsed:10,.0f} upd/s")
+    elapsed = await bench_polling(payloads, args.io_ms, args.rtt_ms, as_tasks=True)
+    print(f"  polling, handle_as_tasks   {n / elapsed:10,.0f} upd/s")
+    elapsed, acks = await bench_webhook(payloads, args.io_ms, args.connections, args.concurrency)
+    print(f"  webhook, {args.connections} conns / {args.concurrency} slots {n / elapsed:7,.0f} upd/s  "
+          f"ack p50={quantile(acks, 0.5) * 1e3:.2f}ms p99={quantile(acks, 0.99) * 1e3:.2f}ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
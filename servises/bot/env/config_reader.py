@@ -7,6 +7,78 @@ class Settings(BaseSettings):
     # MongoDB
     MONGO_URI: str
     MONGO_DB_NAME: str | None = None  # если не указан, будет извлечён из URI
+    MONGO_MAX_POOL_SIZE: int = 100
+    MONGO_MIN_POOL_SIZE: int = 0
+    MONGO_MAX_IDLE_TIME_MS: int | None = None
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = 5000
+    MONGO_CONNECT_TIMEOUT_MS: int = 5000
+    MONGO_SOCKET_TIMEOUT_MS: int | None = None
+    MONGO_WAIT_QUEUE_TIMEOUT_MS: int | None = None
+    MONGO_COMPRESSORS: str | None = None  # например "zlib"; snappy/zstd требуют доп. пакетов
+
+    # Мониторинг команд Mongo
+    MONGO_SLOW_MS: float = 50.0
+    MONGO_EXPLAIN_SAMPLE_RATE: float = 0.1
+    MONGO_STATS_DUMP_PATH: str | None = None
+    MONGO_STATS_DUMP_INTERVAL: float = 300.0
+
+    # Кэш шаблонов сообщений
+    MESSAGE_CACHE_SIZE: int = 512
+    MESSAGE_CACHE_TTL: float = 300.0
+    MESSAGE_CACHE_WATCH: bool = False  # сброс кэша через change stream (нужен replica set)
+
+    # Кэш профилей пользователей (read-through, короткий TTL)
+    USER_CACHE_ENABLED: bool = True
+    USER_CACHE_SIZE: int = 10000
+    USER_CACHE_TTL: float = 5.0
+    # FSM-хранилище: mongo | memory
+    FSM_STORAGE: str = "mongo"
+    FSM_STATE_TTL: int = 86400  # брошенные регистрации удаляются TTL-индексом
+    FSM_CACHE_SIZE: int = 10000
+    FSM_CACHE_TTL: float = 10.0  # окно устаревания при нескольких репликах
+
+    # Ключ перестановки реферальных кодов; менять только на пустой базе
+    REFERRAL_CODE_SECRET: SecretStr = SecretStr("reflbot-referral-codes")
+
+    # Период сверки реестра админов с коллекцией admins (сек)
+    ADMIN_REFRESH_INTERVAL: float = 30.0
+
+    # Период сверки рейтингов с БД (сек)
+    LEADERBOARD_REBUILD_INTERVAL: float = 300.0
+
+    # Период догрузки рёбер реферального графа, созданных другими репликами (сек)
+    REFERRAL_GRAPH_SYNC_INTERVAL: float = 60.0
+    # Период полной перестройки графа (страховка от вставок, опоздавших больше окна догрузки)
+    REFERRAL_GRAPH_REBUILD_INTERVAL: float = 3600.0
+
+    # Фоновая обработка истёкших окон ввода реферального кода
+    REFCODE_SWEEP_INTERVAL: float = 60.0
+    REFCODE_SWEEP_BATCH: int = 500
+    REFCODE_SWEEP_PAUSE: float = 0.2
+    REFCODE_REMIND_BEFORE_HOURS: float = 6.0
+    # Лимиты исходящих сообщений Telegram (общие для уведомлений и рассылок)
+    SEND_GLOBAL_RATE: float = 30.0
+    SEND_CHAT_RATE: float = 1.0
+    NOTIFY_CONCURRENCY: int = 8
+    # Период повторного подхвата running-рассылок, брошенных упавшими репликами (сек)
+    BROADCAST_RESUME_INTERVAL: float = 60.0
+    # HTTP-сервер метрик Prometheus (compose пробрасывает 3001 -> 3000)
+    METRICS_ENABLED: bool = True
+    METRICS_HOST: str = "0.0.0.0"
+    METRICS_PORT: int = 3000
+    # Режим получения апдейтов: polling | webhook (webhook обслуживается тем же HTTP-сервером)
+    BOT_MODE: str = "polling"
+    WEBHOOK_URL: str | None = None  # публичный базовый URL, например https://bot.example.com
+    WEBHOOK_PATH: str = "/webhook"
+    WEBHOOK_SECRET: SecretStr | None = None
+    WEBHOOK_MAX_CONCURRENCY: int = 100
+    WEBHOOK_MAX_CONNECTIONS: int = 40
+    # Планировщик: порядок внутри чата, параллельность между чатами
+    SCHEDULER_ENABLED: bool = True
+    SCHEDULER_MAX_CONCURRENCY: int = 64
+    SCHEDULER_MAX_PENDING: int = 1000
+    SCHEDULER_MONGO_WAITERS: int = 20  # выше — новые апдейты не запускаются, пока пул не разгрузится
+    SCHEDULER_DRAIN_TIMEOUT: float = 10.0
 
     model_config = SettingsConfigDict(
         env_file_encoding='utf-8',
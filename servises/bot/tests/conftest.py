@@ -0,0 +1,23 @@
+import os
+import sys
+from pathlib import Path
+
+# Тесты запускаются из servises/bot: python -m pytest tests
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123456:" + "A" * 35)
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017/reflbot_test")
+
+FAKE_TOKEN = "123456:" + "A" * 35
+
+
+def message_update(update_id: int, chat_id: int, text: str) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "u"},
+            "text": text,
+        },
+    }
@@ -0,0 +1,247 @@
+"""
+In-memory подмена коллекции motor для тестов очередей и рассылок.
+Поддерживает только то подмножество запросов и операторов обновления,
+которое используют notifications.py, broadcasts.py и leases.py.
+"""
+import copy
+import itertools
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+_MISSING = object()
+
+
+def _get(doc: Dict[str, Any], path: str) -> Any:
+    value: Any = doc
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _set(doc: Dict[str, Any], path: str, value: Any) -> None:
+    *parents, last = path.split(".")
+    for part in parents:
+        doc = doc.setdefault(part, {})
+    doc[last] = value
+
+
+def _unset(doc: Dict[str, Any], path: str) -> None:
+    *parents, last = path.split(".")
+    for part in parents:
+        doc = doc.get(part, {})
+    doc.pop(last, None)
+
+
+def _compare(value: Any, op: str, arg: Any) -> bool:
+    if op == "$ne":
+        return (None if value is _MISSING else value) != arg
+    if op == "$in":
+        return value is not _MISSING and value in arg
+    if value is _MISSING or value is None:
+        return False
+    if op == "$gt":
+        return value > arg
+    if op == "$gte":
+        return value >= arg
+    if op == "$lt":
+        return value < arg
+    if op == "$lte":
+        return value <= arg
+    raise NotImplementedError(op)
+
+
+def matches(doc: Dict[str, Any], query: Dict[str, Any]) -> bool:
+    for key, cond in query.items():
+        if key == "$or":
+            if not any(matches(doc, sub) for sub in cond):
+                return False
+            continue
+        value = _get(doc, key)
+        if isinstance(cond, dict) and cond and all(op.startswith("$") for op in cond):
+            if not all(_compare(value, op, arg) for op, arg in cond.items()):
+                return False
+        elif (None if value is _MISSING else value) != cond:
+            return False
+    return True
+
+
+def _apply_update(doc: Dict[str, Any], update: Dict[str, Any], inserting: bool) -> None:
+    for path, value in update.get("$set", {}).items():
+        _set(doc, path, copy.deepcopy(value))
+    for path in update.get("$unset", {}):
+        _unset(doc, path)
+    for path, value in update.get("$inc", {}).items():
+        current = _get(doc, path)
+        _set(doc, path, (0 if current is _MISSING else current) + value)
+    for path, spec in update.get("$push", {}).items():
+        current = _get(doc, path)
+        items = [] if current is _MISSING else list(current)
+        if isinstance(spec, dict) and "$each" in spec:
+            items.extend(copy.deepcopy(spec["$each"]))
+            if "$slice" in spec:
+                items = items[spec["$slice"]:] if spec["$slice"] < 0 else items[:spec["$slice"]]
+        else:
+            items.append(copy.deepcopy(spec))
+        _set(doc, path, items)
+    if inserting:
+        for path, value in update.get("$setOnInsert", {}).items():
+            _set(doc, path, copy.deepcopy(value))
+
+
+def _project(doc: Dict[str, Any], projection: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    doc = copy.deepcopy(doc)
+    if not projection:
+        return doc
+    included = [key for key, flag in projection.items() if flag and key != "_id"]
+    if included:
+        result = {key: doc[key] for key in included if key in doc}
+        if projection.get("_id", True) and "_id" in doc:
+            result["_id"] = doc["_id"]
+        return result
+    return {key: value for key, value in doc.items() if projection.get(key, True)}
+
+
+def _sorted(docs: List[Dict[str, Any]], sort: Optional[Sequence[Tuple[str, int]]]) -> List[Dict[str, Any]]:
+    for field, direction in reversed(list(sort or [])):
+        docs = sorted(docs, key=lambda d, f=field: _get(d, f), reverse=direction < 0)
+    return docs
+
+
+class FakeCursor:
+    def __init__(self, docs: List[Dict[str, Any]], projection: Optional[Dict[str, Any]]):
+        self._docs = docs
+        self._projection = projection
+        self._sort: List[Tuple[str, int]] = []
+        self._limit = 0
+
+    def sort(self, key, direction: int = 1) -> "FakeCursor":
+        self._sort = list(key) if isinstance(key, list) else [(key, direction)]
+        return self
+
+    def limit(self, n: int) -> "FakeCursor":
+        self._limit = n
+        return self
+
+    def batch_size(self, n: int) -> "FakeCursor":
+        return self
+
+    def _result(self) -> List[Dict[str, Any]]:
+        docs = _sorted(self._docs, self._sort)
+        if self._limit:
+            docs = docs[:self._limit]
+        return [_project(doc, self._projection) for doc in docs]
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        return self._result()
+
+    def __aiter__(self):
+        async def gen():
+            for doc in self._result():
+                yield doc
+        return gen()
+
+
+class FakeCollection:
+    """
+    Документы хранятся списком в порядке вставки. unique — уникальные ключи
+    вида (поля, partialFilterExpression или None); _id уникален всегда.
+    """
+
+    def __init__(self, docs: Optional[List[Dict[str, Any]]] = None,
+                 unique: Sequence[Tuple[Tuple[str, ...], Optional[Dict[str, Any]]]] = ()):
+        self.docs: List[Dict[str, Any]] = []
+        self.unique = [(("_id",), None), *unique]
+        self._ids = itertools.count(1)
+        for doc in docs or []:
+            self._insert(copy.deepcopy(doc))
+
+    def _check_unique(self, candidate: Dict[str, Any]) -> None:
+        for fields, partial in self.unique:
+            if partial is not None and not matches(candidate, partial):
+                continue
+            key = tuple(_get(candidate, field) for field in fields)
+            for other in self.docs:
+                if other is candidate or (partial is not None and not matches(other, partial)):
+                    continue
+                if tuple(_get(other, field) for field in fields) == key:
+                    raise DuplicateKeyError(f"E11000 duplicate key: {dict(zip(fields, key))}")
+
+    def _insert(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        doc.setdefault("_id", next(self._ids))
+        self._check_unique(doc)
+        self.docs.append(doc)
+        return doc
+
+    def _find(self, query: Dict[str, Any], sort=None) -> List[Dict[str, Any]]:
+        return _sorted([doc for doc in self.docs if matches(doc, query)], sort)
+
+    def _update_doc(self, doc: Dict[str, Any], update: Dict[str, Any]) -> bool:
+        before = copy.deepcopy(doc)
+        _apply_update(doc, update, inserting=False)
+        try:
+            self._check_unique(doc)
+        except DuplicateKeyError:
+            doc.clear()
+            doc.update(before)
+            raise
+        return doc != before
+
+    def _upsert(self, query: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+        doc = {
+            key: value for key, value in query.items()
+            if not key.startswith("$") and not (isinstance(value, dict) and any(k.startswith("$") for k in value))
+        }
+        _apply_update(doc, update, inserting=True)
+        return self._insert(doc)
+
+    async def insert_one(self, doc: Dict[str, Any], session=None):
+        return SimpleNamespace(inserted_id=self._insert(copy.deepcopy(doc))["_id"])
+
+    async def find_one(self, query: Optional[Dict[str, Any]] = None, projection=None, sort=None, session=None):
+        found = self._find(query or {}, sort)
+        return _project(found[0], projection) if found else None
+
+    def find(self, query: Optional[Dict[str, Any]] = None, projection=None, batch_size: int = 0, session=None) -> FakeCursor:
+        return FakeCursor(self._find(query or {}), projection)
+
+    async def count_documents(self, query: Dict[str, Any]) -> int:
+        return len(self._find(query))
+
+    async def find_one_and_update(self, query, update, projection=None, sort=None, upsert=False,
+                                  return_document=ReturnDocument.BEFORE, session=None):
+        found = self._find(query, sort)
+        if found:
+            doc = found[0]
+            before = copy.deepcopy(doc)
+            self._update_doc(doc, update)
+            return _project(doc if return_document == ReturnDocument.AFTER else before, projection)
+        if upsert:
+            doc = self._upsert(query, update)
+            return _project(doc, projection) if return_document == ReturnDocument.AFTER else None
+        return None
+
+    async def update_one(self, query, update, upsert=False, session=None):
+        found = self._find(query)
+        if found:
+            modified = self._update_doc(found[0], update)
+            return SimpleNamespace(matched_count=1, modified_count=int(modified), upserted_id=None)
+        if upsert:
+            doc = self._upsert(query, update)
+            return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=doc["_id"])
+        return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=None)
+
+    async def update_many(self, query, update, session=None):
+        found = self._find(query)
+        modified = sum(self._update_doc(doc, update) for doc in found)
+        return SimpleNamespace(matched_count=len(found), modified_count=modified)
+
+    async def delete_one(self, query, session=None):
+        found = self._find(query)
+        if found:
+            self.docs.remove(found[0])
+        return SimpleNamespace(deleted_count=len(found[:1]))
@@ -0,0 +1,112 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from aiogram.exceptions import TelegramForbiddenError
+from aiogram.methods import SendMessage
+
+from app.database.broadcasts import BroadcastEngine
+from app.utils.ratelimit import SendLimiter
+from tests.fakes import FakeCollection
+
+
+class FakeBot:
+    def __init__(self, blocked=(), on_send=None):
+        self.sent = []
+        self.blocked = set(blocked)
+        self.on_send = on_send
+
+    async def send_message(self, chat_id: int, text: str):
+        if self.on_send is not None:
+            await self.on_send(chat_id)
+        if chat_id in self.blocked:
+            raise TelegramForbiddenError(SendMessage(chat_id=chat_id, text=text), "bot was blocked by the user")
+        self.sent.append(chat_id)
+
+    async def edit_message_text(self, *args, **kwargs):
+        pass
+
+
+def _engine(users=10, **broadcast) -> BroadcastEngine:
+    doc = {
+        "_id": "b1",
+        "text": "hello",
+        "segment": "all",
+        "status": "running",
+        "admin_chat_id": 1,
+        "progress_message_id": None,
+        "total": users,
+        "checkpoint": None,
+        "sent": 0,
+        "blocked": 0,
+        "failed": 0,
+        "created_at": datetime.now(),
+        **broadcast,
+    }
+    return BroadcastEngine(
+        FakeCollection([doc]),
+        FakeCollection([{"telegram_id": i} for i in range(1, users + 1)]),
+        FakeCollection(),
+        batch_size=3,
+        workers=2,
+    )
+
+
+def _limiter() -> SendLimiter:
+    return SendLimiter(global_rate=10_000, chat_rate=10_000)
+
+
+def test_resume_continues_after_checkpoint():
+    engine = _engine(checkpoint=4, sent=4)
+    bot = FakeBot(blocked={6})
+
+    async def main():
+        assert await engine.resume_all(bot, _limiter()) == 1
+        await asyncio.gather(*engine._tasks.values())
+
+    asyncio.run(main())
+    assert sorted(bot.sent) == [5, 7, 8, 9, 10]
+    [doc] = engine.collection.docs
+    assert doc["status"] == "done"
+    assert (doc["sent"], doc["blocked"], doc["failed"]) == (9, 1, 0)
+    assert doc["checkpoint"] == 10
+    blocked = [user["telegram_id"] for user in engine.col_users.docs if user.get("is_blocked")]
+    assert blocked == [6]
+
+
+def test_resume_waits_for_dead_owner_lease_to_expire():
+    engine = _engine()
+    engine.col_leases.docs.append({
+        "_id": "broadcast:b1", "owner": "dead-host:1", "expires_at": datetime.now() + timedelta(seconds=60)
+    })
+    bot = FakeBot()
+
+    async def main():
+        await engine.resume_all(bot, _limiter())
+        await asyncio.gather(*engine._tasks.values())
+        assert bot.sent == []
+        # Аренда упавшей реплики истекла — следующий тик подхватывает рассылку
+        engine.col_leases.docs[0]["expires_at"] = datetime.now() - timedelta(seconds=1)
+        await engine.resume_all(bot, _limiter())
+        await asyncio.gather(*engine._tasks.values())
+
+    asyncio.run(main())
+    assert sorted(bot.sent) == list(range(1, 11))
+    assert engine.collection.docs[0]["status"] == "done"
+
+
+def test_run_stops_when_lease_is_lost():
+    engine = _engine()
+
+    async def steal_lease(chat_id: int):
+        if chat_id == 3:
+            lease = engine.col_leases.docs[0]
+            lease["owner"] = "other-host:2"
+            lease["expires_at"] = datetime.now() + timedelta(seconds=60)
+
+    bot = FakeBot(on_send=steal_lease)
+    asyncio.run(engine.run(bot, _limiter(), "b1"))
+    assert sorted(bot.sent) == [1, 2, 3]
+    [doc] = engine.collection.docs
+    # Рассылку продолжит новый владелец аренды с checkpoint первой пачки
+    assert doc["status"] == "running"
+    assert doc["checkpoint"] == 3
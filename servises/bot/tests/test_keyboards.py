@@ -0,0 +1,22 @@
+from app.keyboards.compiler import KeyboardRegistry
+
+
+def _doc(text: str, version: int = 1) -> dict:
+    return {
+        "message_id": "menu",
+        "version": version,
+        "reply_markup": {"inline_keyboard": [[{"text": text, "callback_data": "go"}]]},
+    }
+
+
+def test_same_content_reuses_compiled_keyboard():
+    registry = KeyboardRegistry()
+    assert registry.get(_doc("Старт")) is registry.get(_doc("Старт"))
+
+
+def test_direct_db_edit_without_version_bump_recompiles():
+    registry = KeyboardRegistry()
+    registry.get(_doc("Старт"))
+    # Правка в Mongo напрямую: текст кнопки другой, version прежний
+    markup = registry.get(_doc("Начать")).render()
+    assert markup.inline_keyboard[0][0].text == "Начать"
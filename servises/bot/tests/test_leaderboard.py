@@ -0,0 +1,33 @@
+import random
+
+from app.database.leaderboard import TopN
+
+
+def _db_order(scores: dict) -> list:
+    # Как _page_from_db / rebuild: score по убыванию, telegram_id по возрастанию
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+
+def test_tie_at_boundary_matches_db_order():
+    scores = {1: 10, 2: 5, 3: 5}
+    top = TopN(capacity=2)
+    top.load(scores.items())
+    assert top.page(0, 2) == [(1, 10), (2, 5)]
+    # Участник 4 сравнялся с последним в списке, но по telegram_id стоит после 3
+    scores[4] = 5
+    top.update(4, 5)
+    page = top.page(0, 2)
+    assert page is None or page == _db_order(scores)[:2]
+
+
+def test_incremental_updates_stay_a_prefix_of_db_order():
+    rng = random.Random(7)
+    scores = {member: rng.randint(0, 5) for member in range(1, 40)}
+    top = TopN(capacity=10)
+    top.load(scores.items())
+    for _ in range(2000):
+        member = rng.randint(1, 60)
+        scores[member] = max(0, scores.get(member, 0) + rng.randint(-2, 3))
+        top.update(member, scores[member])
+        known = len(top)
+        assert top.page(0, known) == _db_order(scores)[:known]
@@ -0,0 +1,134 @@
+import asyncio
+from datetime import datetime
+
+from app.database.notifications import NotificationQueue, render_notification
+from app.utils.ratelimit import SendLimiter
+from tests.fakes import FakeCollection
+
+PENDING_PER_CHAT = (("chat_id",), {"status": "pending"})
+
+
+def _queue() -> NotificationQueue:
+    return NotificationQueue(FakeCollection(unique=[PENDING_PER_CHAT]), FakeCollection())
+
+
+def _sending(queue: NotificationQueue, chat_id: int, name: str, points: int) -> dict:
+    doc = {
+        "_id": f"sending-{name}",
+        "chat_id": chat_id,
+        "status": "sending",
+        "items": [{"kind": "referral_joined", "name": name, "points": points}],
+        "counts": {"referral_joined": 1},
+        "points": {"referral_joined": points},
+        "attempts": 0,
+        "not_before": datetime.now(),
+        "claimed_at": datetime.now(),
+    }
+    queue.collection.docs.append(doc)
+    return dict(doc)
+
+
+def test_enqueue_coalesces_events_of_one_chat():
+    queue = _queue()
+
+    async def main():
+        await queue.enqueue(1, {"kind": "referral_joined", "name": "Аня", "points": 25})
+        await queue.enqueue(1, {"kind": "referral_joined", "name": "Боря", "points": 25})
+        await queue.enqueue(2, {"kind": "referral_activated", "name": "Вера", "points": 75})
+
+    asyncio.run(main())
+    docs = {doc["chat_id"]: doc for doc in queue.collection.docs}
+    assert len(queue.collection.docs) == 2
+    assert docs[1]["counts"] == {"referral_joined": 2}
+    assert docs[1]["points"] == {"referral_joined": 50}
+    assert "Аня, Боря" in render_notification(docs[1])
+
+
+def test_requeue_returns_document_to_pending():
+    queue = _queue()
+    doc = _sending(queue, 1, "Аня", 25)
+
+    asyncio.run(queue._requeue(doc, 0.0, attempt=True))
+    [stored] = queue.collection.docs
+    assert stored["status"] == "pending"
+    assert stored["attempts"] == 1
+
+
+def test_requeue_merges_into_new_pending_document():
+    queue = _queue()
+    doc = _sending(queue, 1, "Аня", 25)
+
+    async def main():
+        # Пока doc отправлялся, для чата накопилось новое событие
+        await queue.enqueue(1, {"kind": "referral_joined", "name": "Боря", "points": 25})
+        await queue._requeue(doc, 0.0)
+
+    asyncio.run(main())
+    [stored] = queue.collection.docs
+    assert stored["status"] == "pending"
+    assert stored["counts"] == {"referral_joined": 2}
+    assert stored["points"] == {"referral_joined": 50}
+    assert [item["name"] for item in stored["items"]] == ["Боря", "Аня"]
+
+
+def test_requeue_keeps_document_when_pending_is_claimed_before_merge():
+    queue = _queue()
+    doc = _sending(queue, 1, "Аня", 25)
+    collection = queue.collection
+    update_one = collection.update_one
+    calls = []
+
+    async def racing_update_one(query, update, upsert=False, session=None):
+        calls.append(query)
+        if len(calls) == 2:
+            # Между DuplicateKeyError и слиянием отправитель забрал pending-документ
+            await collection.update_many({"chat_id": 1, "status": "pending"}, {"$set": {"status": "sending"}})
+        return await update_one(query, update, upsert=upsert, session=session)
+
+    collection.update_one = racing_update_one
+
+    async def main():
+        await queue.enqueue(1, {"kind": "referral_joined", "name": "Боря", "points": 25})
+        calls.clear()
+        await queue._requeue(doc, 0.0)
+
+    asyncio.run(main())
+    by_id = {stored["_id"]: stored for stored in collection.docs}
+    assert len(by_id) == 2
+    # Документ не потерян: слияние не нашло цели, повторный requeue вернул его в очередь
+    assert by_id[doc["_id"]]["status"] == "pending"
+    assert by_id[doc["_id"]]["counts"] == {"referral_joined": 1}
+
+
+def test_enqueue_during_empty_claim_wakes_sender():
+    queue = _queue()
+    claim = queue._claim
+    sent = []
+    raced = []
+    delivered = asyncio.Event()
+
+    class Bot:
+        async def send_message(self, chat_id, text):
+            sent.append(chat_id)
+            delivered.set()
+
+    async def racing_claim():
+        doc = await claim()
+        if doc is None and not raced:
+            raced.append(True)
+            # Событие приходит, когда отправитель уже увидел пустую очередь
+            await queue.enqueue(1, {"kind": "referral_joined", "name": "Аня", "points": 25})
+        return doc
+
+    queue._claim = racing_claim
+
+    async def main():
+        sender = asyncio.create_task(queue.run(Bot(), SendLimiter(10_000, 10_000), poll_interval=30.0))
+        try:
+            await asyncio.wait_for(delivered.wait(), 2.0)
+        finally:
+            sender.cancel()
+            await asyncio.gather(sender, return_exceptions=True)
+
+    asyncio.run(main())
+    assert sent == [1]
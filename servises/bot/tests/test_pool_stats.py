@@ -0,0 +1,8 @@
+from app.database.db import PoolStatsListener
+
+
+def test_pool_cleared_event_is_counted():
+    listener = PoolStatsListener()
+    listener.pool_cleared(None)
+    listener.pool_cleared(None)
+    assert listener.stats()["pool_clears"] == 2
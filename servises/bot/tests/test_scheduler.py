@@ -0,0 +1,85 @@
+import asyncio
+import random
+
+from aiogram import Bot, Dispatcher, Router
+from aiogram.filters import StateFilter
+from aiogram.fsm.context import FSMContext
+from aiogram.types import Message, Update
+
+from app.fsm.registration import RegistrationStates
+from app.middlewares.scheduler import ChatScheduler
+from tests.conftest import FAKE_TOKEN, message_update
+
+
+def _dispatcher(scheduler: ChatScheduler, router: Router) -> Dispatcher:
+    dp = Dispatcher()
+    dp.update.outer_middleware(scheduler)
+    dp.include_router(router)
+    return dp
+
+
+async def _feed(dp: Dispatcher, bot: Bot, payloads) -> None:
+    # Как polling с handle_as_tasks=False: апдейты подаются по одному подряд
+    for payload in payloads:
+        await dp.feed_update(bot, Update.model_validate(payload, context={"bot": bot}))
+
+
+def test_referral_code_after_phone_reaches_code_handler():
+    handled = []
+    router = Router()
+
+    @router.message(StateFilter(RegistrationStates.waiting_for_phone))
+    async def phone(message: Message, state: FSMContext):
+        await asyncio.sleep(0.01)  # запись пользователя в БД
+        await state.update_data(phone=message.text)
+        await state.set_state(RegistrationStates.waiting_for_referral_code)
+        handled.append(("phone", message.text))
+
+    @router.message(StateFilter(RegistrationStates.waiting_for_referral_code))
+    async def code(message: Message, state: FSMContext):
+        handled.append(("code", message.text))
+        await state.clear()
+
+    async def scenario():
+        scheduler = ChatScheduler(max_concurrency=4, max_pending=10)
+        dp = _dispatcher(scheduler, router)
+        bot = Bot(FAKE_TOKEN)
+        state = dp.fsm.get_context(bot, chat_id=7, user_id=7)
+        await state.set_state(RegistrationStates.waiting_for_phone)
+        await _feed(dp, bot, [message_update(1, 7, "+79001234567"), message_update(2, 7, "ABC123")])
+        await scheduler.drain()
+        await bot.session.close()
+
+    asyncio.run(scenario())
+    assert handled == [("phone", "+79001234567"), ("code", "ABC123")]
+
+
+def test_per_chat_order_and_concurrency_cap():
+    seen = {}
+    running = peak = 0
+    router = Router()
+
+    @router.message()
+    async def handle(message: Message):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(random.random() * 0.003)
+        seen.setdefault(message.chat.id, []).append(message.message_id)
+        running -= 1
+
+    async def scenario():
+        scheduler = ChatScheduler(max_concurrency=5, max_pending=50)
+        dp = _dispatcher(scheduler, router)
+        bot = Bot(FAKE_TOKEN)
+        rng = random.Random(3)
+        await _feed(dp, bot, [message_update(i, 100 + rng.randrange(20), "x") for i in range(1, 401)])
+        await scheduler.drain()
+        await bot.session.close()
+        return scheduler
+
+    scheduler = asyncio.run(scenario())
+    assert sum(len(ids) for ids in seen.values()) == 400
+    assert all(ids == sorted(ids) for ids in seen.values())
+    assert peak <= 5
+    assert scheduler.pending == 0
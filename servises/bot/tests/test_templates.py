@@ -0,0 +1,15 @@
+from app.messages.template import TemplateRegistry
+
+
+def test_same_text_reuses_compiled_template():
+    registry = TemplateRegistry()
+    doc = {"message_id": "welcome", "version": 1, "text": "Привет, {name}!"}
+    assert registry.get(doc) is registry.get(dict(doc))
+
+
+def test_direct_db_edit_without_version_bump_recompiles():
+    registry = TemplateRegistry()
+    registry.get({"message_id": "welcome", "version": 1, "text": "Привет, {name}!"})
+    # Правка в Mongo напрямую: текст другой, version прежний
+    edited = registry.get({"message_id": "welcome", "version": 1, "text": "Здравствуйте, {name}!"})
+    assert edited.render(name="Аня") == "Здравствуйте, Аня!"
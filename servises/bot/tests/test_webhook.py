@@ -0,0 +1,31 @@
+import asyncio
+import os
+import signal
+
+import pytest
+from aiogram import Bot, Dispatcher
+
+from app.webhook import WebhookHandler, run_webhook
+from tests.conftest import FAKE_TOKEN
+
+
+def test_handler_requires_secret():
+    with pytest.raises(ValueError):
+        WebhookHandler(Dispatcher(), Bot(FAKE_TOKEN), "")
+
+
+def test_sigterm_runs_shutdown_hooks():
+    events = []
+    dp = Dispatcher()
+
+    @dp.startup()
+    async def on_startup():
+        events.append("startup")
+        asyncio.get_running_loop().call_later(0.05, os.kill, os.getpid(), signal.SIGTERM)
+
+    @dp.shutdown()
+    async def on_shutdown():
+        events.append("shutdown")
+
+    asyncio.run(asyncio.wait_for(run_webhook(dp, Bot(FAKE_TOKEN)), 5))
+    assert events == ["startup", "shutdown"]